@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+# content of jama_bench.py
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+from typing import Dict, List
+
+# Jama Sync and Jama Exec are run in this process against the fake Jama server, the same way they are run by hand
+JAMA_TOOLS_PATH = Path(__file__).resolve().parent.parent
+for tool_path in (JAMA_TOOLS_PATH, JAMA_TOOLS_PATH / 'jama_sync', JAMA_TOOLS_PATH / 'jama_exec'):
+    sys.path.append(str(tool_path))
+
+import jama_exec  # noqa: E402
+import jama_sync  # noqa: E402
+from jama_common.fake_jama_server import FOLDER_TYPE, TEST_CASE_TYPE, FakeJamaServer  # noqa: E402
+
+
+DEFAULT_SIZES = [10, 100, 1000]
+SCENARIOS = ['sync_add', 'sync_update', 'exec']
+
+# The generated test cases are spread over test files of this many test cases
+CASES_PER_SYNC_FILE = 10
+
+MASTER_PROJECT = 'BENCH_MASTER'
+SYNCED_PROJECT = 'BENCH_PROJECT'
+EXEC_PROJECT = 'BENCH_EXEC'
+ROOT_FOLDER = 'bench_root'
+TEST_PLAN = 'TST-1 Bench v1.0.0'
+TEST_CYCLE = 'Bench v1.0.0-RC1'
+TEST_VERSION = 'v1.0.0-RC1'
+
+TEST_CASE_TEMPLATE = '''
+def test_NEW_bench_case_{number}():
+    """
+    Description:
+        Benchmark test case {number}
+
+    Prerequisites:
+        1) Jama Bench is running
+
+    Test Data:
+        1) Generated by Jama Bench
+
+    Steps:
+        1) Run benchmark step {number}
+            ER: The benchmark step passes
+            Notes: None
+
+    Projects: {project}
+    """
+    pass
+'''
+
+
+def parse_args(args: List[str]):
+    """
+    Return an ArgumentParser object containing the arguments passed in
+
+    Args:
+        args: A list of arguments to be parsed
+
+    Returns:
+        An ArgumentParser object containing the arguments passed in
+    """
+    parser = argparse.ArgumentParser(description='benchmark Jama Sync and Jama Exec against a local fake Jama server')
+    parser.add_argument("--sizes", help="amounts of test cases to benchmark (default 10 100 1000)", type=int,
+                        nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument("--scenarios", help="scenarios to run (default all)", nargs='+', choices=SCENARIOS,
+                        default=SCENARIOS)
+    parser.add_argument("--latency", help="seconds the fake server waits before answering each request (default 0)",
+                        type=float, default=0.0)
+    parser.add_argument("--rate-limit-every", help="answer every Nth request with a 429 (default 0, never)",
+                        type=int, default=0)
+    parser.add_argument("--requests-per-second", help="client side request budget (default 0, no budget)",
+                        type=float, default=0)
+    parser.add_argument("--workers", help="--workers passed to Jama Exec (default 1)", type=int, default=1)
+    parser.add_argument("--output", help="write the results to this json file", default=None)
+    parser.add_argument("--log", help="file that the output of the tools is written to (default jama_bench.log)",
+                        default="jama_bench.log")
+    return parser.parse_args(args)
+
+
+@contextlib.contextmanager
+def tool_output_to(log_file):
+    """
+    Send everything the tools print (including the spinners, which hold on to the original stdout) to a log file
+    """
+    sys.stdout.flush()
+    saved_stdout = os.dup(1)
+    os.dup2(log_file.fileno(), 1)
+    try:
+        with contextlib.redirect_stdout(log_file):
+            yield
+    finally:
+        log_file.flush()
+        sys.stdout.flush()
+        os.dup2(saved_stdout, 1)
+        os.close(saved_stdout)
+
+
+def measure(server: FakeJamaServer, scenario: str, size: int, log_file, function, *args) -> Dict:
+    """
+    Run one scenario and return its wall time and the requests the fake server received
+
+    Args:
+        server: The FakeJamaServer the tools are pointed at
+        scenario: A string representing the scenario name
+        size: An integer representing the amount of test cases in the scenario
+        log_file: An open file that the tool output is written to
+        function: The function that runs the scenario
+        *args: The arguments of the function
+
+    Returns:
+        A dictionary with the scenario results
+    """
+    server.reset_request_counts()
+    log_file.write("\n==================== " + scenario + " (" + str(size) + " test cases) ====================\n")
+    log_file.flush()
+
+    start = time.perf_counter()
+    with tool_output_to(log_file):
+        function(*args)
+    wall_seconds = time.perf_counter() - start
+
+    return {
+        'scenario': scenario,
+        'test_cases': size,
+        'wall_seconds': round(wall_seconds, 3),
+        'requests': server.total_requests,
+        'rate_limited': server.rate_limited,
+        'bytes_received': server.bytes_sent,
+        'requests_by_endpoint': dict(server.request_counts.most_common()),
+    }
+
+
+def configure_jama_sync(server: FakeJamaServer, work_dir: Path, options) -> None:
+    """
+    Point Jama Sync's config at the fake server and the benchmark projects
+    """
+    jama_sync.config.update({
+        'jama_url': server.url,
+        'default_test_case_api_type': TEST_CASE_TYPE,
+        'default_folder_api_type': FOLDER_TYPE,
+        'default_master_project': MASTER_PROJECT,
+        'jama_project_list': [MASTER_PROJECT, SYNCED_PROJECT],
+        'metadata_cache_path': str(work_dir / 'metadata_cache.json'),
+        'metrics_path': str(work_dir / 'jama_sync_metrics.json'),
+        'sync_state_path': str(work_dir / 'jama_sync_state.sqlite3'),
+        'parse_cache_path': str(work_dir / 'jama_sync_cache'),
+        'jama_requests_per_second': options.requests_per_second,
+    })
+
+
+def write_sync_test_files(root_path: Path, size: int) -> List[Path]:
+    """
+    Write 'size' new xframework test cases into test files of CASES_PER_SYNC_FILE test cases under the root folder
+
+    Returns:
+        A list of the test file paths
+    """
+    test_files = []
+    for file_number, first_case in enumerate(range(0, size, CASES_PER_SYNC_FILE)):
+        folder = root_path / ('suite_' + str(file_number % 10))
+        folder.mkdir(parents=True, exist_ok=True)
+        test_file = folder / ('test_bench_' + str(file_number) + '.py')
+        with open(test_file, 'w') as file:
+            file.write("# Generated by Jama Bench\n")
+            for number in range(first_case, min(first_case + CASES_PER_SYNC_FILE, size)):
+                file.write(TEST_CASE_TEMPLATE.format(number=number, project=SYNCED_PROJECT))
+        test_files.append(test_file)
+    return test_files
+
+
+def edit_sync_test_files(test_files: List[Path]) -> None:
+    """
+    Change the description of every test case in the test files
+    """
+    for test_file in test_files:
+        test_file.write_text(test_file.read_text().replace("Benchmark test case", "Updated benchmark test case"))
+
+
+def run_jama_sync(root_path: Path, mode: str) -> None:
+    """
+    Run Jama Sync once over the whole root folder
+    """
+    arguments = jama_sync.parse_args(["-root_path", str(root_path), "-test_path", str(root_path),
+                                      "-jama_user", "bench", "-jama_pass", "bench",
+                                      "-interpreter", "xframework", mode])
+    jama_sync.update_jama(arguments, testing=True)
+
+
+def run_sync_scenarios(size: int, work_dir: Path, options, log_file) -> List[Dict]:
+    """
+    Add 'size' new test cases with Jama Sync (master project plus one synced project), then update them
+    """
+    results = []
+    with FakeJamaServer(options.latency, options.rate_limit_every) as server:
+        for project in (MASTER_PROJECT, SYNCED_PROJECT):
+            server.add_folder(server.add_project(project), ROOT_FOLDER)
+        configure_jama_sync(server, work_dir, options)
+
+        root_path = work_dir / ROOT_FOLDER
+        test_files = write_sync_test_files(root_path, size)
+
+        # The update scenario updates the test cases that the add scenario created
+        if 'sync_add' in options.scenarios or 'sync_update' in options.scenarios:
+            results.append(measure(server, 'sync_add', size, log_file, run_jama_sync, root_path, "--add"))
+        if 'sync_update' in options.scenarios:
+            # Unchanged test cases are not pushed again, so every test case is edited first
+            edit_sync_test_files(test_files)
+            results.append(measure(server, 'sync_update', size, log_file, run_jama_sync, root_path, "--update"))
+
+    return [result for result in results if result['scenario'] in options.scenarios]
+
+
+def write_junit_results(results_path: Path, test_names: List[str]) -> None:
+    """
+    Write a pytest junit xml with a passing or failing result for every test name (every 7th test fails)
+    """
+    with open(results_path, 'w') as file:
+        file.write('<?xml version="1.0" encoding="utf-8"?>\n<testsuites>\n')
+        file.write('<testsuite name="bench" tests="' + str(len(test_names)) + '">\n')
+        for number, test_name in enumerate(test_names):
+            file.write('<testcase classname="bench" name="' + test_name + '" time="0.01">')
+            if number % 7 == 6:
+                file.write('<failure message="assert False">benchmark failure</failure>')
+            file.write('</testcase>\n')
+        file.write('</testsuite>\n</testsuites>\n')
+
+
+def run_exec_scenario(size: int, work_dir: Path, options, log_file) -> List[Dict]:
+    """
+    Push 'size' pytest results to a test cycle with Jama Exec
+    """
+    with FakeJamaServer(options.latency, options.rate_limit_every) as server:
+        project_id = server.add_project(EXEC_PROJECT)
+        folder_id = server.add_folder(project_id, ROOT_FOLDER)
+        test_plan_id = server.add_test_plan(project_id, TEST_PLAN)
+        test_cycle_id = server.add_test_cycle(test_plan_id, TEST_CYCLE)
+
+        test_names = []
+        for number in range(size):
+            test_case_id = server.add_test_case(project_id, folder_id, "bench case " + str(number))
+            global_id = server.items[test_case_id]['globalId']
+            test_name = "test_" + global_id.lower().replace("-", "_") + "_bench_case_" + str(number)
+            server.items[test_case_id]['fields']['name'] = test_name
+            server.add_test_run(test_cycle_id, test_case_id)
+            test_names.append(test_name)
+
+        results_path = work_dir / 'bench_output.xml'
+        write_junit_results(results_path, test_names)
+
+        exec_dir = work_dir / 'jama_exec'
+        exec_dir.mkdir(exist_ok=True)
+        with open(exec_dir / 'config.json', 'w') as file:
+            json.dump({
+                "jama_url": server.url,
+                "jama_project": EXEC_PROJECT,
+                "jama_test_plan": TEST_PLAN,
+                "report_id": "TST-1",
+                "jama_test_cycle": TEST_CYCLE,
+                "test_version_and_release_candidate": TEST_VERSION,
+                "path_to_test_results": str(results_path),
+                "test_results_type": "pytest",
+                "bulk_comment": "",
+                "metadata_cache_path": str(work_dir / 'metadata_cache.json'),
+                "metrics_path": str(work_dir / 'jama_exec_metrics.json'),
+                "jama_requests_per_second": options.requests_per_second,
+            }, file, indent=2)
+
+        commands = ["--username", "bench", "--password", "bench", "--config_path", str(exec_dir),
+                    "--workers", str(options.workers)]
+
+        return [measure(server, 'exec', size, log_file, jama_exec.execute_jama_exec, commands)]
+
+
+def print_report(results: List[Dict]) -> None:
+    print("\n{:<12} {:>10} {:>10} {:>10} {:>10} {:>14}".format("scenario", "test cases", "wall (s)", "requests",
+                                                             "429s", "requests/case"))
+    for result in results:
+        print("{:<12} {:>10} {:>10.2f} {:>10} {:>10} {:>14.1f}".format(
+            result['scenario'], result['test_cases'], result['wall_seconds'], result['requests'],
+            result['rate_limited'], result['requests'] / max(1, result['test_cases'])))
+
+    for result in results:
+        print("\n" + result['scenario'] + " (" + str(result['test_cases']) + " test cases) requests by endpoint:")
+        for endpoint, count in result['requests_by_endpoint'].items():
+            print("    {:<48} {:>8}".format(endpoint, count))
+
+
+def run_benchmark(args) -> List[Dict]:
+    """
+    Run every scenario at every size and print the report
+
+    Args:
+        args: Arguments passed in from the command line
+
+    Returns:
+        A list of the scenario results
+    """
+    results = []
+    with open(args.log, 'w') as log_file:
+        for size in args.sizes:
+            with tempfile.TemporaryDirectory(prefix='jama_bench_') as work_dir:
+                if 'sync_add' in args.scenarios or 'sync_update' in args.scenarios:
+                    results.extend(run_sync_scenarios(size, Path(work_dir), args, log_file))
+            with tempfile.TemporaryDirectory(prefix='jama_bench_') as work_dir:
+                if 'exec' in args.scenarios:
+                    results.extend(run_exec_scenario(size, Path(work_dir), args, log_file))
+
+    print_report(results)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    return results
+
+
+if __name__ == "__main__":
+    run_benchmark(parse_args(sys.argv[1:]))
@@ -0,0 +1,33 @@
+import json
+
+import jama_bench
+
+
+def test_benchmark_runs_every_scenario_offline(tmp_path, capfd):
+    arguments = jama_bench.parse_args(["--sizes", "3", "--log", str(tmp_path / "bench.log"),
+                                       "--output", str(tmp_path / "bench.json")])
+    results = jama_bench.run_benchmark(arguments)
+    output, err = capfd.readouterr()
+
+    assert [result['scenario'] for result in results] == ['sync_add', 'sync_update', 'exec']
+    assert all(result['test_cases'] == 3 and result['requests'] > 0 for result in results)
+    assert json.loads((tmp_path / "bench.json").read_text()) == results
+
+    sync_add, sync_update, exec_results = results
+    assert sync_add['requests_by_endpoint']['POST items/{id}/synceditems'] == 3
+    assert sync_update['requests_by_endpoint']['PUT items/{id}'] == 6
+    assert exec_results['requests_by_endpoint']['PUT testruns/{id}'] == 3
+
+    log = (tmp_path / "bench.log").read_text()
+    assert log.count("Successfully added new test case") == 3
+    assert "scenario" in output and "requests by endpoint" in output
+
+
+def test_rate_limited_requests_are_retried(tmp_path):
+    arguments = jama_bench.parse_args(["--sizes", "3", "--scenarios", "exec", "--rate-limit-every", "4",
+                                       "--log", str(tmp_path / "bench.log")])
+    exec_results, = jama_bench.run_benchmark(arguments)
+
+    assert exec_results['rate_limited'] > 0
+    assert exec_results['requests_by_endpoint']['PUT testruns/{id}'] >= 3
+    assert "Pushed status" in (tmp_path / "bench.log").read_text()
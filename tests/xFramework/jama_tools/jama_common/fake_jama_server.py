@@ -0,0 +1,445 @@
+import json
+import re
+import threading
+import time
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from jama_common.jama_metrics import endpoint_name
+from jama_common.jama_paging import MAX_PAGE_SIZE
+
+
+# Item type ids of the fake instance, the folder and test case types match the jama_sync config.json defaults
+FOLDER_TYPE = 32
+TEST_PLAN_TYPE = 35
+TEST_CYCLE_TYPE = 36
+TEST_RUN_TYPE = 37
+TEST_CASE_TYPE = 89
+
+# py_jama_rest_client asks for 20 results per page when no page size is given
+DEFAULT_PAGE_SIZE = 20
+
+
+class FakeJamaServer:
+    """
+    A local, in-memory stand-in for the part of the Jama REST API that jama_sync and jama_exec call: projects,
+    folders and test cases (abstract items, items, synced items and sync status), test plans, test cycles, test
+    runs, the current user and the OAuth token. Listings are paged like Jama (at most 50 results per page).
+
+    Every request can be slowed down by a fixed latency and every Nth request can be answered with a 429 so that
+    the request volume, concurrency and retry behaviour of the tools can be measured without a Jama instance.
+    The server only listens on localhost and does not check credentials.
+    """
+    def __init__(self, latency: float = 0.0, rate_limit_every: int = 0, retry_after: float = 0.05,
+                 page_cap: int = MAX_PAGE_SIZE, port: int = 0) -> None:
+        """
+        :latency: A number representing the seconds every request is delayed before it is answered
+        :rate_limit_every: An integer N, every Nth API request is answered with a 429 (0 turns this off)
+        :retry_after: A number representing the Retry-After (seconds) sent with an injected 429
+        :page_cap: An integer representing the largest page the server returns
+        :port: An integer representing the port to listen on (0 picks a free port)
+        """
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.page_cap = page_cap
+
+        self.projects = {}
+        self.items = {}
+        self.test_plans = {}
+        self.test_cycles = {}
+        self.test_runs = {}
+        self.current_user = {'id': 1, 'username': 'bench', 'firstName': 'Bench', 'lastName': 'User'}
+
+        self.request_counts = Counter()
+        self.rate_limited = 0
+        self.bytes_sent = 0
+        self._request_number = 0
+        self._next_id = 1000
+        self._next_global_id = 1
+        self._lock = threading.RLock()
+
+        self._routes = [
+            ('POST', r'/rest/oauth/token', self._post_token),
+            ('GET', r'/rest/v1/projects/?', self._get_projects),
+            ('GET', r'/rest/v1/projects/(\d+)', self._get_project),
+            ('GET', r'/rest/v1/users/current', self._get_current_user),
+            ('GET', r'/rest/v1/abstractitems/?', self._get_abstract_items),
+            ('GET', r'/rest/v1/items/(\d+)', self._get_item),
+            ('POST', r'/rest/v1/items/?', self._post_item),
+            ('PUT', r'/rest/v1/items/(\d+)', self._put_item),
+            ('GET', r'/rest/v1/items/(\d+)/synceditems', self._get_synced_items),
+            ('POST', r'/rest/v1/items/(\d+)/synceditems', self._post_synced_item),
+            ('GET', r'/rest/v1/items/(\d+)/synceditems/(\d+)/syncstatus', self._get_sync_status),
+            ('GET', r'/rest/v1/testplans/?', self._get_test_plans),
+            ('GET', r'/rest/v1/testplans/(\d+)', self._get_test_plan),
+            ('GET', r'/rest/v1/testplans/(\d+)/testcycles', self._get_test_cycles),
+            ('GET', r'/rest/v1/testplans/(\d+)/testcases', self._get_test_plan_test_cases),
+            ('GET', r'/rest/v1/testcycles/(\d+)', self._get_test_cycle),
+            ('GET', r'/rest/v1/testcycles/(\d+)/testruns', self._get_test_runs),
+            ('GET', r'/rest/v1/testruns/(\d+)', self._get_test_run),
+            ('PUT', r'/rest/v1/testruns/(\d+)', self._put_test_run),
+        ]
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), _FakeJamaRequestHandler)
+        self._server.daemon_threads = True
+        self._server.fake_jama = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """
+        Returns the base url to put in a tool's config.json as "jama_url"
+        """
+        return 'http://127.0.0.1:' + str(self._server.server_address[1])
+
+    @property
+    def total_requests(self) -> int:
+        return sum(self.request_counts.values())
+
+    def start(self) -> 'FakeJamaServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'FakeJamaServer':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def reset_request_counts(self) -> None:
+        with self._lock:
+            self.request_counts.clear()
+            self.rate_limited = 0
+            self.bytes_sent = 0
+
+    # ----------------------------------------------------------------------------------------------------------------
+    # Seeding
+    # ----------------------------------------------------------------------------------------------------------------
+    def add_project(self, name: str, project_key: str = None) -> int:
+        with self._lock:
+            project_id = self._new_id()
+            self.projects[project_id] = {
+                'id': project_id,
+                'projectKey': project_key or re.sub(r'[^A-Z0-9]', '', name.upper())[:10],
+                'isFolder': False,
+                'fields': {'name': name},
+            }
+            return project_id
+
+    def add_folder(self, project_id: int, name: str, parent_id: int = None) -> int:
+        location = {'item': parent_id} if parent_id else {'project': project_id}
+        return self._create_item(project_id, FOLDER_TYPE, TEST_CASE_TYPE, location, {'name': name})
+
+    def add_test_case(self, project_id: int, parent_id: int, name: str, fields: Dict = None,
+                      global_id: str = None) -> int:
+        item_fields = {
+            'name': name,
+            'description': '',
+            'testCaseSteps': [{'action': 'Run ' + name, 'expectedResult': 'It passes', 'notes': ''}],
+        }
+        item_fields.update(fields or {})
+        return self._create_item(project_id, TEST_CASE_TYPE, TEST_CASE_TYPE, {'item': parent_id}, item_fields,
+                                 global_id)
+
+    def add_test_plan(self, project_id: int, name: str) -> int:
+        with self._lock:
+            test_plan_id = self._new_id()
+            self.test_plans[test_plan_id] = {'id': test_plan_id, 'globalId': self._new_global_id(),
+                                             'documentKey': self.projects[project_id]['projectKey'] + '-TSTPL-' +
+                                             str(test_plan_id),
+                                             'project': project_id, 'itemType': TEST_PLAN_TYPE,
+                                             'fields': {'name': name}}
+            return test_plan_id
+
+    def add_test_cycle(self, test_plan_id: int, name: str) -> int:
+        with self._lock:
+            test_cycle_id = self._new_id()
+            project_id = self.test_plans[test_plan_id]['project']
+            self.test_cycles[test_cycle_id] = {'id': test_cycle_id, 'globalId': self._new_global_id(),
+                                               'documentKey': self.projects[project_id]['projectKey'] + '-TSTCY-' +
+                                               str(test_cycle_id),
+                                               'project': project_id,
+                                               'itemType': TEST_CYCLE_TYPE,
+                                               'fields': {'name': name, 'testPlan': test_plan_id}}
+            return test_cycle_id
+
+    def add_test_run(self, test_cycle_id: int, test_case_id: int) -> int:
+        with self._lock:
+            test_case = self.items[test_case_id]
+            test_cycle = self.test_cycles[test_cycle_id]
+            test_run_id = self._new_id()
+            self.test_runs[test_run_id] = {
+                'id': test_run_id,
+                'globalId': test_case['globalId'],
+                'documentKey': test_case['documentKey'] + '-RUN',
+                'project': test_cycle['project'],
+                'itemType': TEST_RUN_TYPE,
+                'fields': {
+                    'name': test_case['fields']['name'],
+                    'testCase': test_case_id,
+                    'testCycle': test_cycle_id,
+                    'testPlan': test_cycle['fields']['testPlan'],
+                    'testRunStatus': 'NOT_RUN',
+                    'testRunSteps': [dict(step, status='NOT_RUN')
+                                     for step in test_case['fields'].get('testCaseSteps', [])],
+                    'actualResults': '',
+                },
+            }
+            return test_run_id
+
+    def delete_test_cycle(self, test_cycle_id: int) -> None:
+        with self._lock:
+            del self.test_cycles[test_cycle_id]
+            for test_run_id in [test_run_id for test_run_id, test_run in self.test_runs.items()
+                                if test_run['fields']['testCycle'] == test_cycle_id]:
+                del self.test_runs[test_run_id]
+
+    def _new_id(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+    def _new_global_id(self) -> str:
+        global_id = 'GID-' + str(self._next_global_id)
+        self._next_global_id += 1
+        return global_id
+
+    def _create_item(self, project_id: int, item_type: int, child_item_type: int, location: Dict, fields: Dict,
+                     global_id: str = None) -> int:
+        with self._lock:
+            item_id = self._new_id()
+            if global_id is None:
+                global_id = self._new_global_id()
+            self.items[item_id] = {
+                'id': item_id,
+                'globalId': global_id,
+                'documentKey': self.projects[project_id]['projectKey'] + '-' + str(item_id),
+                'project': project_id,
+                'itemType': item_type,
+                'childItemType': child_item_type,
+                'location': {'parent': dict(location)},
+                'fields': dict(fields),
+            }
+            return item_id
+
+    # ----------------------------------------------------------------------------------------------------------------
+    # Request handling
+    # ----------------------------------------------------------------------------------------------------------------
+    def handle(self, handler: BaseHTTPRequestHandler) -> None:
+        """
+        Answer one HTTP request (called on the request's server thread)
+        """
+        method = handler.command
+        parsed_url = urlparse(handler.path)
+        params = parse_qs(parsed_url.query)
+        length = int(handler.headers.get('Content-Length') or 0)
+        raw_body = handler.rfile.read(length) if length else b''
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            self._request_number += 1
+            request_number = self._request_number
+            self.request_counts[method + ' ' + self.endpoint_name(parsed_url.path)] += 1
+
+        if self.rate_limit_every and request_number % self.rate_limit_every == 0 and \
+                not parsed_url.path.startswith('/rest/oauth'):
+            with self._lock:
+                self.rate_limited += 1
+            self._respond(handler, 429, {'meta': {'status': 'Too Many Requests', 'message': 'Rate limit exceeded'}},
+                          {'Retry-After': str(self.retry_after)})
+            return
+
+        for route_method, pattern, function in self._routes:
+            match = re.fullmatch(pattern, parsed_url.path)
+            if route_method == method and match:
+                try:
+                    body = json.loads(raw_body) if raw_body and method in ('POST', 'PUT') and \
+                        not parsed_url.path.startswith('/rest/oauth') else None
+                    with self._lock:
+                        status, payload = function(params, body, *[int(group) for group in match.groups()])
+                except KeyError as e:
+                    status, payload = 404, {'meta': {'status': 'Not Found', 'message': 'No such item ' + str(e)}}
+                self._respond(handler, status, payload)
+                return
+
+        self._respond(handler, 404, {'meta': {'status': 'Not Found', 'message': 'No such resource'}})
+
+    @staticmethod
+    def endpoint_name(path: str) -> str:
+        """
+        Return the resource path with ids replaced (e.g. /rest/v1/items/123/synceditems -> items/{id}/synceditems)
+        """
+        return endpoint_name(path.replace('/rest/v1/', '').replace('/rest/', ''))
+
+    def _respond(self, handler: BaseHTTPRequestHandler, status: int, payload: Dict, headers: Dict = None) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        with self._lock:
+            self.bytes_sent += len(body)
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _page(self, params: Dict, results: List[Dict]) -> Tuple[int, Dict]:
+        start_at = int(params.get('startAt', ['0'])[0])
+        page_size = min(int(params.get('maxResults', [str(DEFAULT_PAGE_SIZE)])[0]), self.page_cap)
+        page = results[start_at:start_at + page_size]
+        return 200, {
+            'meta': {'status': 'OK', 'pageInfo': {'startIndex': start_at, 'resultCount': len(page),
+                                                  'totalResults': len(results)}},
+            'data': page,
+        }
+
+    @staticmethod
+    def _created(item_id: int) -> Tuple[int, Dict]:
+        return 201, {'meta': {'status': 'Created', 'id': item_id}}
+
+    @staticmethod
+    def _ok(data: Optional[Dict] = None) -> Tuple[int, Dict]:
+        payload = {'meta': {'status': 'OK'}}
+        if data is not None:
+            payload['data'] = data
+        return 200, payload
+
+    def _post_token(self, params, body):
+        return 200, {'access_token': 'fake-token-' + str(self._request_number), 'token_type': 'bearer',
+                     'expires_in': 3600}
+
+    def _get_projects(self, params, body):
+        return self._page(params, list(self.projects.values()))
+
+    def _get_project(self, params, body, project_id):
+        return self._ok(self.projects[project_id])
+
+    def _get_current_user(self, params, body):
+        return self._ok(self.current_user)
+
+    def _get_abstract_items(self, params, body):
+        projects = {int(project) for project in params.get('project', [])}
+        item_types = {int(item_type) for item_type in params.get('itemType', [])}
+        contains = [term.lower() for term in params.get('contains', [])]
+
+        results = []
+        for item in sorted(list(self.items.values()) + list(self.test_plans.values()) +
+                           list(self.test_cycles.values()) + list(self.test_runs.values()),
+                           key=lambda abstract_item: abstract_item['id']):
+            if projects and item['project'] not in projects:
+                continue
+            if item_types and item['itemType'] not in item_types:
+                continue
+            if contains:
+                text = ' '.join([str(item['fields'].get('name', '')), str(item['fields'].get('description', '')),
+                                 item.get('globalId', ''), item.get('documentKey', '')]).lower()
+                if not any(term in text for term in contains):
+                    continue
+            results.append(item)
+        return self._page(params, results)
+
+    def _get_item(self, params, body, item_id):
+        return self._ok(self.items[item_id])
+
+    def _post_item(self, params, body):
+        global_id = body.get('globalId') if params.get('setGlobalIdManually', ['false'])[0].lower() == 'true' \
+            else None
+        return self._created(self._create_item(body['project'], body['itemType'], body.get('childItemType'),
+                                               body['location']['parent'], body['fields'], global_id))
+
+    def _put_item(self, params, body, item_id):
+        item = self.items[item_id]
+        item['fields'] = dict(body['fields'])
+        item['location'] = {'parent': dict(body['location']['parent'])}
+        return self._ok()
+
+    def _get_synced_items(self, params, body, item_id):
+        global_id = self.items[item_id]['globalId']
+        return self._page(params, [item for item in self.items.values()
+                                   if item['globalId'] == global_id and item['id'] != item_id])
+
+    def _post_synced_item(self, params, body, pool_item_id):
+        source_item = self.items[body['item']]
+        source_item['globalId'] = self.items[pool_item_id]['globalId']
+        return self._created(source_item['id'])
+
+    def _get_sync_status(self, params, body, item_id, synced_item_id):
+        return self._ok({'inSync': self.items[item_id]['fields'] == self.items[synced_item_id]['fields']})
+
+    def _get_test_plans(self, params, body):
+        projects = {int(project) for project in params.get('project', [])}
+        return self._page(params, [test_plan for test_plan in self.test_plans.values()
+                                   if not projects or test_plan['project'] in projects])
+
+    def _get_test_plan(self, params, body, test_plan_id):
+        return self._ok(self.test_plans[test_plan_id])
+
+    def _get_test_cycles(self, params, body, test_plan_id):
+        if test_plan_id not in self.test_plans:
+            raise KeyError(test_plan_id)
+        return self._page(params, [test_cycle for test_cycle in self.test_cycles.values()
+                                   if test_cycle['fields']['testPlan'] == test_plan_id])
+
+    def _get_test_plan_test_cases(self, params, body, test_plan_id):
+        if test_plan_id not in self.test_plans:
+            raise KeyError(test_plan_id)
+        # The test cases of a plan are the ones its cycles have runs of
+        test_case_ids = dict.fromkeys(test_run['fields']['testCase'] for test_run in self.test_runs.values()
+                                      if test_run['fields']['testPlan'] == test_plan_id)
+        return self._page(params, [self.items[test_case_id] for test_case_id in test_case_ids])
+
+    def _get_test_cycle(self, params, body, test_cycle_id):
+        return self._ok(self.test_cycles[test_cycle_id])
+
+    def _get_test_runs(self, params, body, test_cycle_id):
+        if test_cycle_id not in self.test_cycles:
+            raise KeyError(test_cycle_id)
+        return self._page(params, [test_run for test_run in self.test_runs.values()
+                                   if test_run['fields']['testCycle'] == test_cycle_id])
+
+    def _get_test_run(self, params, body, test_run_id):
+        return self._ok(self.test_runs[test_run_id])
+
+    def _put_test_run(self, params, body, test_run_id):
+        fields = self.test_runs[test_run_id]['fields']
+        fields.update(body['fields'])
+
+        # Jama derives the run status from its steps
+        step_statuses = [step.get('status', 'NOT_RUN') for step in fields.get('testRunSteps', [])]
+        if 'FAILED' in step_statuses:
+            fields['testRunStatus'] = 'FAILED'
+        elif 'BLOCKED' in step_statuses:
+            fields['testRunStatus'] = 'BLOCKED'
+        elif step_statuses and all(status == 'PASSED' for status in step_statuses):
+            fields['testRunStatus'] = 'PASSED'
+        elif step_statuses:
+            fields['testRunStatus'] = 'INPROGRESS' if any(status != 'NOT_RUN' for status in step_statuses) \
+                else 'NOT_RUN'
+        return self._ok()
+
+
+class _FakeJamaRequestHandler(BaseHTTPRequestHandler):
+    """
+    Hands every request to the FakeJamaServer, keep-alive is supported so that the pooled transport is exercised
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.fake_jama.handle(self)
+
+    do_POST = do_GET
+    do_PUT = do_GET
+    do_DELETE = do_GET
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,182 @@
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+
+DEFAULT_METRICS_DIRECTORY = Path.home() / '.jama_tools'
+
+# The phases that jama_sync and jama_exec time, calls made outside of a phase are reported under OTHER
+READ_FILES = 'read_files'
+RESOLVE_IDS = 'resolve_ids'
+PUSH = 'push'
+VERIFY = 'verify'
+WRITE_FILES = 'write_files'
+OTHER = 'other'
+
+
+def endpoint_name(resource: str) -> str:
+    """
+    Return the endpoint of a Jama REST resource path with its ids replaced, so that calls can be grouped
+
+    Args:
+        resource: A string representing the resource path relative to the REST API (e.g. items/123/synceditems)
+
+    Returns:
+        A string representing the endpoint (e.g. items/{id}/synceditems)
+    """
+    path = resource.split('?')[0].strip('/')
+    return re.sub(r'(?<![^/])\d+(?![^/])', '{id}', path)
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """
+    Return the nearest-rank percentile of a list of values (0 for an empty list)
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+class ApiMetrics:
+    """
+    Thread safe counters and timings of every Jama REST call, grouped by verb and endpoint, and the wall time of
+    each phase of a run (read files, resolve ids, push, verify). Phases do not overlap: entering a phase inside
+    another one pauses the outer phase until the inner one is left.
+    """
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Forget everything that was recorded and start the run's wall clock
+        """
+        with self._lock:
+            self.started_at = datetime.now()
+            self._started = time.perf_counter()
+            self.calls = defaultdict(lambda: {'calls': 0, 'retries': 0, 'errors': 0, 'bytes_sent': 0,
+                                              'bytes_received': 0, 'latencies': []})
+            self.phase_seconds = defaultdict(float)
+            self.phase_calls = defaultdict(int)
+            self._phase_stack = []
+            self._phase_started = time.perf_counter()
+
+    def record_call(self, method: str, resource: str, seconds: float, status_code: int = None, retries: int = 0,
+                    bytes_sent: int = 0, bytes_received: int = 0) -> None:
+        """
+        Record one Jama REST call (all of its retries count as one call)
+
+        Args:
+            method: A string representing the HTTP verb
+            resource: A string representing the resource path relative to the REST API
+            seconds: A number representing the time the call took, including its retries and their backoff
+            status_code: An integer representing the final response status (None if the call raised)
+            retries: An integer representing how many times the call was retried
+            bytes_sent: An integer representing the request body bytes of every attempt
+            bytes_received: An integer representing the response body bytes of every attempt
+
+        Returns:
+            None
+        """
+        with self._lock:
+            call = self.calls[method.upper() + ' ' + endpoint_name(resource)]
+            call['calls'] += 1
+            call['retries'] += retries
+            call['bytes_sent'] += bytes_sent
+            call['bytes_received'] += bytes_received
+            call['latencies'].append(seconds)
+            if status_code is None or status_code >= 400:
+                call['errors'] += 1
+            self.phase_calls[self._phase_stack[-1] if self._phase_stack else OTHER] += 1
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        Time the block as the given phase, e.g. 'with metrics.phase(PUSH):'
+        """
+        with self._lock:
+            now = time.perf_counter()
+            if self._phase_stack:
+                self.phase_seconds[self._phase_stack[-1]] += now - self._phase_started
+            self._phase_stack.append(name)
+            self._phase_started = now
+        try:
+            yield
+        finally:
+            with self._lock:
+                now = time.perf_counter()
+                self.phase_seconds[self._phase_stack.pop()] += now - self._phase_started
+                self._phase_started = now
+
+    def summary(self) -> Dict:
+        """
+        Returns a json serializable summary: latency percentiles, retries and bytes per endpoint and time per phase
+        """
+        with self._lock:
+            endpoints = {}
+            for endpoint, call in sorted(self.calls.items(), key=lambda item: -sum(item[1]['latencies'])):
+                latencies = call['latencies']
+                endpoints[endpoint] = {
+                    'calls': call['calls'],
+                    'retries': call['retries'],
+                    'errors': call['errors'],
+                    'bytes_sent': call['bytes_sent'],
+                    'bytes_received': call['bytes_received'],
+                    'total_ms': round(sum(latencies) * 1000, 1),
+                    'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+                    'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+                    'max_ms': round(max(latencies) * 1000, 1),
+                }
+
+            phases = {}
+            for phase in sorted(set(self.phase_seconds) | set(self.phase_calls)):
+                phases[phase] = {'seconds': round(self.phase_seconds.get(phase, 0.0), 3),
+                                 'calls': self.phase_calls.get(phase, 0)}
+
+            return {
+                'started_at': self.started_at.isoformat(timespec='seconds'),
+                'wall_seconds': round(time.perf_counter() - self._started, 3),
+                'calls': sum(endpoint['calls'] for endpoint in endpoints.values()),
+                'retries': sum(endpoint['retries'] for endpoint in endpoints.values()),
+                'bytes_sent': sum(endpoint['bytes_sent'] for endpoint in endpoints.values()),
+                'bytes_received': sum(endpoint['bytes_received'] for endpoint in endpoints.values()),
+                'phases': phases,
+                'endpoints': endpoints,
+            }
+
+    def write_summary(self, path, extra: Dict = None) -> Dict:
+        """
+        Write the summary as json (atomically, the directory is created if needed)
+
+        Args:
+            path: A string or Path representing the json file to write
+            extra: A dictionary of other values to add to the summary (e.g. the tool name)
+
+        Returns:
+            The summary that was written
+        """
+        summary = dict(extra or {})
+        summary.update(self.summary())
+
+        path = Path(path)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            file_descriptor, temporary_path = tempfile.mkstemp(dir=str(path.parent), prefix=path.name, suffix='.tmp')
+            with os.fdopen(file_descriptor, 'w') as file:
+                json.dump(summary, file, indent=2)
+            os.replace(temporary_path, str(path))
+        except OSError as e:
+            print("Warning: unable to write the Jama API metrics to " + str(path) + ": " + str(e))
+
+        return summary
@@ -0,0 +1,57 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+
+# Jama returns at most 50 results per page, asking for more silently returns 50
+MAX_PAGE_SIZE = 50
+DEFAULT_PAGE_WORKERS = 4
+
+
+def get_all_pages(transport, resource_path: str, params: Dict = None, check_response: Callable = None,
+                  page_size: int = MAX_PAGE_SIZE, workers: int = DEFAULT_PAGE_WORKERS, **kwargs) -> List[Dict]:
+    """
+    Return every result of a paged Jama resource. The first page is fetched on its own to learn 'totalResults',
+    then the remaining pages are fetched in parallel and merged back in page order
+
+    Args:
+        transport: A JamaTransport (or py_jama_rest_client Core) used to send the requests
+        resource_path: A string representing the resource path relative to the REST API (e.g. testplans)
+        params: A dictionary of query parameters sent with every page
+        check_response: A function that raises if a response is not successful (called for every page)
+        page_size: An integer representing the amount of results requested per page
+        workers: An integer representing the maximum amount of pages fetched at the same time
+        **kwargs: Any other keyword arguments passed to the transport's get
+
+    Returns:
+        A list of every result ('data') in page order
+    """
+    def get_page(start_at):
+        page_params = dict(params or {})
+        page_params['startAt'] = start_at
+        page_params['maxResults'] = page_size
+        response = transport.get(resource_path, params=page_params, **kwargs)
+        if check_response:
+            check_response(response)
+        return response.json()
+
+    first_page = get_page(0)
+    results = list(first_page.get('data') or [])
+
+    # Resources that are not paged have no page info, everything came back in the first response
+    page_info = first_page.get('meta', {}).get('pageInfo')
+    if not page_info:
+        return results
+
+    # Step by the amount of results the server actually returned in case it caps the page size lower
+    total_results = page_info['totalResults']
+    returned_page_size = page_info['resultCount']
+    if returned_page_size == 0 or returned_page_size >= total_results:
+        return results
+
+    start_indexes = range(page_info['startIndex'] + returned_page_size, total_results, returned_page_size)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(start_indexes)))) as executor:
+        # executor.map keeps the pages in the order they were submitted
+        for page in executor.map(get_page, start_indexes):
+            results.extend(page.get('data') or [])
+
+    return results
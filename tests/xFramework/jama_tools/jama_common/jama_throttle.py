@@ -0,0 +1,198 @@
+import random
+import threading
+import time
+
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+DEFAULT_REQUESTS_PER_SECOND = 20
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_MAX = 60
+
+# Server errors are only retried for verbs that can safely be sent twice, a POST that failed with a 5xx
+# may still have created the item. A 429 is always retried because Jama rejected the request outright
+IDEMPOTENT_METHODS = {'GET', 'PUT', 'DELETE', 'HEAD', 'OPTIONS'}
+
+
+class TokenBucket:
+    """
+    A thread safe token bucket that limits how many requests per second are sent to Jama. Every request takes
+    one token, tokens refill at a fixed rate up to the bucket capacity (the allowed burst)
+    """
+    def __init__(self, requests_per_second: float, capacity: float = None) -> None:
+        """
+        :requests_per_second: A number representing the refill rate (0 or None disables the limit)
+        :capacity: A number representing the largest burst of requests (defaults to one second of requests)
+        """
+        self.requests_per_second = requests_per_second
+        self.capacity = capacity or max(1.0, requests_per_second or 1.0)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._held_until = 0.0
+        self._lock = threading.Lock()
+
+    def hold(self, seconds: float) -> None:
+        """
+        Stop handing out tokens for a while (e.g. Jama answered 429 with a Retry-After), every thread waits
+
+        Args:
+            seconds: A number representing how long no request should be sent
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._held_until = max(self._held_until, time.monotonic() + seconds)
+
+    def acquire(self) -> float:
+        """
+        Block until a request may be sent
+
+        Returns:
+            A float representing the seconds this call waited
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._held_until:
+                    wait = self._held_until - now
+                elif not self.requests_per_second:
+                    return waited
+                else:
+                    self._tokens = min(self.capacity,
+                                       self._tokens + (now - self._updated_at) * self.requests_per_second)
+                    self._updated_at = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return waited
+                    wait = (1 - self._tokens) / self.requests_per_second
+            time.sleep(wait)
+            waited += wait
+
+
+class ThrottleStats:
+    """
+    Thread safe counters of how much a run was slowed down by the request budget and by Jama rate limiting
+    """
+    def __init__(self) -> None:
+        self.requests = 0
+        self.retries = 0
+        self.too_many_requests = 0
+        self.server_errors = 0
+        self.connection_errors = 0
+        self.budget_wait_seconds = 0.0
+        self.backoff_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record_request(self, waited: float) -> None:
+        with self._lock:
+            self.requests += 1
+            self.budget_wait_seconds += waited
+
+    def record_retry(self, status_code: Optional[int], delay: float) -> None:
+        with self._lock:
+            self.retries += 1
+            self.backoff_seconds += delay
+            if status_code is None:
+                self.connection_errors += 1
+            elif status_code == 429:
+                self.too_many_requests += 1
+            else:
+                self.server_errors += 1
+
+    @property
+    def throttled_seconds(self) -> float:
+        """
+        Returns the total seconds requests spent waiting, summed over every request (concurrent waits add up)
+        """
+        return self.budget_wait_seconds + self.backoff_seconds
+
+    def as_dict(self) -> dict:
+        """
+        Returns the counters as a json serializable dictionary
+        """
+        with self._lock:
+            return {name: value for name, value in vars(self).items() if not name.startswith('_')}
+
+    def summary(self) -> str:
+        """
+        Returns a one line summary for the end of a run
+        """
+        return ("Jama API throttling: " + str(self.requests) + " requests, " + str(self.retries) + " retries (" +
+                str(self.too_many_requests) + " x 429, " + str(self.server_errors) + " x 5xx, " +
+                str(self.connection_errors) + " connection errors), " +
+                "{:.1f}s waiting on the request budget, {:.1f}s backing off".format(self.budget_wait_seconds,
+                                                                                   self.backoff_seconds))
+
+
+class RetryPolicy:
+    """
+    Decides whether a Jama response is retried and how long to back off (exponential with full jitter,
+    or the server's Retry-After when it sends one)
+    """
+    def __init__(self, max_retries: int = DEFAULT_MAX_RETRIES, backoff_base: float = DEFAULT_BACKOFF_BASE,
+                 backoff_max: float = DEFAULT_BACKOFF_MAX) -> None:
+        """
+        :max_retries: An integer representing how many times a request is retried before giving up
+        :backoff_base: A number representing the backoff (in seconds) of the first retry
+        :backoff_max: A number representing the largest backoff (in seconds)
+        """
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    @staticmethod
+    def should_retry(method: str, status_code: Optional[int]) -> bool:
+        """
+        Args:
+            method: A string representing the HTTP verb of the request
+            status_code: An integer representing the response status (None if the connection failed)
+
+        Returns:
+            A boolean that indicates whether the request can be retried
+        """
+        if status_code == 429:
+            return True
+        if status_code is None or status_code in range(500, 600):
+            return method.upper() in IDEMPOTENT_METHODS
+        return False
+
+    def get_delay(self, attempt: int, response=None) -> float:
+        """
+        Return how long to wait before the next attempt
+
+        Args:
+            attempt: An integer representing the attempt that just failed (0 for the first request)
+            response: The requests Response that failed (None if the connection failed)
+
+        Returns:
+            A float representing the seconds to wait
+        """
+        retry_after = self.parse_retry_after(response.headers.get('Retry-After')) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def parse_retry_after(retry_after: Optional[str]) -> Optional[float]:
+        """
+        Args:
+            retry_after: The Retry-After header value, either seconds or an HTTP date
+
+        Returns:
+            A float representing the seconds to wait, or None if there was no (valid) header
+        """
+        if not retry_after:
+            return None
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
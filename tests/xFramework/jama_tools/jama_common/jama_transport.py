@@ -0,0 +1,291 @@
+import json
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from py_jama_rest_client.client import JamaClient, UnauthorizedException
+
+from jama_common.jama_metrics import ApiMetrics
+from jama_common.jama_paging import DEFAULT_PAGE_WORKERS, MAX_PAGE_SIZE, get_all_pages
+from jama_common.jama_throttle import (DEFAULT_MAX_RETRIES, DEFAULT_REQUESTS_PER_SECOND, RetryPolicy, ThrottleStats,
+                                       TokenBucket)
+
+
+DEFAULT_POOL_SIZE = 10
+
+# Refresh the OAuth token when less than this many seconds remain (same margin py_jama_rest_client uses)
+TOKEN_REFRESH_MARGIN = 60
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def body_size(data=None, json_body=None) -> int:
+    """
+    Return the size in bytes of a request body given as requests' 'data' or 'json' argument
+    """
+    if json_body is not None:
+        data = json.dumps(json_body)
+    if isinstance(data, str):
+        return len(data.encode('utf-8'))
+    if isinstance(data, bytes):
+        return len(data)
+    return 0
+
+
+class JamaTransport:
+    """
+    A pooled, keep-alive HTTP transport for the Jama REST API that is shared by jama_sync and jama_exec.
+
+    This is a drop-in replacement for py_jama_rest_client's Core (same get/post/put/patch/delete signatures), but
+    every call goes through one requests.Session with a sized connection pool and the OAuth token is reused
+    (thread safe) until it is about to expire instead of being checked out per client. Requests share one request
+    budget (token bucket) and are retried with backoff when Jama answers 429 or a server error.
+    """
+    def __init__(self, jama_url: str, username: str, password: str, pool_size: int = DEFAULT_POOL_SIZE,
+                 api_version: str = '/rest/v1/', verify: bool = True) -> None:
+        """
+        This class initializes the pooled session. The OAuth token is fetched on the first request
+
+        :jama_url: A string representing the url of the jama cloud to call the Jama API
+        :username: A string representing the username (client ID) of the person that is calling the Jama API
+        :password: A string representing the password (client secret) of the person that is calling the Jama API
+        :pool_size: An integer representing the amount of keep-alive connections kept open to Jama
+        :api_version: A string representing the Jama REST API version path
+        :verify: A boolean that indicates whether SSL certificates are verified
+        """
+        self.jama_url = jama_url
+        self.credentials = (username, password)
+        self.base_url = jama_url + api_version
+        self.token_url = jama_url + '/rest/oauth/token'
+        self.verify = verify
+        self.session = requests.Session()
+        self.pool_size = None
+        self.resize_pool(pool_size)
+
+        self._token = None
+        self._token_expires_at = 0.0
+        self._token_lock = threading.Lock()
+
+        self.throttle_stats = ThrottleStats()
+        self.configure_throttle()
+        self.metrics = ApiMetrics()
+
+    def resize_pool(self, pool_size: int) -> None:
+        """
+        Mount a connection pool of the given size for both http and https Jama urls
+
+        Args:
+            pool_size: An integer representing the amount of keep-alive connections kept open to Jama
+
+        Returns:
+            None
+        """
+        if pool_size < 1:
+            raise ValueError("The Jama connection pool size must be at least 1, got " + str(pool_size))
+
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.pool_size = pool_size
+
+    def get(self, resource, params=None, **kwargs):
+        """ This method will perform a get operation on the specified resource"""
+        return self.request('GET', resource, params=params, **kwargs)
+
+    def post(self, resource, params=None, data=None, json=None, **kwargs):
+        """ This method will perform a post operation on the specified resource"""
+        return self.request('POST', resource, params=params, data=data, json=json, **kwargs)
+
+    def put(self, resource, params=None, data=None, json=None, **kwargs):
+        """ This method will perform a put operation on the specified resource"""
+        return self.request('PUT', resource, params=params, data=data, json=json, **kwargs)
+
+    def patch(self, resource, params=None, data=None, json=None, **kwargs):
+        """ This method will perform a patch operation on the specified resource"""
+        return self.request('PATCH', resource, params=params, data=data, json=json, **kwargs)
+
+    def delete(self, resource, **kwargs):
+        """ This method will perform a delete operation on the specified resource"""
+        return self.request('DELETE', resource, **kwargs)
+
+    def request(self, method: str, resource: str, **kwargs) -> requests.Response:
+        """
+        Send an authenticated request to a Jama REST resource over the pooled session
+
+        Args:
+            method: A string representing the HTTP verb (e.g. GET)
+            resource: A string representing the resource path relative to the REST API (e.g. testruns/1234)
+            **kwargs: Any other keyword arguments accepted by requests
+
+        Returns:
+            The requests Response object
+        """
+        headers = dict(kwargs.pop('headers', None) or {})
+        kwargs['verify'] = self.verify
+
+        started = time.perf_counter()
+        request_size = body_size(kwargs.get('data'), kwargs.get('json'))
+        bytes_received = 0
+        attempt = 0
+        while True:
+            try:
+                response = self._send(method, resource, headers, **kwargs)
+                status_code = response.status_code
+                bytes_received += len(getattr(response, 'content', None) or b'')
+            except (requests.ConnectionError, requests.Timeout):
+                response = None
+                status_code = None
+                if attempt >= self.retry_policy.max_retries or not self.retry_policy.should_retry(method, None):
+                    self.metrics.record_call(method, resource, time.perf_counter() - started, None, attempt,
+                                             request_size * (attempt + 1), bytes_received)
+                    raise
+
+            if response is not None and (attempt >= self.retry_policy.max_retries or
+                                         not self.retry_policy.should_retry(method, status_code)):
+                self.metrics.record_call(method, resource, time.perf_counter() - started, status_code, attempt,
+                                         request_size * (attempt + 1), bytes_received)
+                # Out of retries the last response is returned as is, the caller's status handling raises on it
+                return response
+
+            delay = self.retry_policy.get_delay(attempt, response)
+            self.throttle_stats.record_retry(status_code, delay)
+            if status_code == 429:
+                # Jama limits the whole API user, so every thread sharing this transport holds off
+                self.bucket.hold(delay)
+            else:
+                time.sleep(delay)
+            attempt += 1
+
+    def _send(self, method: str, resource: str, headers: dict, **kwargs) -> requests.Response:
+        """
+        Send one attempt of a request once the request budget allows it
+        """
+        self.throttle_stats.record_request(self.bucket.acquire())
+
+        token = self.get_token()
+        headers['Authorization'] = 'Bearer ' + token
+        response = self.session.request(method, self.base_url + resource, headers=headers, **kwargs)
+
+        # The token can be revoked before it expires (e.g. the API user was edited), fetch a new one and retry once
+        if response.status_code == 401:
+            self.invalidate_token(token)
+            headers['Authorization'] = 'Bearer ' + self.get_token()
+            response = self.session.request(method, self.base_url + resource, headers=headers, **kwargs)
+
+        return response
+
+    def configure_throttle(self, requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND, burst: float = None,
+                           max_retries: int = DEFAULT_MAX_RETRIES) -> None:
+        """
+        Set the request budget and retry policy shared by every client that uses this transport
+
+        Args:
+            requests_per_second: A number representing the sustained requests per second (0 disables the budget)
+            burst: A number representing how many requests may be sent at once (defaults to one second worth)
+            max_retries: An integer representing how many times a rate limited or failed request is retried
+
+        Returns:
+            None
+        """
+        self.bucket = TokenBucket(requests_per_second, burst)
+        self.retry_policy = RetryPolicy(max_retries)
+
+    def get_token(self) -> str:
+        """
+        Return the current OAuth bearer token, fetching a new one if there is none or it is about to expire
+
+        Returns:
+            A string representing the OAuth bearer token
+        """
+        with self._token_lock:
+            if self._token is None or time.time() >= self._token_expires_at - TOKEN_REFRESH_MARGIN:
+                self._fetch_token()
+            return self._token
+
+    def invalidate_token(self, token: str = None) -> None:
+        """
+        Drop the cached OAuth token so that the next request fetches a new one
+
+        Args:
+            token: If given, the token is only dropped if it is still the current one (another thread may have
+                   already refreshed it)
+
+        Returns:
+            None
+        """
+        with self._token_lock:
+            if token is None or token == self._token:
+                self._token = None
+
+    def _fetch_token(self) -> None:
+        """
+        Fetch a new OAuth bearer token from the Jama OAuth token server (caller must hold the token lock)
+        """
+        # By getting the system time before we get the token we avoid a potential bug where the token may be expired
+        time_before_request = time.time()
+        started = time.perf_counter()
+        response = self.session.post(self.token_url, auth=self.credentials,
+                                     data={'grant_type': 'client_credentials'}, verify=self.verify)
+        self.metrics.record_call('POST', 'oauth/token', time.perf_counter() - started, response.status_code,
+                                 bytes_received=len(getattr(response, 'content', None) or b''))
+
+        if response.status_code not in (200, 201):
+            raise UnauthorizedException("Unable to retrieve a Jama OAuth token: check credentials and permissions.",
+                                        status_code=response.status_code,
+                                        reason=response.reason)
+
+        response_json = response.json()
+        self._token = response_json['access_token']
+        self._token_expires_at = time_before_request + response_json['expires_in']
+
+
+class PooledJamaClient(JamaClient):
+    """
+    A py_jama_rest_client JamaClient that sends all of its calls through a shared JamaTransport and fetches
+    every paged listing (abstract items, test runs, children, ...) with large pages in parallel
+    """
+    def __init__(self, transport: JamaTransport, page_workers: int = DEFAULT_PAGE_WORKERS) -> None:
+        """
+        JamaClient.__init__ is skipped on purpose, it would build its own Core and check out a second OAuth token
+
+        :transport: A JamaTransport that all of the client's API calls go through
+        :page_workers: An integer representing the maximum amount of pages of one listing fetched at the same time
+        """
+        self._JamaClient__credentials = transport.credentials
+        self._JamaClient__core = transport
+        self.transport = transport
+        self.page_workers = page_workers
+
+    def _JamaClient__get_all(self, resource, params=None, **kwargs):
+        """
+        Replaces JamaClient's private paging loop (20 results per page, one page at a time) for every listing
+        """
+        return get_all_pages(self.transport, resource, params, JamaClient._JamaClient__handle_response_status,
+                             MAX_PAGE_SIZE, self.page_workers, **kwargs)
+
+
+def get_transport(jama_url: str, username: str, password: str, pool_size: int = DEFAULT_POOL_SIZE) -> JamaTransport:
+    """
+    Return the JamaTransport for a Jama url and user, creating it on first use so that every JamaClientHelper
+    in the process shares one connection pool and one OAuth token
+
+    Args:
+        jama_url: A string representing the url of the jama cloud to call the Jama API
+        username: A string representing the username (client ID) of the person that is calling the Jama API
+        password: A string representing the password (client secret) of the person that is calling the Jama API
+        pool_size: An integer representing the amount of keep-alive connections kept open to Jama
+
+    Returns:
+        A shared JamaTransport
+    """
+    key = (jama_url, username, password)
+    with _transports_lock:
+        transport = _transports.get(key)
+        if transport is None:
+            transport = JamaTransport(jama_url, username, password, pool_size)
+            _transports[key] = transport
+        elif pool_size > transport.pool_size:
+            transport.resize_pool(pool_size)
+        return transport
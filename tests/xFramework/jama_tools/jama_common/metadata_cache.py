@@ -0,0 +1,226 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+
+DEFAULT_CACHE_PATH = Path.home() / '.jama_tools' / 'metadata_cache.json'
+DEFAULT_TTL_HOURS = 24
+
+PROJECTS = 'projects'
+TEST_PLANS = 'test_plans'
+TEST_CYCLES = 'test_cycles'
+ITEM_TYPES = 'item_types'
+
+
+def is_cached_item_current(transport, resource_path: str, name: str, parent_field: str = None,
+                           parent_id: Any = None) -> bool:
+    """
+    Returns whether a cached id still refers to the Jama item it was cached for: the item exists and still has the
+    name (and parent) it was looked up by. An item that was deleted, renamed or moved is not current, so a name that
+    was given to a new item is looked up again
+
+    Args:
+        transport: A JamaTransport (or py_jama_rest_client Core) used to send the request
+        resource_path: A string representing the resource path of the cached item (e.g. testcycles/1234)
+        name: A string representing the name the id was cached for
+        parent_field: A string representing the field that holds the item's parent id (e.g. testPlan), if any
+        parent_id: The parent id the item was cached under
+
+    Returns:
+        A boolean
+    """
+    response = transport.get(resource_path)
+    if response.status_code not in range(200, 300):
+        return False
+    item = response.json().get('data') or {}
+    fields = item.get('fields') or {}
+    if fields.get('name') != name:
+        return False
+    return parent_field is None or item.get(parent_field, fields.get(parent_field)) == parent_id
+
+
+class JamaMetadataCache:
+    """
+    A persistent, TTL based cache of Jama names to ids (projects, test plans, test cycles) shared by jama_sync
+    and jama_exec so that repeated runs do not have to list every project, plan and cycle again.
+
+    The cache is a single json file keyed by Jama url, then by kind (e.g. 'projects'), then by name. Only
+    lookups that succeeded are cached, a name that is not found is always looked up again.
+    """
+    def __init__(self, jama_url: str, cache_path=DEFAULT_CACHE_PATH, ttl_hours: float = DEFAULT_TTL_HOURS) -> None:
+        """
+        This class loads the cache file for the given Jama url (if it exists)
+
+        :jama_url: A string representing the url of the jama cloud, entries are kept separate per url
+        :cache_path: A path to the json cache file (shared by both tools by default)
+        :ttl_hours: A number representing how many hours an entry can be used before it is looked up again
+        """
+        self.jama_url = jama_url
+        self.cache_path = Path(cache_path)
+        self.ttl_seconds = ttl_hours * 3600
+        self._lock = threading.Lock()
+        self._entries = self._read_file().get(jama_url, {})
+        # The (kind, key) of the entries that were checked against Jama by this run
+        self._checked = set()
+
+    @staticmethod
+    def key(*parts) -> str:
+        """
+        Return a cache key for names that are only unique within a parent (e.g. a test plan within a project)
+
+        Args:
+            *parts: The parent ids and name that make up the key
+
+        Returns:
+            A string representing the cache key
+        """
+        return "/".join(str(part) for part in parts)
+
+    def get(self, kind: str, key: str) -> Optional[Any]:
+        """
+        Return the cached id for a name, or None if it is not cached or the entry has expired
+
+        Args:
+            kind: A string representing the kind of metadata (e.g. 'projects')
+            key: A string representing the name (or key) that was looked up
+
+        Returns:
+            The cached value or None
+        """
+        with self._lock:
+            entry = self._entries.get(kind, {}).get(key)
+        if entry is None or time.time() - entry['cached_at'] > self.ttl_seconds:
+            return None
+        return entry['value']
+
+    def get_checked(self, kind: str, key: str, is_current: Callable[[Any], bool]) -> Optional[Any]:
+        """
+        Return the cached id for a name like get, checked against Jama the first time this run uses it. An entry
+        that is no longer current (e.g. the item was deleted and a new one was created with the same name) is
+        removed, so the caller lists the items again
+
+        Args:
+            kind: A string representing the kind of metadata (e.g. 'projects')
+            key: A string representing the name (or key) that was looked up
+            is_current: A function that returns whether a cached value still refers to the same Jama item
+
+        Returns:
+            The cached value or None
+        """
+        value = self.get(kind, key)
+        if value is None or (kind, key) in self._checked:
+            return value
+        if not is_current(value):
+            self.invalidate(kind, key)
+            return None
+        self._checked.add((kind, key))
+        return value
+
+    def set(self, kind: str, key: str, value: Any) -> None:
+        """
+        Cache a single value and write the cache file
+
+        Args:
+            kind: A string representing the kind of metadata (e.g. 'projects')
+            key: A string representing the name (or key) that was looked up
+            value: The value (id) to cache
+
+        Returns:
+            None
+        """
+        self.update(kind, {key: value})
+
+    def update(self, kind: str, values: Dict[str, Any]) -> None:
+        """
+        Cache several values of the same kind at once (e.g. every project from one projects listing)
+        and write the cache file
+
+        Args:
+            kind: A string representing the kind of metadata (e.g. 'projects')
+            values: A dictionary of names (or keys) to values (ids)
+
+        Returns:
+            None
+        """
+        cached_at = time.time()
+        with self._lock:
+            kind_entries = self._entries.setdefault(kind, {})
+            for key, value in values.items():
+                kind_entries[key] = {'value': value, 'cached_at': cached_at}
+                # Just looked up, there is nothing to check
+                self._checked.add((kind, key))
+            self._write_file()
+
+    def invalidate(self, kind: str = None, key: str = None) -> None:
+        """
+        Remove entries from the cache. With no arguments every entry for this Jama url is removed
+
+        Args:
+            kind: A string representing the kind of metadata to remove (all kinds if None)
+            key: A string representing a single name to remove (all names of the kind if None)
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if kind is None:
+                self._entries = {}
+            elif key is None:
+                self._entries.pop(kind, None)
+            else:
+                self._entries.get(kind, {}).pop(key, None)
+            self._checked = {checked for checked in self._checked
+                             if (kind is not None and checked[0] != kind) or (key is not None and checked[1] != key)}
+            self._write_file()
+
+    def check_item_types(self, item_types: Dict[str, Any]) -> None:
+        """
+        Store the item type ids from config.json. If they differ from the ones the cache was built with,
+        the cache was built against a different Jama configuration, so every entry is invalidated first
+
+        Args:
+            item_types: A dictionary of config.json item type keys to their Jama ids
+
+        Returns:
+            None
+        """
+        cached_item_types = {key: self.get(ITEM_TYPES, key) for key in item_types}
+        if cached_item_types == item_types:
+            return
+
+        if any(value is not None for value in cached_item_types.values()):
+            self.invalidate()
+        self.update(ITEM_TYPES, item_types)
+
+    def _read_file(self) -> Dict:
+        """
+        Return the contents of the cache file, an unreadable or missing file is treated as an empty cache
+        """
+        try:
+            with open(self.cache_path, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_file(self) -> None:
+        """
+        Write this url's entries to the cache file (caller must hold the lock). Entries of other urls are kept
+        and the file is replaced atomically so that concurrent runs never read a half written file
+        """
+        contents = self._read_file()
+        contents[self.jama_url] = self._entries
+
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            file_descriptor, temp_path = tempfile.mkstemp(dir=str(self.cache_path.parent), suffix='.tmp')
+            with os.fdopen(file_descriptor, 'w') as file:
+                json.dump(contents, file, indent=2)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            # The cache is only an optimization, the run should never fail because it could not be written
+            print("\nWarning: unable to write the Jama metadata cache '" + str(self.cache_path) + "': " + str(e))
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from jama_common.fake_jama_server import TEST_CASE_TYPE, FakeJamaServer
+from jama_common.jama_transport import JamaTransport, PooledJamaClient
+
+
+@pytest.fixture
+def server():
+    with FakeJamaServer() as fake_server:
+        yield fake_server
+
+
+def make_client(server):
+    transport = JamaTransport(server.url, "user", "secret", pool_size=4)
+    transport.configure_throttle(0)
+    return PooledJamaClient(transport)
+
+
+def test_listings_are_paged(server):
+    project_id = server.add_project("Paged")
+    folder_id = server.add_folder(project_id, "root")
+    for number in range(120):
+        server.add_test_case(project_id, folder_id, "case " + str(number))
+
+    test_cases = make_client(server).get_abstract_items(project=[project_id], item_type=[TEST_CASE_TYPE])
+
+    assert [test_case['fields']['name'] for test_case in test_cases] == ["case " + str(i) for i in range(120)]
+    assert server.request_counts['GET abstractitems'] == 3
+
+
+def test_items_can_be_added_synced_and_updated(server):
+    master_id = server.add_project("Master")
+    other_id = server.add_project("Other")
+    master_case_id = server.add_test_case(master_id, server.add_folder(master_id, "root"), "case")
+    client = make_client(server)
+
+    new_case_id = client.post_item(other_id, TEST_CASE_TYPE, TEST_CASE_TYPE, {"item": server.add_folder(other_id, "root")},
+                                   dict(server.items[master_case_id]['fields']), global_id="PLACEHOLDER")
+    client.post_item_sync(new_case_id, master_case_id)
+
+    assert client.get_item(new_case_id)['globalId'] == server.items[master_case_id]['globalId']
+    assert [item['id'] for item in client.get_items_synceditems(master_case_id)] == [new_case_id]
+    assert client.get_items_synceditems_status(master_case_id, new_case_id) == {'inSync': True}
+
+    client.put_item(other_id, new_case_id, TEST_CASE_TYPE, TEST_CASE_TYPE, {"item": 1}, {'name': "changed"})
+    assert client.get_items_synceditems_status(master_case_id, new_case_id) == {'inSync': False}
+
+
+def test_test_run_status_follows_its_steps(server):
+    project_id = server.add_project("Runs")
+    test_case_id = server.add_test_case(project_id, server.add_folder(project_id, "root"), "case")
+    test_cycle_id = server.add_test_cycle(server.add_test_plan(project_id, "plan"), "cycle")
+    test_run_id = server.add_test_run(test_cycle_id, test_case_id)
+    client = make_client(server)
+
+    test_run, = client.get_testruns(test_cycle_id)
+    steps = [dict(step, status='FAILED') for step in test_run['fields']['testRunSteps']]
+    client.put_test_run(test_run_id, json.dumps({'fields': {'testRunSteps': steps}}))
+
+    assert server.test_runs[test_run_id]['fields']['testRunStatus'] == 'FAILED'
+
+
+def test_injected_429s_are_retried_by_the_transport():
+    with FakeJamaServer(rate_limit_every=2, retry_after=0.01) as server:
+        for number in range(5):
+            server.add_project("Project " + str(number))
+        transport = JamaTransport(server.url, "user", "secret", pool_size=4)
+        transport.configure_throttle(0)
+
+        for _ in range(4):
+            assert len(PooledJamaClient(transport).get_projects()) == 5
+
+        assert server.rate_limited == 4
+        assert transport.throttle_stats.too_many_requests == 4
+
+
+def test_unknown_items_are_not_found(server):
+    transport = JamaTransport(server.url, "user", "secret", pool_size=1)
+
+    assert transport.get("items/42").status_code == 404
+    assert transport.get("nothing/here").status_code == 404
@@ -0,0 +1,70 @@
+import json
+
+from jama_common.fake_jama_server import FakeJamaServer
+from jama_common.jama_metrics import PUSH, READ_FILES, VERIFY, ApiMetrics, endpoint_name, percentile
+from jama_common.jama_transport import JamaTransport, PooledJamaClient
+
+
+def test_endpoint_names_group_ids():
+    assert endpoint_name("items/123/synceditems/456/syncstatus") == "items/{id}/synceditems/{id}/syncstatus"
+    assert endpoint_name("testcycles/12/testruns?startAt=0") == "testcycles/{id}/testruns"
+    assert endpoint_name("abstractitems") == "abstractitems"
+
+
+def test_percentiles_use_nearest_rank():
+    values = [float(value) for value in range(1, 101)]
+
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 95) == 95.0
+    assert percentile(values, 100) == 100.0
+    assert percentile([], 95) == 0.0
+
+
+def test_calls_are_grouped_by_verb_and_endpoint():
+    metrics = ApiMetrics()
+    metrics.record_call("GET", "items/1", 0.010, 200, bytes_received=100)
+    metrics.record_call("GET", "items/2", 0.030, 200, retries=2, bytes_received=100)
+    metrics.record_call("PUT", "items/2", 0.020, 500, bytes_sent=50)
+
+    summary = metrics.summary()
+
+    assert summary['endpoints']['GET items/{id}'] == {'calls': 2, 'retries': 2, 'errors': 0, 'bytes_sent': 0,
+                                                     'bytes_received': 200, 'total_ms': 40.0, 'p50_ms': 10.0,
+                                                     'p95_ms': 30.0, 'max_ms': 30.0}
+    assert summary['endpoints']['PUT items/{id}']['errors'] == 1
+    assert (summary['calls'], summary['retries'], summary['bytes_sent']) == (3, 2, 50)
+    assert summary['phases'] == {'other': {'seconds': 0.0, 'calls': 3}}
+
+
+def test_nested_phases_do_not_overlap():
+    metrics = ApiMetrics()
+    with metrics.phase(PUSH):
+        metrics.record_call("PUT", "items/1", 0.01, 200)
+        with metrics.phase(VERIFY):
+            metrics.record_call("GET", "items/1/synceditems/2/syncstatus", 0.01, 200)
+    with metrics.phase(READ_FILES):
+        pass
+
+    summary = metrics.summary()
+
+    assert {phase: values['calls'] for phase, values in summary['phases'].items()} == \
+        {PUSH: 1, VERIFY: 1, READ_FILES: 0}
+    assert sum(values['seconds'] for values in summary['phases'].values()) <= summary['wall_seconds']
+
+
+def test_transport_records_retries_and_bytes(tmp_path):
+    with FakeJamaServer(rate_limit_every=2, retry_after=0.01) as server:
+        server.add_project("Metrics")
+        transport = JamaTransport(server.url, "user", "secret", pool_size=2)
+        transport.configure_throttle(0)
+        client = PooledJamaClient(transport)
+
+        client.get_projects()
+        client.get_projects()
+        summary = transport.metrics.write_summary(tmp_path / "metrics" / "summary.json", {'tool': 'test'})
+
+    assert summary['endpoints']['GET projects']['calls'] == 2
+    assert summary['endpoints']['GET projects']['retries'] == server.rate_limited
+    assert summary['bytes_received'] == server.bytes_sent
+    with open(tmp_path / "metrics" / "summary.json") as file:
+        assert json.load(file)['tool'] == 'test'
@@ -0,0 +1,72 @@
+import threading
+
+import pytest
+
+from jama_common.jama_paging import get_all_pages
+from jama_common.jama_transport import PooledJamaClient
+
+
+class FakeResponse:
+    def __init__(self, body, status_code=200):
+        self.status_code = status_code
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+class FakePagedTransport:
+    """
+    Serves a paged Jama listing of 'total' items and records the pages that were requested
+    """
+    def __init__(self, total, server_page_cap=50):
+        self.items = [{'id': i} for i in range(total)]
+        self.server_page_cap = server_page_cap
+        self.requested_pages = []
+        self.credentials = ('user', 'secret')
+        self.lock = threading.Lock()
+
+    def get(self, resource, params=None, **kwargs):
+        start_at = params['startAt']
+        page_size = min(params['maxResults'], self.server_page_cap)
+        with self.lock:
+            self.requested_pages.append((resource, start_at, params['maxResults']))
+        page = self.items[start_at:start_at + page_size]
+        return FakeResponse({
+            'meta': {'pageInfo': {'startIndex': start_at, 'resultCount': len(page), 'totalResults': len(self.items)}},
+            'data': page,
+        })
+
+
+@pytest.mark.parametrize("total, expected_requests", [(0, 1), (49, 1), (50, 1), (51, 2), (1234, 25)])
+def test_all_pages_are_fetched_in_order(total, expected_requests):
+    transport = FakePagedTransport(total)
+    results = get_all_pages(transport, "testplans", {"project": 10})
+
+    assert results == transport.items
+    assert len(transport.requested_pages) == expected_requests
+    assert {page_size for _, _, page_size in transport.requested_pages} == {50}
+
+
+def test_server_page_cap_is_respected():
+    transport = FakePagedTransport(105, server_page_cap=20)
+    results = get_all_pages(transport, "testruns", page_size=50)
+
+    assert results == transport.items
+    assert sorted(start_at for _, start_at, _ in transport.requested_pages) == [0, 20, 40, 60, 80, 100]
+
+
+def test_check_response_is_called_for_every_page():
+    checked = []
+    transport = FakePagedTransport(120)
+    get_all_pages(transport, "abstractitems", check_response=checked.append)
+
+    assert len(checked) == 3
+
+
+def test_pooled_client_listings_use_large_pages():
+    transport = FakePagedTransport(260)
+    client = PooledJamaClient(transport)
+
+    assert client.get_abstract_items(project=[10]) == transport.items
+    assert len(transport.requested_pages) == 6
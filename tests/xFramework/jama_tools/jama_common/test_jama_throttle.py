@@ -0,0 +1,107 @@
+import time
+
+import pytest
+import requests
+
+from jama_common import jama_transport
+from jama_common.jama_throttle import RetryPolicy, TokenBucket
+from jama_common.jama_transport import JamaTransport
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.reason = "fake"
+        self.headers = headers or {}
+
+    def json(self):
+        return {"access_token": "token", "expires_in": 3600}
+
+
+class FakeSession:
+    """
+    Stands in for requests.Session and answers requests with the queued responses (200 once they run out)
+    """
+    def __init__(self, responses=None):
+        self.responses = list(responses or [])
+        self.requests = []
+
+    def post(self, url, **kwargs):
+        return FakeResponse(200)
+
+    def request(self, method, url, **kwargs):
+        self.requests.append(method)
+        response = self.responses.pop(0) if self.responses else FakeResponse(200)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Records the backoff sleeps of the transport instead of sleeping"""
+    recorded = []
+    monkeypatch.setattr(jama_transport.time, "sleep", recorded.append)
+    return recorded
+
+
+def make_transport(responses, requests_per_second=0, max_retries=3):
+    transport = JamaTransport("https://jama.example.com", "user", "secret", pool_size=4)
+    transport.configure_throttle(requests_per_second, max_retries=max_retries)
+    transport.session = FakeSession(responses)
+    return transport
+
+
+def test_retry_after_is_honored_on_429():
+    transport = make_transport([FakeResponse(429, {"Retry-After": "0.2"})])
+
+    start = time.monotonic()
+    response = transport.post("items", json={})
+
+    assert response.status_code == 200
+    assert transport.session.requests == ["POST", "POST"]
+    assert time.monotonic() - start >= 0.2
+    assert transport.throttle_stats.too_many_requests == 1
+    assert transport.throttle_stats.throttled_seconds >= 0.2
+
+
+def test_server_errors_are_retried_with_backoff(sleeps):
+    transport = make_transport([FakeResponse(503), FakeResponse(502), requests.ConnectionError()])
+
+    assert transport.get("testruns").status_code == 200
+    assert len(sleeps) == 3
+    assert all(0 <= delay <= 0.5 * 2 ** attempt for attempt, delay in enumerate(sleeps))
+    assert (transport.throttle_stats.server_errors, transport.throttle_stats.connection_errors) == (2, 1)
+
+
+def test_server_errors_are_not_retried_for_post(sleeps):
+    transport = make_transport([FakeResponse(500)])
+
+    assert transport.post("items", json={}).status_code == 500
+    assert transport.session.requests == ["POST"]
+    assert sleeps == []
+
+
+def test_last_response_is_returned_when_retries_run_out(sleeps):
+    transport = make_transport([FakeResponse(500)] * 10, max_retries=2)
+
+    assert transport.put("testruns/1", json={}).status_code == 500
+    assert len(transport.session.requests) == 3
+    assert transport.throttle_stats.retries == 2
+
+
+def test_token_bucket_limits_the_request_rate():
+    bucket = TokenBucket(requests_per_second=50, capacity=5)
+
+    start = time.monotonic()
+    waited = sum(bucket.acquire() for _ in range(15))
+
+    # The first 5 requests are the burst, the other 10 are spread at 50 per second
+    assert time.monotonic() - start >= 0.18
+    assert waited >= 0.18
+
+
+@pytest.mark.parametrize("header, expected", [(None, None), ("7", 7.0), ("-3", 0.0), ("soon", None),
+                                              ("Wed, 21 Oct 2015 07:28:00 GMT", 0.0)])
+def test_retry_after_parsing(header, expected):
+    assert RetryPolicy.parse_retry_after(header) == expected
@@ -0,0 +1,97 @@
+import pytest
+
+from jama_common import jama_transport
+from jama_common.jama_transport import JamaTransport, PooledJamaClient, get_transport
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.reason = "fake"
+        self._body = body or {}
+
+    def json(self):
+        return self._body
+
+
+class FakeSession:
+    """
+    Stands in for requests.Session, records every call and hands out numbered OAuth tokens
+    """
+    def __init__(self, expires_in=3600, statuses=None):
+        self.expires_in = expires_in
+        self.statuses = list(statuses or [])
+        self.token_calls = 0
+        self.requests = []
+
+    def post(self, url, **kwargs):
+        self.token_calls += 1
+        return FakeResponse(200, {"access_token": "token-" + str(self.token_calls), "expires_in": self.expires_in})
+
+    def request(self, method, url, **kwargs):
+        self.requests.append((method, url, kwargs['headers']['Authorization']))
+        status = self.statuses.pop(0) if self.statuses else 200
+        return FakeResponse(status, {"meta": {"pageInfo": {"startIndex": 0, "resultCount": 0, "totalResults": 0}},
+                                     "data": []})
+
+
+def make_transport(**session_kwargs):
+    transport = JamaTransport("https://jama.example.com", "user", "secret", pool_size=4)
+    transport.session = FakeSession(**session_kwargs)
+    return transport
+
+
+def test_token_is_reused_across_requests():
+    transport = make_transport()
+    for _ in range(5):
+        transport.get("projects")
+    transport.put("testruns/1", data="{}")
+
+    assert transport.session.token_calls == 1
+    assert {auth for _, _, auth in transport.session.requests} == {"Bearer token-1"}
+    assert transport.session.requests[-1][:2] == ("PUT", "https://jama.example.com/rest/v1/testruns/1")
+
+
+def test_token_is_refreshed_when_it_expires():
+    # A token that expires inside the refresh margin is never reused
+    transport = make_transport(expires_in=jama_transport.TOKEN_REFRESH_MARGIN)
+    transport.get("projects")
+    transport.get("projects")
+
+    assert transport.session.token_calls == 2
+
+
+def test_revoked_token_is_replaced_once():
+    transport = make_transport(statuses=[401, 200])
+    response = transport.get("users/current")
+
+    assert response.status_code == 200
+    assert transport.session.token_calls == 2
+    assert [auth for _, _, auth in transport.session.requests] == ["Bearer token-1", "Bearer token-2"]
+
+
+def test_pool_size_is_mounted():
+    transport = JamaTransport("https://jama.example.com", "user", "secret", pool_size=16)
+    adapter = transport.session.get_adapter("https://jama.example.com/rest/v1/projects")
+
+    assert adapter._pool_maxsize == 16
+    with pytest.raises(ValueError):
+        transport.resize_pool(0)
+
+
+def test_transport_is_shared_per_user():
+    first = get_transport("https://shared.example.com", "user", "secret", pool_size=2)
+    second = get_transport("https://shared.example.com", "user", "secret", pool_size=8)
+    other_user = get_transport("https://shared.example.com", "other", "secret")
+
+    assert first is second
+    assert first.pool_size == 8
+    assert other_user is not first
+
+
+def test_pooled_client_uses_transport():
+    transport = make_transport()
+    client = PooledJamaClient(transport)
+    client.get_projects()
+
+    assert transport.session.requests[0][1] == "https://jama.example.com/rest/v1/projects"
@@ -0,0 +1,77 @@
+import json
+
+from jama_common.metadata_cache import ITEM_TYPES, JamaMetadataCache, PROJECTS, TEST_PLANS
+
+JAMA_URL = "https://jama.example.com"
+
+
+def test_values_persist_between_runs(tmp_path):
+    cache_path = tmp_path / "metadata_cache.json"
+    JamaMetadataCache(JAMA_URL, cache_path).update(PROJECTS, {"SANBOX_BI": 101, "BIP Master": 102})
+
+    next_run = JamaMetadataCache(JAMA_URL, cache_path)
+    assert next_run.get(PROJECTS, "SANBOX_BI") == 101
+    assert next_run.get(PROJECTS, "Unknown project") is None
+    # Entries are kept per Jama url
+    assert JamaMetadataCache("https://other.example.com", cache_path).get(PROJECTS, "SANBOX_BI") is None
+
+
+def test_entries_expire(tmp_path):
+    cache = JamaMetadataCache(JAMA_URL, tmp_path / "metadata_cache.json", ttl_hours=0)
+    cache.set(TEST_PLANS, JamaMetadataCache.key(101, "TST-123456 ProjectZ"), 555)
+
+    assert cache.get(TEST_PLANS, "101/TST-123456 ProjectZ") is None
+
+
+def test_invalidate(tmp_path):
+    cache_path = tmp_path / "metadata_cache.json"
+    cache = JamaMetadataCache(JAMA_URL, cache_path)
+    cache.update(PROJECTS, {"SANBOX_BI": 101, "BIP Master": 102})
+    cache.set(TEST_PLANS, "101/plan", 555)
+
+    cache.invalidate(PROJECTS, "SANBOX_BI")
+    assert cache.get(PROJECTS, "SANBOX_BI") is None
+    assert cache.get(PROJECTS, "BIP Master") == 102
+
+    cache.invalidate()
+    assert JamaMetadataCache(JAMA_URL, cache_path).get(TEST_PLANS, "101/plan") is None
+
+
+def test_cached_ids_are_checked_once_per_run(tmp_path):
+    cache_path = tmp_path / "metadata_cache.json"
+    JamaMetadataCache(JAMA_URL, cache_path).update(PROJECTS, {"SANBOX_BI": 101, "BIP Master": 102})
+
+    checked = []
+    next_run = JamaMetadataCache(JAMA_URL, cache_path)
+    assert next_run.get_checked(PROJECTS, "SANBOX_BI", lambda value: checked.append(value) or True) == 101
+    assert next_run.get_checked(PROJECTS, "SANBOX_BI", lambda value: checked.append(value) or True) == 101
+    assert checked == [101]
+
+    # An id that no longer refers to the project it was cached for is dropped, the caller lists the projects again
+    assert next_run.get_checked(PROJECTS, "BIP Master", lambda value: False) is None
+    assert JamaMetadataCache(JAMA_URL, cache_path).get(PROJECTS, "BIP Master") is None
+    next_run.set(PROJECTS, "BIP Master", 103)
+    assert next_run.get_checked(PROJECTS, "BIP Master", lambda value: False) == 103
+
+
+def test_changed_item_types_invalidate_cache(tmp_path):
+    cache = JamaMetadataCache(JAMA_URL, tmp_path / "metadata_cache.json")
+    cache.check_item_types({"default_test_case_api_type": 89})
+    cache.set(PROJECTS, "SANBOX_BI", 101)
+
+    cache.check_item_types({"default_test_case_api_type": 89})
+    assert cache.get(PROJECTS, "SANBOX_BI") == 101
+
+    cache.check_item_types({"default_test_case_api_type": 90})
+    assert cache.get(PROJECTS, "SANBOX_BI") is None
+    assert cache.get(ITEM_TYPES, "default_test_case_api_type") == 90
+
+
+def test_corrupt_cache_file_is_ignored(tmp_path):
+    cache_path = tmp_path / "metadata_cache.json"
+    cache_path.write_text("{not json")
+
+    cache = JamaMetadataCache(JAMA_URL, cache_path)
+    assert cache.get(PROJECTS, "SANBOX_BI") is None
+    cache.set(PROJECTS, "SANBOX_BI", 101)
+    assert json.loads(cache_path.read_text())[JAMA_URL][PROJECTS]["SANBOX_BI"]["value"] == 101
@@ -1,26 +1,97 @@
-from py_jama_rest_client.client import JamaClient, AlreadyExistsException, UnauthorizedException, \
+from py_jama_rest_client.client import AlreadyExistsException, UnauthorizedException, \
     ResourceNotFoundException, TooManyRequestsException, APIClientException, APIServerException, APIException
-from py_jama_rest_client.client import Core
 from halo import Halo
+from pathlib import Path
+import html
 import json
+import re
+import sys
+import threading
+
+# jama_common is shared with jama_sync and lives next to this tool in jama_tools
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from jama_common.jama_paging import MAX_PAGE_SIZE, get_all_pages  # noqa: E402
+from jama_common.jama_transport import DEFAULT_POOL_SIZE, PooledJamaClient, get_transport  # noqa: E402
+from jama_common.metadata_cache import JamaMetadataCache, PROJECTS, TEST_CYCLES, TEST_PLANS, \
+    is_cached_item_current  # noqa: E402
+
+
+def normalize_test_case_name(test_case_name):
+    """
+    Return a test case name the way names are compared: case and surrounding or repeated whitespace are ignored
+    """
+    return " ".join(str(test_case_name).split()).lower()
+
+
+def format_global_id(global_id):
+    """
+    Return a global id as Jama shows it (e.g. 1234 -> GID-1234, gid-1234 -> GID-1234)
+    """
+    if isinstance(global_id, int):
+        return "GID-" + str(global_id)
+    return str(global_id).strip().upper()
+
+
+def format_result_message(result_message):
+    """
+    Return a result message as it is pushed to a test run's actual results (one paragraph per line)
+    """
+    return result_message.replace("\n", "</p>\n\n<p>")
+
+
+def normalize_result_message(actual_results):
+    """
+    Return the text of a test run's actual results the way they are compared: Jama may store the rich text with other
+    markup than was pushed, so the tags, entities and whitespace are ignored
+    """
+    return " ".join(html.unescape(re.sub(r'<[^>]*>', ' ', actual_results or '')).split())
+
+
+def test_run_has_result(test_run, status, result_message):
+    """
+    Returns whether a test run (from get_test_runs) already has a result in Jama: the run and each of its steps have
+    the status and the actual results are the result message
+
+    Args:
+        test_run: A dictionary representing the Jama test run
+        status: A string representing the Jama status of the result (e.g. PASSED)
+        result_message: A string representing the actual results message of the result
+    """
+    fields = test_run['fields']
+    if fields.get('testRunStatus') != status:
+        return False
+    if any(step.get('status') != status for step in fields.get('testRunSteps') or []):
+        return False
+    return normalize_result_message(fields.get('actualResults')) == \
+        normalize_result_message(format_result_message(result_message))
 
 
 class JamaClientHelper:
     """
     A class to reference the py_jama_rest_client api functions
     """
-    def __init__(self, jama_url, username, password):
+    def __init__(self, jama_url, username, password, pool_size=DEFAULT_POOL_SIZE, metadata_cache=None):
         """
         This class initializes the Jama Client and handles the API calls
 
         :jama_url: A string representing the url of the jama cloud to call the Jama API
         :username: A string representing the username of the person that is calling the Jama API
         :password: A string representing the password of the person that is calling the Jama API
+        :pool_size: An integer representing the amount of keep-alive connections kept open to Jama
+        :metadata_cache: A JamaMetadataCache for project, test plan and test cycle ids (default cache if None)
         """
-        self.jama_client = JamaClient(host_domain=jama_url, credentials=(username, password), oauth=True)
-        self.jama_core = Core(host_name=jama_url, user_credentials=(username, password), oauth=True)
+        # The client and the raw core calls share one pooled session and OAuth token
+        self.jama_core = get_transport(jama_url, username, password, pool_size)
+        self.jama_client = PooledJamaClient(self.jama_core)
+        # Per endpoint latencies and per phase timings of the run, shared with every client of the transport
+        self.metrics = self.jama_core.metrics
+        self.metadata_cache = metadata_cache if metadata_cache is not None else JamaMetadataCache(jama_url)
         self.spinner = Halo(text='Waiting for Jama API', spinner='dots')
 
+        # Per test plan index of its test cases by normalized name, global id and item id, filled once per run
+        self.test_plan_indexes = {}
+        self._test_plan_lock = threading.Lock()
+
     def get_project_id(self, project_name):
         """
         Return the project ID that matches with the project name that is passed as an argument
@@ -30,47 +101,44 @@ class JamaClientHelper:
 
         Returns: An integer that indicates the project ID associated with the JAMA project
         """
+        # A cached id is checked once per run, a deleted or renamed project is listed again
+        project_id = self.metadata_cache.get_checked(PROJECTS, project_name, lambda cached_id: is_cached_item_current(
+            self.jama_core, "projects/" + str(cached_id), project_name))
+        if project_id is not None:
+            return project_id
 
         self.spinner.start("Retrieving project ID for " + project_name + " from Jama API")
         projects = self.jama_client.get_projects()
         self.spinner.stop()
 
-        # Search through the projects available on Jama and find the matching name
-        project_id = ''
+        # Cache every project from the listing so that the other projects do not need another listing
+        project_ids = {}
         for project in projects:
-            if isinstance(project, dict):
-                if project_name == project['fields']['name'] and not project['isFolder']:
-                    project_id = project['id']
+            if isinstance(project, dict) and not project['isFolder']:
+                project_ids[project['fields']['name']] = project['id']
+        self.metadata_cache.update(PROJECTS, project_ids)
 
-        if project_id == '':
+        if project_name not in project_ids:
             raise Exception("No such JAMA project is named '" + project_name + "'")
 
-        return project_id
+        return project_ids[project_name]
 
-    def get_all_responses(self, resource_path, params, allowed_results=10):
+    def get_all_responses(self, resource_path, params, allowed_results=MAX_PAGE_SIZE):
         """
-        Will cycle through all items, even if they are paged
-        Taken from https://community.jamasoftware.com/blogs/john-lastname/2017/09/29/managing-multiple-pages-of-results-in-the-jama-rest-api
+        Will cycle through all items, even if they are paged. The first page reports the total amount of
+        results, the remaining pages are then fetched in parallel and merged in page order
+        Based on https://community.jamasoftware.com/blogs/john-lastname/2017/09/29/managing-multiple-pages-of-results-in-the-jama-rest-api
         """
-        max_results = "maxResults=" + str(allowed_results)  
-
-        result_count = -1  
-        start_index = 0  
-        total_results = []
-        while result_count != 0:  
-            start_at = "startAt=" + str(start_index)
-            url = resource_path + "?" + start_at + "&" + max_results
-            response = self.jama_core.get(url, params=params)
-            self.__handle_response_status(response)
-            json_response = response.json()
-            page_info = json_response["meta"]["pageInfo"]
-            test_plans = json_response['data']
-            total_results += test_plans
-            start_index = page_info["startIndex"] + allowed_results  
-            result_count = page_info["resultCount"]
-        return total_results
+        return get_all_pages(self.jama_core, resource_path, params, self.__handle_response_status,
+                             page_size=allowed_results)
 
     def get_test_plan_id(self, project_id, test_plan_name):
+        cache_key = JamaMetadataCache.key(project_id, test_plan_name)
+        test_plan_id = self.metadata_cache.get_checked(TEST_PLANS, cache_key, lambda cached_id: is_cached_item_current(
+            self.jama_core, "testplans/" + str(cached_id), test_plan_name, 'project', project_id))
+        if test_plan_id is not None:
+            return test_plan_id
+
         self.spinner.start("Retrieving available Jama Test Plans")
         try:
             params = {"project": project_id}
@@ -82,37 +150,43 @@ class JamaClientHelper:
             return -1
         self.spinner.stop()
 
-        test_plan_id = ""
+        test_plan_ids = {}
         for test_plan in test_plans:
-            if test_plan['fields']['name'] == test_plan_name:
-                test_plan_id = test_plan['id']
+            test_plan_ids[JamaMetadataCache.key(project_id, test_plan['fields']['name'])] = test_plan['id']
+        self.metadata_cache.update(TEST_PLANS, test_plan_ids)
 
-        if test_plan_id == '':
+        if cache_key not in test_plan_ids:
             raise Exception("No such JAMA test plan '" + test_plan_name + "' in the project that you entered")
 
-        return test_plan_id
+        return test_plan_ids[cache_key]
 
     def get_test_cycle_id(self, test_plan_id, test_cycle_name):
+        cache_key = JamaMetadataCache.key(test_plan_id, test_cycle_name)
+        # A test cycle that was deleted and created again under the same name has a new id
+        test_cycle_id = self.metadata_cache.get_checked(
+            TEST_CYCLES, cache_key, lambda cached_id: is_cached_item_current(
+                self.jama_core, "testcycles/" + str(cached_id), test_cycle_name, 'testPlan', test_plan_id))
+        if test_cycle_id is not None:
+            return test_cycle_id
+
         self.spinner.start("Retrieving available Jama test cycles")
         try:
             resource_path = "testplans/" + str(test_plan_id) + "/testcycles"
-            response = self.jama_core.get(resource_path)
-            self.__handle_response_status(response)
-            test_plans = response.json()['data']
+            test_plans = self.get_all_responses(resource_path, None)
         except Exception as e:
             print("\n" + str(e))
             return -1
         self.spinner.stop()
 
-        test_cycle_id = ""
-        for test_plan in test_plans:
-            if test_plan['fields']['name'] == test_cycle_name:
-                test_cycle_id = test_plan['id']
+        test_cycle_ids = {}
+        for test_cycle in test_plans:
+            test_cycle_ids[JamaMetadataCache.key(test_plan_id, test_cycle['fields']['name'])] = test_cycle['id']
+        self.metadata_cache.update(TEST_CYCLES, test_cycle_ids)
 
-        if test_cycle_id == '':
+        if cache_key not in test_cycle_ids:
             raise Exception("No such JAMA test cycle '" + test_cycle_name + "' in the test plan that you entered")
 
-        return test_cycle_id
+        return test_cycle_ids[cache_key]
 
     def get_test_runs(self, test_cycle_id):
         self.spinner.start("Retrieving test cycle")
@@ -125,12 +199,37 @@ class JamaClientHelper:
         return response
 
     def update_test_run(self, test_run, status, result_message, duration_in_seconds, user_jama_id, bulk_comment):
+        self.spinner.start("Pushing status '" + status + "' to test case: '" + test_run['fields']['name'] + "'")
+        try:
+            self.push_test_run(test_run, status, result_message, duration_in_seconds, user_jama_id)
+        except Exception as e:
+            print("\nUnable to push status '" + status + "' to test case: '" +
+                  test_run['fields']['name'] + "' due to the following error: " + str(e))
+            return -1
+        self.spinner.stop()
+
+        print("Pushed status " + status + " to test case: " + test_run['fields']['name'])
+
+    def push_test_run(self, test_run, status, result_message, duration_in_seconds, user_jama_id):
+        """
+        PUT a test run result to Jama without any spinner or console output so that it can be called from
+        several worker threads at once. Errors are raised to the caller instead of being printed
+
+        Args:
+            test_run: A dictionary representing the Jama test run (from get_test_runs)
+            status: A string representing the Jama status to push (e.g. PASSED)
+            result_message: A string representing the actual results message
+            duration_in_seconds: A number representing the runtime of the test
+            user_jama_id: An integer representing the Jama user the run is assigned to
+
+        Returns: An integer representing the HTTP status of the update
+        """
         test_run_id = test_run['id']
         test_run_steps = test_run['fields']['testRunSteps']
         for test_run_step in test_run_steps:
             test_run_step['status'] = status
 
-        formatted_result_message = result_message.replace("\n", "</p>\n\n<p>")
+        formatted_result_message = format_result_message(result_message)
 
         body = {
             "fields": {
@@ -141,23 +240,51 @@ class JamaClientHelper:
                 # "testRunComments$37": bulk_comment
             }
         }
-        self.spinner.start("Pushing status '" + status + "' to test case: '" + test_run['fields']['name'] + "'")
-        try:
-            resource_path = "testruns/" + str(test_run_id)
-            headers = {'content-type': 'application/json'}
-            response = self.jama_core.put(resource_path, data=json.dumps(body), headers=headers)
-            self.__handle_response_status(response)
-        except Exception as e:
-            print("\nUnable to push status '" + status + "' to test case: '" +
-                  test_run['fields']['name'] + "' due to the following error: " + str(e))
-            return -1
-        self.spinner.stop()
+        resource_path = "testruns/" + str(test_run_id)
+        headers = {'content-type': 'application/json'}
+        response = self.jama_core.put(resource_path, data=json.dumps(body), headers=headers)
+        status_code = self.__handle_response_status(response)
+
+        # Keep the listed test run as Jama now shows it, a result read again (e.g. a watched file that is rewritten)
+        # is then only pushed if it changed
+        test_run['fields']['testRunStatus'] = status
+        test_run['fields']['actualResults'] = formatted_result_message
+        return status_code
+
+    def get_test_plan_index(self, test_plan_id):
+        """
+        Return an index of the test cases in a test plan. The test plan's test cases are listed (paged) once per run,
+        every name and global id lookup in the test plan is answered from the index
 
-        print("Pushed status " + status + " to test case: " + test_run['fields']['name'])
+        Args:
+            test_plan_id: An int representing the test plan ID
+
+        Returns: A dictionary with the test case items of the plan by 'names' (see normalize_test_case_name),
+                 'global_ids' (e.g. GID-1234) and 'ids' (item id)
+        """
+        with self._test_plan_lock:
+            if test_plan_id in self.test_plan_indexes:
+                return self.test_plan_indexes[test_plan_id]
+
+            self.spinner.start("Indexing the test cases of test plan " + str(test_plan_id) + " from Jama API")
+            try:
+                test_cases = self.get_all_responses("testplans/" + str(test_plan_id) + "/testcases", None)
+            finally:
+                self.spinner.stop()
+
+            index = {'names': {}, 'global_ids': {}, 'ids': {}}
+            for test_case in test_cases:
+                # The first test case wins if a name is used twice, as the first search result did before
+                index['names'].setdefault(normalize_test_case_name(test_case['fields']['name']), test_case)
+                index['global_ids'].setdefault(test_case['globalId'], test_case)
+                index['ids'][test_case['id']] = test_case
+            self.test_plan_indexes[test_plan_id] = index
+
+            return index
 
     def get_global_id_from_test_case_name_and_test_plan(self, project, project_id, test_case_name, test_plan_id):
         """
-        Return the global id from the test case name and test plan id used
+        Return the global id from the test case name and test plan id used (answered from the test plan index)
 
         Args:
             project: A string representing the project name of a JAMA project
@@ -165,21 +292,16 @@ class JamaClientHelper:
             test_case_name: A string representing the test case name of a test case
             test_plan_id: An int representing the test plan ID of a test case
 
-        Returns: An integer that represents the test case id of the test case
-                 that has the same global id in the JAMA project that was passed in.
-                 If there were no test case IDs, a -1 will be passed back
+        Returns: An integer that represents the global id number of the test case in the test plan that has the
+                 name, None if no test case in the test plan has it
         """
-        abstract_items = self.jama_client.get_abstract_items(project=[project_id], contains=[test_case_name])        
+        test_case = self.get_test_plan_index(test_plan_id)['names'].get(normalize_test_case_name(test_case_name))
+        if test_case is None:
+            return None
 
-        if abstract_items:
-            for test_case in abstract_items:
-                if 'testPlan' in test_case['fields'].keys():
-                    if test_case['fields']['testPlan'] == test_plan_id and test_case['fields']['name'].rstrip().lower() == test_case_name.rstrip().lower():
-                        return int(test_case['globalId'].strip('GID-'))
-        else:
-            return -1
+        return int(test_case['globalId'].strip('GID-'))
 
-    def get_test_case_id_from_global_id(self, project, project_id, global_id):
+    def get_test_case_id_from_global_id(self, project, project_id, global_id, test_plan_id=None):
         """
         Return the test case id based upon project ID and the global ID
 
@@ -187,11 +309,16 @@ class JamaClientHelper:
             project: A string representing the project name of a JAMA project
             project_id: An integer representing the project ID of a JAMA project
             global_id: An integer representing the global ID of a test case
+            test_plan_id: An int representing a test plan ID, if given the test case is looked up in the test plan
+                          index instead of searching the project
 
         Returns: An integer that represents the test case id of the test case
                  that has the same global id in the JAMA project that was passed in.
                  If there were no test case IDs, a -1 will be passed back
         """
+        if test_plan_id is not None:
+            test_case = self.get_test_plan_index(test_plan_id)['global_ids'].get(format_global_id(global_id))
+            return test_case['id'] if test_case is not None else -1
 
         self.spinner.start("Retrieving test case ID from Jama API")
         abstract_items = self.jama_client.get_abstract_items(project=[project_id], contains=[global_id])
@@ -202,6 +329,20 @@ class JamaClientHelper:
         #     raise Exception("More than one test case with global id '" + global_id +
         #                     "' was found was found in project '" + project + "'")
 
+        return self.find_test_case_id(abstract_items, global_id)
+
+    @staticmethod
+    def find_test_case_id(abstract_items, global_id):
+        """
+        Return the test case id of the abstract item that has the global id
+
+        Args:
+            abstract_items: A list of Jama abstract items (from a 'contains' search on the global id)
+            global_id: A string representing the global ID of a test case
+
+        Returns: An integer that represents the test case id, None if no item matched
+                 and -1 if there were no abstract items
+        """
         if abstract_items:
             for test_case in abstract_items:
                 if test_case['globalId'] == global_id:
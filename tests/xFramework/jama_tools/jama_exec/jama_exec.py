@@ -4,29 +4,49 @@
 import argparse
 import sys
 import glob
-import html
 
-from jama_api import JamaClientHelper
+from jama_api import DEFAULT_POOL_SIZE, JamaClientHelper, test_run_has_result
+from jama_common.jama_metrics import DEFAULT_METRICS_DIRECTORY, PUSH, READ_FILES, RESOLVE_IDS, VERIFY
+from jama_common.jama_throttle import DEFAULT_MAX_RETRIES, DEFAULT_REQUESTS_PER_SECOND
+from jama_common.metadata_cache import DEFAULT_CACHE_PATH, DEFAULT_TTL_HOURS, JamaMetadataCache
 import io
 import os
 import fileinput
 import json
 import traceback
-from junitparser import JUnitXml
-from result_test import TestResult
+from xml.etree import ElementTree
+from concurrent.futures import ThreadPoolExecutor
+from name_matcher import DEFAULT_NEAR_MATCH_THRESHOLD, NameIndex
+from result_reader import LAST_ATTEMPT, find_result_files, iter_test_results, merge_test_results, read_result_files
+from result_watcher import DEFAULT_IDLE_SECONDS, DEFAULT_POLL_SECONDS, ResultWatcher
 
 
-def initialize_jama_client(jama_username, jama_password, config):
+def initialize_jama_client(jama_username, jama_password, config, refresh_cache=False, workers=1):
     """
     Return an initialized JamaClientHelper
 
     Args:
         jama_username: Username for the jama client in the constants
         jama_password: Password for the jama client in the constants
+        config: Dictionary of variables (optionally containing 'jama_pool_size', the request budget and the metadata
+                cache settings)
+        refresh_cache: A boolean that indicates whether the cached Jama metadata should be thrown away first
+        workers: An integer representing the amount of concurrent uploads (the pool is at least this big)
 
-    Returns: A string containing the test case section
+    Returns: An initialized JamaClientHelper
     """
-    return JamaClientHelper(config['jama_url'], jama_username, jama_password)
+    metadata_cache = JamaMetadataCache(config['jama_url'],
+                                       config.get('metadata_cache_path', DEFAULT_CACHE_PATH),
+                                       config.get('metadata_cache_ttl_hours', DEFAULT_TTL_HOURS))
+    if refresh_cache:
+        metadata_cache.invalidate()
+
+    pool_size = max(config.get('jama_pool_size', DEFAULT_POOL_SIZE), workers)
+    jama_client = JamaClientHelper(config['jama_url'], jama_username, jama_password, pool_size, metadata_cache)
+    jama_client.jama_core.configure_throttle(config.get('jama_requests_per_second', DEFAULT_REQUESTS_PER_SECOND),
+                                             config.get('jama_burst'),
+                                             config.get('jama_max_retries', DEFAULT_MAX_RETRIES))
+    return jama_client
 
 
 def parse_args(args):
@@ -44,6 +64,10 @@ def parse_args(args):
     parser.add_argument("--config_file", help="Path to config.json (default is same directory as executable)", required=False, default='config.json')
     parser.add_argument("--config_path", help="Path to config.json (default is same directory as executable)", required=False, default=os.path.dirname(__file__))    
     parser.add_argument("--compare", help="Compare tests in xml and jama test plan and show overlap and outliers", required=False, action='store_true', default=False)
+    parser.add_argument("--refresh-cache", help="Ignore and rebuild the cached Jama project, test plan and test cycle ids", required=False, action='store_true', default=False)
+    parser.add_argument("--workers", help="Amount of test run results pushed to Jama at the same time (default 1, sequential)", required=False, type=int, default=1)
+    parser.add_argument("--full-upload", help="Push every test run result, also the ones that Jama already shows (by default only changed results are pushed)", required=False, action='store_true', default=False)
+    parser.add_argument("--watch", metavar="WATCH_DIR", help="Watch a results directory and push the results of each result file as soon as it is written, instead of reading 'path_to_test_results' once", required=False, default=None)
     return parser.parse_args(args)
 
 
@@ -74,55 +98,46 @@ def check_version_in_test_cycle(test_version, jama_test_cycle):
                         "the Jama test cycle and try again")
 
 
-def read_results_from_suites(xml_suite, test_results_list, config):
+def read_output_xml_file(xml_file, config):
     """
-    Read the output xml file (formatted to read from a suite) and return a list of Test Result objects
+    Read the output xml file and return a list of Test Result objects
 
     Args:
-        xml_suite: An xml file output formatted as a single xml suite
-        test_results_list: A list of test results that test results are getting added to
+        xml_file: A string that contains the path to the xml output file that will be read (JUnit/xUnit from pytest or
+                  robot, or robot's own output.xml)
 
     Returns: A list of Test Result objects
     """
-    for case in xml_suite:
-        case_name = html.unescape(case.name)
-        if case.result and hasattr(case.result, '_tag'):
-            if case.result._tag != "skipped":
-                new_result = TestResult(case_name, case.time, "FAILED")
-                new_result.set_failed(case.result._tag, case.result.message,
-                                      config['jama_test_plan'], config['test_version_and_release_candidate'])
-                test_results_list.append(new_result)
-        else:
-            new_result = TestResult(case_name, case.time, "PASSED")
-            new_result.set_passed(config['jama_test_plan'], config['test_version_and_release_candidate'])
-            print(f'THIS IS THE CASE NAME {case_name}')
-            test_results_list.append(new_result)
-    return test_results_list
+    print("---------------------Reading from " + xml_file + "---------------------")
+    # The file is streamed (see result_reader.iter_test_results), only the test results themselves are kept
+    return list(iter_test_results(xml_file, config))
 
 
-def read_output_xml_file(xml_file, config):
+def read_test_results(path_to_test_results, config):
     """
-    Read the output xml file and return a list of Test Result objects
+    Read every result file that the path names (a file, a directory or a glob, see result_reader.find_result_files)
+    and return one list of Test Result objects. Several files are read in parallel processes and a test that has a
+    result in more than one file is kept once, following config 'duplicate_test_results' (default 'last')
 
     Args:
-        xml_file: A string that contains the path to the xml output file that will be read
+        path_to_test_results: A string representing an xml file path, a directory or a glob
+        config: Dictionary of variables
 
     Returns: A list of Test Result objects
     """
-    xml = JUnitXml.fromfile(xml_file)
-    test_results_read = []
-    # Typically reading from a pytest output xml when the first tag is "testsuites".
-    # We shouldn't be using this ._tag like below as it's protected by the class but there's currently no cleaner way \
-    # to get this other than turning the element into a string and looking for expected keywords
-    if xml._tag == "testsuites":
-        print("---------------------Reading from " + xml_file + "---------------------")
-        for suite in xml:
-            test_results_read = read_results_from_suites(suite, test_results_read, config)
-        return test_results_read
-    # typically reading from a robot output xml with this
-    else:
-        print("---------------------Reading from " + xml_file + "---------------------")
-        return read_results_from_suites(xml, test_results_read, config)
+    xml_files = find_result_files(path_to_test_results)
+    if len(xml_files) == 1:
+        return read_output_xml_file(xml_files[0], config)
+
+    duplicate_rule = config.get('duplicate_test_results', LAST_ATTEMPT)
+    print("---------------------Reading " + str(len(xml_files)) + " result files from " + path_to_test_results +
+          "---------------------")
+    test_results, duplicate_count = read_result_files(xml_files, config, duplicate_rule,
+                                                      config.get('result_reader_processes'))
+    print("Read " + str(len(test_results)) + " test results, " + str(duplicate_count) +
+          " duplicate results were merged (keeping the " +
+          ("last attempt" if duplicate_rule == LAST_ATTEMPT else "worst outcome") + ")")
+    return test_results
 
 
 def get_test_case_jama_ids(jama_client, project, test_results, test_case_type, test_plan_name, compare=False):
@@ -148,6 +163,9 @@ def get_test_case_jama_ids(jama_client, project, test_results, test_case_type, t
     project_id = jama_client.get_project_id(project)
     test_plan_id = jama_client.get_test_plan_id(project_id, test_plan_name)
 
+    # The test plan's test cases are listed once, every global ID and test case ID below is looked up in that index
+    jama_client.get_test_plan_index(test_plan_id)
+
     # Go through the test results and retrieve the global ID (might be needed for later) and test case ID
     # then return the test results with the Jama IDs set
     
@@ -155,11 +173,8 @@ def get_test_case_jama_ids(jama_client, project, test_results, test_case_type, t
     if test_case_type == "pytest":
     # add in additional loop so we can know all of the test cases that are not in Jama
         for test_result in test_results:
-            global_id = None
             if not test_result.name.startswith("test_gid_") and not compare:
                 results_not_in_jama.append(test_result.name)
-            else:
-                global_id = jama_client.get_global_id_from_test_case_name_and_test_plan(project, project_id, test_result.name, test_plan_id)
         if results_not_in_jama:
             raise Exception("Error in test case names. Expecting 'test_gid_' "
                             "in the following pytest test case name:", results_not_in_jama)
@@ -167,7 +182,7 @@ def get_test_case_jama_ids(jama_client, project, test_results, test_case_type, t
         for test_result in test_results:
             global_id = 'GID-' + test_result.name.strip("test_gid_").split("_")[0]
             test_result.set_jama_global_id(global_id)
-            test_case_id = jama_client.get_test_case_id_from_global_id(project, project_id, global_id)
+            test_case_id = jama_client.get_test_case_id_from_global_id(project, project_id, global_id, test_plan_id)
             test_result.set_jama_test_case_id(test_case_id)
         return test_results
 
@@ -187,11 +202,19 @@ def get_test_case_jama_ids(jama_client, project, test_results, test_case_type, t
             else:
                 global_id = jama_client.get_global_id_from_test_case_name_and_test_plan(project, project_id, test_result.name, test_plan_id)
             test_result.set_jama_global_id(global_id)
-            test_case_id = jama_client.get_test_case_id_from_global_id(project, project_id, global_id)
+            test_case_id = jama_client.get_test_case_id_from_global_id(project, project_id, global_id, test_plan_id)
             test_result.set_jama_test_case_id(test_case_id)
         return test_results
 
 
+def format_name_match(test_case, closest_test_case, score):
+    """
+    Return a flagged test case name with the name it is closest to and the match score (1.0 for an exact prefix or
+    title match)
+    """
+    return test_case + "  ~  " + closest_test_case + " (score " + format(score, '.2f') + ")"
+
+
 def notify_user_of_deltas(in_executed_but_not_in_jama_delta, in_jama_but_not_in_executed_delta, in_jama_and_in_executed, executed_name_off, in_jama_name_off, compare, output_dir):
     """
     Prints the delta in command line
@@ -200,8 +223,10 @@ def notify_user_of_deltas(in_executed_but_not_in_jama_delta, in_jama_but_not_in_
         in_executed_but_not_in_jama_delta: A list containing test case names that were executed but not in jama
         in_jama_but_not_in_executed_delta: A list containing test case names that are in jama but were not executed
         in_jama_and_in_executed: A list containing test case names that are in jama and were executed
-        executed_name_off: A list of test cases categorized as being flagged that may need an intervention to be updated
-        in_jama_name_off: A list of test cases categorized as being flagged that may need an intervention to be updated
+        executed_name_off: A list of (test case, closest test case, score) tuples of test cases flagged as being close
+                           to a Jama test case, they may need an intervention to be updated
+        in_jama_name_off: A list of (test case, closest test case, score) tuples of Jama test cases flagged as being
+                          close to an executed test case, they may need an intervention to be updated
         compare: A bool where test cases were not executed but were just compared
         output_dir: A string representing a path to right an output file if compare is set to true
     """
@@ -227,13 +252,13 @@ def notify_user_of_deltas(in_executed_but_not_in_jama_delta, in_jama_but_not_in_
 
         if executed_name_off and compare:
             notification_str += "\n\n" + f"The following {len(executed_name_off)} test cases have representatives that are very close to equal in execution:"
-            for test_case in executed_name_off:
-                notification_str += "\n" + "     " + test_case
+            for test_case, closest_test_case, score in executed_name_off:
+                notification_str += "\n" + "     " + format_name_match(test_case, closest_test_case, score)
 
         if in_jama_name_off and compare:
             notification_str += "\n\n" + f"The following {len(in_jama_name_off)} test cases have representatives that are very close to equal in Jama test plan:"
-            for test_case in in_jama_name_off:
-                notification_str += "\n" + "     " + test_case
+            for test_case, closest_test_case, score in in_jama_name_off:
+                notification_str += "\n" + "     " + format_name_match(test_case, closest_test_case, score)
 
         notification_str += "\n" + "--------------------USER WARNINGS--------------------"
         
@@ -256,7 +281,7 @@ def read_output_and_format(jama_client, project, path_to_output, framework_type,
     Args:
         jama_client: An initialized jama client object made from the JamaClientHelper
         project: A string representing the Jama project that the test runs live in
-        path_to_output: The path to the output xml file
+        path_to_output: The path to the output xml file, a directory of them or a glob
         framework_type: A string representing the framework that was used to output the xml results (ex: pytest)
         config: Dictionary of variables
         test_plan_name: A str for the Jama test plan
@@ -264,59 +289,167 @@ def read_output_and_format(jama_client, project, path_to_output, framework_type,
     Returns: A list of test result objects containing the result information
     """
     # Read an output xml file and get the test results object list
-    test_results = read_output_xml_file(path_to_output, config)
+    with jama_client.metrics.phase(READ_FILES):
+        test_results = read_test_results(path_to_output, config)
     # Get test case Jama IDs associated with test cases in the test results
-    test_results_with_ids = get_test_case_jama_ids(jama_client, project, test_results, framework_type, test_plan_name, compare)
+    with jama_client.metrics.phase(RESOLVE_IDS):
+        test_results_with_ids = get_test_case_jama_ids(jama_client, project, test_results, framework_type, test_plan_name,
+                                                       compare)
 
     return test_results_with_ids
 
 
-def find_similar_test_cases_executed_in_plan(executed_but_not_in_jama_test_plan, jama_test_plan_but_not_in_executed, compare):
+def find_similar_test_cases_executed_in_plan(executed_but_not_in_jama_test_plan, jama_test_plan_but_not_in_executed, compare,
+                                             near_match_threshold=DEFAULT_NEAR_MATCH_THRESHOLD):
     """
-    Compare
-    executed_but_not_in_jama_test_plan: list of test cases in robot or pytest, but not found in Jama test plan
-    jama_test_plan_but_not_in_executed: list of test cases in Jama test plan, but not found in robot or pytest
-    compare: bool
+    Compare the two lists of unmatched test case names and flag the names that most likely refer to a test case in
+    the other list: the same prefix (e.g. TC-GID-1234), the same title, or a title within a small edit distance.
+    Each list is indexed once (see NameIndex), so every name is looked up instead of compared with every other name
+
+    Args:
+        executed_but_not_in_jama_test_plan: list of test cases in robot or pytest, but not found in Jama test plan
+        jama_test_plan_but_not_in_executed: list of test cases in Jama test plan, but not found in robot or pytest
+        compare: bool
+        near_match_threshold: A number representing the lowest title similarity (0 to 1) that is flagged
+
+    Returns: A tuple of the names of the second list and of the first list that have no match, and the flagged names
+             of the first list and of the second list as (name, closest name in the other list, score) tuples
     """
     executed_name_off, in_jama_name_off, executed_but_not_in_jama_test_plan_from_dict, jama_test_plan_but_not_in_executed_from_dict = [], [], [], []
-    
+
     if compare:
-        # convert to a dict with the prefix as key and suffix as value
-        ex_not_in_jama_dict = dict()
-        for test_case in executed_but_not_in_jama_test_plan:
-            test_case_split = test_case.split(':', 1) if ':' in test_case else [test_case, test_case]
-            ex_not_in_jama_dict[test_case_split[0]] = test_case_split[1]
-
-        # convert to a dict and compare test case to ex_not_in_jama_dict
-        in_jama_not_ex_dict = dict()
-        for test_case in jama_test_plan_but_not_in_executed:
-            test_case_split = test_case.split(':', 1) if ':' in test_case else [test_case, test_case]
-            in_jama_not_ex_dict[test_case_split[0]] = test_case_split[1]
-            if test_case_split[0] in ex_not_in_jama_dict.keys() and test_case not in in_jama_name_off:
-                in_jama_name_off.append(test_case)
-            elif test_case_split[1] in ex_not_in_jama_dict.values() and test_case not in in_jama_name_off:
-                in_jama_name_off.append(test_case)
+        executed_index = NameIndex(executed_but_not_in_jama_test_plan)
+        in_jama_index = NameIndex(jama_test_plan_but_not_in_executed)
+
+        for test_case in in_jama_index.names:
+            match = executed_index.find_match(test_case, near_match_threshold)
+            if match:
+                in_jama_name_off.append((test_case,) + match)
             else:
-                #test_case_unsplit = test_case_split[0] + ':' + test_case_split[1] if test_case_split[0] != test_case_split[1] else test_case_split[0]
-                if test_case not in executed_but_not_in_jama_test_plan_from_dict:
-                    executed_but_not_in_jama_test_plan_from_dict.append(test_case)
-    
-        # ex_not_in_jama_dict items to in_jama_not_ex_dict
-        for prefix, suffix in ex_not_in_jama_dict.items():
-            test_case_unsplit = prefix + ':' + suffix if prefix != suffix else prefix
-            if prefix in in_jama_not_ex_dict.keys() and test_case_unsplit not in executed_name_off:
-                executed_name_off.append(test_case_unsplit)
-            elif suffix in in_jama_not_ex_dict.values() and test_case_unsplit not in executed_name_off:
-                executed_name_off.append(test_case_unsplit)
+                executed_but_not_in_jama_test_plan_from_dict.append(test_case)
+
+        for test_case in executed_index.names:
+            match = in_jama_index.find_match(test_case, near_match_threshold)
+            if match:
+                executed_name_off.append((test_case,) + match)
             else:
-                if test_case_unsplit not in jama_test_plan_but_not_in_executed:
-                    jama_test_plan_but_not_in_executed_from_dict.append(test_case_unsplit)
+                jama_test_plan_but_not_in_executed_from_dict.append(test_case)
 
     return executed_but_not_in_jama_test_plan_from_dict, jama_test_plan_but_not_in_executed_from_dict, executed_name_off, in_jama_name_off
 
 
+def select_test_run_uploads(test_results, jama_test_runs, test_run_ids, bulk_comment, user_full_name,
+                            full_upload=False):
+    """
+    Return the test results that need to be pushed to their Jama test run
+
+    Args:
+        test_results: A list of test result objects with the Jama test run id set
+        jama_test_runs: A dictionary of the Jama test runs (from get_test_runs) by test run id
+        test_run_ids: A set of the test run ids that results are pushed to
+        bulk_comment: A string representing the comment that the user provided to add to the test runs
+        user_full_name: A string representing the name of the Jama user the comment is left by
+        full_upload: A bool if set to True every result is pushed, otherwise a test run that already has the status
+                     and actual results of its result is skipped
+
+    Returns: A tuple of the list of (Jama test run, test result object) uploads and the amount of skipped results
+    """
+    uploads = []
+    unchanged_count = 0
+    for test_result in test_results:
+        if test_result.get_jama_test_run_id() in test_run_ids:
+            if bulk_comment:
+                test_result.set_bulk_comment(user_full_name, bulk_comment)
+            test_run = jama_test_runs[test_result.get_jama_test_run_id()]
+            # The test runs were listed from Jama, a run that already shows this result does not need another write
+            if not full_upload and test_run_has_result(test_run, test_result.get_jama_result(),
+                                                       test_result.get_jama_result_message()):
+                unchanged_count += 1
+                continue
+            uploads.append((test_run, test_result))
+
+    return uploads, unchanged_count
+
+
+def push_test_run_uploads(jama_client, uploads, user_jama_id, bulk_comment, workers=1):
+    """
+    Push test run results to Jama one after another or on worker threads
+
+    Args:
+        jama_client: An initialized jama client object made from the JamaClientHelper
+        uploads: A list of (Jama test run, test result object) tuples in the order they should be reported
+        user_jama_id: An integer representing the Jama user that the test runs are assigned to
+        bulk_comment: A string representing the comment that the user provided to add to the test runs
+        workers: An integer representing the amount of test runs pushed at the same time (1 is sequential)
+    """
+    if workers > 1:
+        push_test_runs_concurrently(jama_client, uploads, user_jama_id, workers)
+    else:
+        for test_run, test_result in uploads:
+            jama_client.update_test_run(test_run,
+                                        test_result.get_jama_result(),
+                                        test_result.get_jama_result_message(),
+                                        test_result.get_runtime(), user_jama_id, bulk_comment)
+
+
+def push_test_runs_concurrently(jama_client, uploads, user_jama_id, workers):
+    """
+    Push test run results to Jama on a pool of worker threads, then report them in the order they were given
+
+    Args:
+        jama_client: An initialized jama client object made from the JamaClientHelper
+        uploads: A list of (Jama test run, test result object) tuples in the order they should be reported
+        user_jama_id: An integer representing the Jama user that the test runs are assigned to
+        workers: An integer representing the maximum amount of test runs pushed at the same time
+
+    Returns: A list of (test run name, error message) tuples for the test runs that could not be pushed
+    """
+    def push(upload):
+        test_run, test_result = upload
+        jama_client.push_test_run(test_run, test_result.get_jama_result(), test_result.get_jama_result_message(),
+                                  test_result.get_runtime(), user_jama_id)
+
+    print("Pushing " + str(len(uploads)) + " test run results to Jama with " + str(workers) + " workers")
+    errors = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(push, upload) for upload in uploads]
+
+        # Wait on the futures in submission order so that the summary order does not depend on timing
+        for future in futures:
+            errors.append(future.exception())
+
+    return report_pushed_test_runs(uploads, errors)
+
+
+def report_pushed_test_runs(uploads, errors):
+    """
+    Print the pushed test runs in order followed by the ones that could not be pushed
+
+    Args:
+        uploads: A list of (Jama test run, test result object) tuples
+        errors: A list with the exception raised by each upload (None if the upload succeeded)
+
+    Returns: A list of (test run name, error message) tuples for the test runs that could not be pushed
+    """
+    failures = []
+    for (test_run, test_result), error in zip(uploads, errors):
+        if error is None:
+            print("Pushed status " + test_result.get_jama_result() + " to test case: " + test_run['fields']['name'])
+        else:
+            failures.append((test_run['fields']['name'], str(error)))
+
+    if failures:
+        print("\nUnable to push the following " + str(len(failures)) + " test run results:")
+        for test_run_name, error in failures:
+            print("     " + test_run_name + ": " + error)
+
+    return failures
+
+
 def update_jama_with_results(jama_client, jama_project, jama_test_plan, report_id,
-                             jama_test_cycle, test_version_and_release_candidate, bulk_comment, test_results, compare):
+                             jama_test_cycle, test_version_and_release_candidate, bulk_comment, test_results, compare,
+                             workers=1, near_match_threshold=DEFAULT_NEAR_MATCH_THRESHOLD,
+                             full_upload=False):
     """
     Updates Jama with the test case results and returns the delta
 
@@ -330,23 +463,28 @@ def update_jama_with_results(jama_client, jama_project, jama_test_plan, report_i
         bulk_comment: A string representing the comment that the user provided to add to the test runs
         test_results: A list of test result objects
         compare: A bool if set to True do not update test run
+        workers: An integer representing the amount of test runs pushed at the same time (1 is sequential)
+        near_match_threshold: A number representing the lowest title similarity (0 to 1) of a flagged near match
+        full_upload: A bool if set to True push every result, otherwise a test run that already has the status and
+                     actual results of its result (e.g. a cycle re-run after a partial fix) is skipped
     """
-    # Retrieve the jama user ID of the current user (jama API credentials)
-    user_jama_id, user_full_name = jama_client.get_current_user_id()
+    with jama_client.metrics.phase(RESOLVE_IDS):
+        # Retrieve the jama user ID of the current user (jama API credentials)
+        user_jama_id, user_full_name = jama_client.get_current_user_id()
 
-    # Get the project id and test plan
-    project_id = jama_client.get_project_id(jama_project)
-    test_plan_id = jama_client.get_test_plan_id(project_id, jama_test_plan)
+        # Get the project id and test plan
+        project_id = jama_client.get_project_id(jama_project)
+        test_plan_id = jama_client.get_test_plan_id(project_id, jama_test_plan)
 
-    # Get the test cycle
-    test_cycle_id = jama_client.get_test_cycle_id(test_plan_id, jama_test_cycle)
+        # Get the test cycle
+        test_cycle_id = jama_client.get_test_cycle_id(test_plan_id, jama_test_cycle)
 
-    # # Check that the jama test plan and jama test cycle have the report ID and version with the release candidate
-    check_report_id_in_test_plan(report_id, jama_test_plan, compare)
-    check_version_in_test_cycle(test_version_and_release_candidate, jama_test_cycle)
+        # # Check that the jama test plan and jama test cycle have the report ID and version with the release candidate
+        check_report_id_in_test_plan(report_id, jama_test_plan, compare)
+        check_version_in_test_cycle(test_version_and_release_candidate, jama_test_cycle)
 
-    # Get the test runs and the test cases needed to update from Jama
-    test_runs = jama_client.get_test_runs(test_cycle_id)
+        # Get the test runs and the test cases needed to update from Jama
+        test_runs = jama_client.get_test_runs(test_cycle_id)
 
     # Go through the test runs and create two dicts:
     #   jama_test_runs: a dict that maps a test run id to the test run data
@@ -388,21 +526,111 @@ def update_jama_with_results(jama_client, jama_project, jama_test_plan, report_i
     print()  # Spacer
 
     # Go through the test results again and push the result to Jama if the test case is in Jama
-    for test_result in test_results:
-        if test_result.get_jama_test_run_id() in test_results_to_update:
-            if bulk_comment:
-                test_result.set_bulk_comment(user_full_name, bulk_comment)
-            if not compare:
-                jama_client.update_test_run(jama_test_runs[test_result.get_jama_test_run_id()],
-                                            test_result.get_jama_result(),
-                                            test_result.get_jama_result_message(),
-                                            test_result.get_runtime(), user_jama_id, bulk_comment)
-
-    executed_but_not_in_jama_test_plan, jama_test_plan_but_not_in_executed, executed_name_off, in_jama_name_off = find_similar_test_cases_executed_in_plan(executed_but_not_in_jama_test_plan, jama_test_plan_but_not_in_executed, compare)
+    uploads, unchanged_count = select_test_run_uploads(test_results, jama_test_runs, test_results_to_update,
+                                                       bulk_comment, user_full_name, full_upload)
+
+    if not compare:
+        if unchanged_count:
+            print("Skipped " + str(unchanged_count) + " test run results that are unchanged in Jama (use "
+                  "--full-upload to push them)")
+        with jama_client.metrics.phase(PUSH):
+            push_test_run_uploads(jama_client, uploads, user_jama_id, bulk_comment, workers)
+
+    with jama_client.metrics.phase(VERIFY):
+        executed_but_not_in_jama_test_plan, jama_test_plan_but_not_in_executed, executed_name_off, in_jama_name_off = find_similar_test_cases_executed_in_plan(executed_but_not_in_jama_test_plan, jama_test_plan_but_not_in_executed, compare, near_match_threshold)
     # return the delta
     return executed_but_not_in_jama_test_plan, jama_test_plan_but_not_in_executed, executed_and_in_jama, executed_name_off, in_jama_name_off
 
 
+def watch_and_update_jama(jama_client, config, watch_dir, workers=1, full_upload=False):
+    """
+    Watch a results directory and push the results of every result file as soon as it is written (e.g. each
+    pytest-xdist worker or robot shard of a run that is still going). The user, test plan, test cycle and its test
+    runs are looked up once and kept for every batch, so a batch only costs the writes of the results it changed.
+    The watch ends when no result file was added or changed for config 'watch_idle_seconds' (or on Ctrl+C)
+
+    Args:
+        jama_client: An initialized jama client object made from the JamaClientHelper
+        config: Dictionary of variables
+        watch_dir: A string representing the directory the result xml files are written to
+        workers: An integer representing the amount of test runs pushed at the same time (1 is sequential)
+        full_upload: A bool if set to True every result is pushed, not only the ones that change a test run
+
+    Returns: A list of the names of the test results that are not in the Jama test cycle
+    """
+    with jama_client.metrics.phase(RESOLVE_IDS):
+        user_jama_id, user_full_name = jama_client.get_current_user_id()
+        project_id = jama_client.get_project_id(config['jama_project'])
+        test_plan_id = jama_client.get_test_plan_id(project_id, config['jama_test_plan'])
+        test_cycle_id = jama_client.get_test_cycle_id(test_plan_id, config['jama_test_cycle'])
+        check_report_id_in_test_plan(config['report_id'], config['jama_test_plan'], False)
+        check_version_in_test_cycle(config['test_version_and_release_candidate'], config['jama_test_cycle'])
+        jama_test_runs = {test_run['id']: test_run for test_run in jama_client.get_test_runs(test_cycle_id)}
+    jama_test_case_to_test_run_ids = {test_run['fields']['testCase']: test_run_id
+                                      for test_run_id, test_run in jama_test_runs.items()}
+
+    watcher = ResultWatcher(watch_dir, config.get('watch_poll_seconds', DEFAULT_POLL_SECONDS))
+    print("Watching " + watch_dir + " for result files, the watch ends after " +
+          str(config.get('watch_idle_seconds', DEFAULT_IDLE_SECONDS)) + " seconds without a new result file")
+    not_in_jama = {}
+    try:
+        for xml_files in watcher.watch(config.get('watch_idle_seconds', DEFAULT_IDLE_SECONDS)):
+            shards = []
+            with jama_client.metrics.phase(READ_FILES):
+                for xml_file in xml_files:
+                    try:
+                        shards.append(read_output_xml_file(xml_file, config))
+                    except ElementTree.ParseError as e:
+                        # Read again once the file changes (e.g. it was still being written when it was listed)
+                        print("Unable to read " + xml_file + " yet: " + str(e))
+                test_results, _ = merge_test_results(shards, config.get('duplicate_test_results', LAST_ATTEMPT))
+            if not test_results:
+                continue
+
+            with jama_client.metrics.phase(RESOLVE_IDS):
+                get_test_case_jama_ids(jama_client, config['jama_project'], test_results,
+                                       config['test_results_type'], config['jama_test_plan'], False)
+            for test_result in test_results:
+                if test_result.get_jama_test_case_id() in jama_test_case_to_test_run_ids:
+                    test_result.set_jama_test_run_id(jama_test_case_to_test_run_ids[test_result.get_jama_test_case_id()])
+                    not_in_jama.pop(test_result.get_name(), None)
+                else:
+                    not_in_jama[test_result.get_name()] = True
+
+            uploads, unchanged_count = select_test_run_uploads(test_results, jama_test_runs, jama_test_runs.keys(),
+                                                               config['bulk_comment'], user_full_name, full_upload)
+            print("Pushing " + str(len(uploads)) + " of " + str(len(test_results)) + " results from " +
+                  str(len(xml_files)) + " result files (" + str(unchanged_count) + " unchanged in Jama)")
+            with jama_client.metrics.phase(PUSH):
+                push_test_run_uploads(jama_client, uploads, user_jama_id, config['bulk_comment'], workers)
+    except KeyboardInterrupt:
+        print("\nStopped watching " + watch_dir)
+
+    if not_in_jama:
+        print("\nThe following " + str(len(not_in_jama)) + " test cases were executed but NOT in the Jama Test Cycle:")
+        for test_case in not_in_jama:
+            print("     " + test_case)
+
+    return list(not_in_jama)
+
+
+def report_metrics(jama_client, config):
+    """
+    Print how much the run was slowed down by the request budget and Jama rate limiting, then write the per endpoint
+    and per phase metrics of the run to the json file in config 'metrics_path'
+
+    Args:
+        jama_client: An initialized jama client object made from the JamaClientHelper
+        config: Dictionary of variables (optionally containing 'metrics_path')
+    """
+    throttle_stats = jama_client.jama_core.throttle_stats
+    print("\n" + throttle_stats.summary())
+
+    metrics_path = config.get('metrics_path', str(DEFAULT_METRICS_DIRECTORY / 'jama_exec_metrics.json'))
+    jama_client.metrics.write_summary(metrics_path, {'tool': 'jama_exec', 'throttle': throttle_stats.as_dict()})
+    print("Jama API metrics written to " + metrics_path)
+
+
 def execute_jama_exec(commands):
     # Parse the arguments
     parsed_args = parse_args(commands)
@@ -411,24 +639,39 @@ def execute_jama_exec(commands):
         config = json.load(file)
 
     # Initialize the Jama client to interface with Jama APIs
-    this_jama_client = initialize_jama_client(parsed_args.username, parsed_args.password, config)
-
-    # Read the results output
-    test_result_list = read_output_and_format(this_jama_client, config['jama_project'],
-                                              config['path_to_test_results'], config['test_results_type'], config['jama_test_plan'], config, parsed_args.compare)
-
-    # Push results to Jama and retrieve the delta
-    executed_delta, jama_delta, executed_and_in_jama, executed_name_off, in_jama_name_off = update_jama_with_results(this_jama_client, config['jama_project'],
-                                                                                                            config['jama_test_plan'],
-                                                                                                            config['report_id'],
-                                                                                                            config['jama_test_cycle'],
-                                                                                                            config['test_version_and_release_candidate'],
-                                                                                                            config['bulk_comment'],
-                                                                                                            test_result_list,
-                                                                                                            parsed_args.compare)
-
-    # Report the test case delta to user
-    notify_user_of_deltas(executed_delta, jama_delta, executed_and_in_jama, executed_name_off, in_jama_name_off, parsed_args.compare, os.path.dirname(parsed_args.config_path))
+    this_jama_client = initialize_jama_client(parsed_args.username, parsed_args.password, config, parsed_args.refresh_cache,
+                                              parsed_args.workers)
+
+    this_jama_client.metrics.reset()
+    try:
+        if parsed_args.watch:
+            if parsed_args.compare:
+                raise Exception("--watch pushes results while the run is going and can not be used with --compare")
+            watch_and_update_jama(this_jama_client, config, parsed_args.watch, parsed_args.workers,
+                                  parsed_args.full_upload)
+            return
+
+        # Read the results output
+        test_result_list = read_output_and_format(this_jama_client, config['jama_project'],
+                                                  config['path_to_test_results'], config['test_results_type'], config['jama_test_plan'], config, parsed_args.compare)
+
+        # Push results to Jama and retrieve the delta
+        executed_delta, jama_delta, executed_and_in_jama, executed_name_off, in_jama_name_off = update_jama_with_results(this_jama_client, config['jama_project'],
+                                                                                                                config['jama_test_plan'],
+                                                                                                                config['report_id'],
+                                                                                                                config['jama_test_cycle'],
+                                                                                                                config['test_version_and_release_candidate'],
+                                                                                                                config['bulk_comment'],
+                                                                                                                test_result_list,
+                                                                                                                parsed_args.compare,
+                                                                                                                parsed_args.workers,
+                                                                                                                config.get('near_match_threshold', DEFAULT_NEAR_MATCH_THRESHOLD),
+                                                                                                                parsed_args.full_upload)
+
+        # Report the test case delta to user
+        notify_user_of_deltas(executed_delta, jama_delta, executed_and_in_jama, executed_name_off, in_jama_name_off, parsed_args.compare, os.path.dirname(parsed_args.config_path))
+    finally:
+        report_metrics(this_jama_client, config)
 
 
 if __name__ == "__main__":
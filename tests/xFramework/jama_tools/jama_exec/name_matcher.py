@@ -0,0 +1,165 @@
+from collections import Counter
+
+
+# Two titles are a near match when their similarity (1 - edit distance / length of the longer title) is at least this
+DEFAULT_NEAR_MATCH_THRESHOLD = 0.9
+
+# Titles are indexed by their words and by their character trigrams. Candidates are the names sharing the most words
+# (a typo changes one word, the others still match), a title without such a candidate (e.g. a single word) falls back
+# to the names sharing the most trigrams. A word or trigram in more names than this does not narrow the candidates
+# down and is not counted
+GRAM_SIZE = 3
+MAX_WORD_POSTINGS = 1000
+MAX_GRAM_POSTINGS = 200
+
+# The most candidates (by shared trigrams) that the edit distance is computed for, per name
+MAX_CANDIDATES = 8
+
+
+def split_test_case_name(test_case_name):
+    """
+    Return the prefix (e.g. TC-GID-1234) and title of a test case name, a name without ':' is both
+    """
+    if ':' in test_case_name:
+        prefix, title = test_case_name.split(':', 1)
+        return prefix, title
+    return test_case_name, test_case_name
+
+
+def normalize_title(title):
+    """
+    Return a title the way titles are compared: case and surrounding or repeated whitespace are ignored
+    """
+    return " ".join(title.split()).lower()
+
+
+def get_grams(title):
+    """
+    Return the set of character trigrams of a (normalized) title, padded so that short titles have some
+    """
+    padded = " " + title + " "
+    return {padded[start:start + GRAM_SIZE] for start in range(max(1, len(padded) - GRAM_SIZE + 1))}
+
+
+def bounded_edit_distance(first, second, max_distance):
+    """
+    Return the Levenshtein distance of two strings, or max_distance + 1 as soon as it is known to be larger
+    (only a band of 2 * max_distance + 1 cells around the diagonal is computed)
+    """
+    if abs(len(first) - len(second)) > max_distance:
+        return max_distance + 1
+
+    # A shared start and end does not change the distance, for a typo only the few characters around it are left
+    start = 0
+    while start < len(first) and start < len(second) and first[start] == second[start]:
+        start += 1
+    end = 0
+    while end < len(first) - start and end < len(second) - start and first[-1 - end] == second[-1 - end]:
+        end += 1
+    first = first[start:len(first) - end]
+    second = second[start:len(second) - end]
+
+    if len(first) > len(second):
+        first, second = second, first
+
+    too_far = max_distance + 1
+    previous = list(range(len(second) + 1))
+    for row in range(1, len(first) + 1):
+        low = max(1, row - max_distance)
+        high = min(len(second), row + max_distance)
+        current = [too_far] * (len(second) + 1)
+        if low == 1:
+            current[0] = row
+        for column in range(low, high + 1):
+            cost = 0 if first[row - 1] == second[column - 1] else 1
+            current[column] = min(previous[column] + 1, current[column - 1] + 1, previous[column - 1] + cost)
+        if min(current[max(0, low - 1):high + 1]) > max_distance:
+            return too_far
+        previous = current
+
+    return min(previous[len(second)], too_far)
+
+
+class NameIndex:
+    """
+    An index of test case names for finding the name that another name most likely refers to: by the same prefix
+    (e.g. TC-GID-1234), by the same title, or by a title within a small edit distance. Exact matches are hash
+    lookups, near matches are found through a word and trigram index and only the best candidates are compared, so matching
+    tens of thousands of names against each other does not compare every pair.
+    """
+    def __init__(self, test_case_names):
+        """
+        :test_case_names: A list of test case names (the first of duplicate names and prefixes is the one matched)
+        """
+        self.names = []
+        self.titles = []
+        self.prefix_index = {}
+        self.title_index = {}
+        self.word_index = {}
+        self.gram_index = {}
+
+        for name in dict.fromkeys(test_case_names):
+            prefix, title = split_test_case_name(name)
+            title = normalize_title(title)
+            name_id = len(self.names)
+            self.names.append(name)
+            self.titles.append(title)
+            self.prefix_index.setdefault(prefix, name_id)
+            self.title_index.setdefault(title, name_id)
+            for word in set(title.split()):
+                self.word_index.setdefault(word, []).append(name_id)
+            for gram in get_grams(title):
+                self.gram_index.setdefault(gram, []).append(name_id)
+
+    def find_match(self, test_case_name, threshold=DEFAULT_NEAR_MATCH_THRESHOLD):
+        """
+        Return the indexed name that a test case name most likely refers to
+
+        Args:
+            test_case_name: A string representing the test case name to match
+            threshold: A number representing the lowest similarity (0 to 1) of a near match
+
+        Returns: A tuple of the matched name and the similarity (1.0 for a prefix or title match), None if no indexed
+                 name is close enough
+        """
+        prefix, title = split_test_case_name(test_case_name)
+        title = normalize_title(title)
+        if prefix in self.prefix_index:
+            return self.names[self.prefix_index[prefix]], 1.0
+        if title in self.title_index:
+            return self.names[self.title_index[title]], 1.0
+
+        best_match = self.find_near_match(title, set(title.split()), self.word_index, MAX_WORD_POSTINGS, threshold)
+        if best_match is None:
+            best_match = self.find_near_match(title, get_grams(title), self.gram_index, MAX_GRAM_POSTINGS, threshold)
+
+        return best_match
+
+    def find_near_match(self, title, keys, index, max_postings, threshold):
+        """
+        Return the indexed name whose title is closest to a title among the names sharing the most keys (words or
+        trigrams) with it, None if none of them is within the edit distance the threshold allows
+        """
+        shared_keys = Counter()
+        for key in keys:
+            postings = index.get(key)
+            if postings and len(postings) <= max_postings:
+                shared_keys.update(postings)
+
+        best_match = None
+        best_shared = 0
+        for name_id, shared in shared_keys.most_common(MAX_CANDIDATES):
+            # Candidates come in order of shared keys, one sharing fewer keys than a match found is not compared
+            if shared < best_shared:
+                break
+            candidate = self.titles[name_id]
+            longest = max(len(title), len(candidate), 1)
+            max_distance = int((1 - threshold) * longest)
+            distance = bounded_edit_distance(title, candidate, max_distance)
+            if distance <= max_distance:
+                score = round(1 - distance / longest, 3)
+                if best_match is None or score > best_match[1]:
+                    best_match = (self.names[name_id], score)
+                    best_shared = shared
+
+        return best_match
@@ -0,0 +1,234 @@
+"""
+A pytest plugin that publishes test_gid_* results to a Jama test cycle while the test session is running
+
+Load it with `-p pytest_jama` (jama_exec must be on the python path) and turn it on with --jama-publish, see README.md
+"""
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from halo import Halo
+
+import jama_exec
+from result_reader import LAST_ATTEMPT, merge_test_results
+from result_test import TestResult
+
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_FLUSH_SECONDS = 2.0
+
+# Only tests whose name carries a global id are published (the same names jama_exec reads from JUnit xml)
+TEST_NAME_PREFIX = "test_gid_"
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("jama", "publish test results to Jama")
+    group.addoption("--jama-publish", action="store_true", default=False,
+                    help="Push the result of every test_gid_* test to the Jama test cycle while the session runs")
+    group.addoption("--jama-config", default=os.path.join(os.path.dirname(__file__), "config.json"),
+                    help="Path to the jama_exec config.json (default is the one next to this plugin)")
+    group.addoption("--jama-username", default=os.environ.get("JAMA_USERNAME"),
+                    help="username (client ID) for the jama api user (default $JAMA_USERNAME)")
+    group.addoption("--jama-password", default=os.environ.get("JAMA_PASSWORD"),
+                    help="password (client secret) for the jama api user (default $JAMA_PASSWORD)")
+    group.addoption("--jama-workers", type=int, default=4,
+                    help="Amount of test run results pushed to Jama at the same time (default 4)")
+
+
+def is_xdist_worker(config):
+    """
+    Returns whether pytest runs as a pytest-xdist worker: the controller receives every worker's reports, so only
+    the controller (or a session without xdist) publishes
+    """
+    return hasattr(config, 'workerinput')
+
+
+def pytest_configure(config):
+    if not config.getoption("jama_publish") or is_xdist_worker(config):
+        return
+
+    with open(config.getoption("jama_config"), 'r') as file:
+        jama_config = json.load(file)
+    workers = config.getoption("jama_workers")
+    jama_client = jama_exec.initialize_jama_client(config.getoption("jama_username"),
+                                                   config.getoption("jama_password"), jama_config, workers=workers)
+    config.pluginmanager.register(JamaResultPublisher(jama_client, jama_config, workers), "jama_result_publisher")
+
+
+def read_test_report(report, config):
+    """
+    Return the Test Result of a pytest test report, None if the report does not decide the test's result (a passed
+    setup or teardown, a skip) or the test has no global id
+
+    Args:
+        report: A pytest TestReport
+        config: Dictionary of variables (the 'jama_test_plan' and 'test_version_and_release_candidate' are added
+                to the result messages)
+
+    Returns: A Test Result object or None
+    """
+    # The JUnit xml testcase name, e.g. test_gid_1234_login[admin]
+    name = report.nodeid.split("::")[-1]
+    if not name.startswith(TEST_NAME_PREFIX) or report.skipped:
+        return None
+    if report.when != 'call' and not report.failed:
+        return None
+
+    if report.passed:
+        test_result = TestResult(name, report.duration, "PASSED")
+        test_result.set_passed(config['jama_test_plan'], config['test_version_and_release_candidate'])
+        return test_result
+
+    # A failing setup or teardown is an error, as the JUnit xml reports it
+    crash = getattr(report.longrepr, 'reprcrash', None)
+    message = crash.message if crash is not None else report.longreprtext
+    test_result = TestResult(name, report.duration, "FAILED")
+    test_result.set_failed('failure' if report.when == 'call' else 'error', message, config['jama_test_plan'],
+                           config['test_version_and_release_candidate'])
+    return test_result
+
+
+class JamaResultPublisher:
+    """
+    Queues the result of each finished test and pushes them to Jama from a background thread in batches, so the
+    tests do not wait on Jama. The test cycle's runs are listed once on the first batch, later batches only cost the
+    writes of the results that change a run. The queue is flushed when the session finishes.
+    """
+    def __init__(self, jama_client, config, workers=4, batch_size=None, flush_seconds=None):
+        """
+        :jama_client: An initialized jama client object made from the JamaClientHelper
+        :config: Dictionary of variables (the jama_exec config.json)
+        :workers: An integer representing the amount of test run results pushed at the same time
+        :batch_size: An integer representing the most results pushed in one batch (config 'publish_batch_size')
+        :flush_seconds: A number representing the longest a queued result waits for a batch to fill up
+                        (config 'publish_flush_seconds')
+        """
+        self.jama_client = jama_client
+        # Halo is not thread safe and the session owns the terminal, the uploads run without a spinner
+        self.jama_client.spinner = Halo(enabled=False)
+        self.config = config
+        self.workers = workers
+        self.batch_size = batch_size or config.get('publish_batch_size', DEFAULT_BATCH_SIZE)
+        self.flush_seconds = flush_seconds or config.get('publish_flush_seconds', DEFAULT_FLUSH_SECONDS)
+
+        self.queue = queue.Queue()
+        self.test_cycle = None
+        self.pushed_count = 0
+        self.unchanged_count = 0
+        self.not_in_jama = {}
+        self.errors = []
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.thread = threading.Thread(target=self.run, name="jama-result-publisher", daemon=True)
+        self.thread.start()
+
+    def pytest_runtest_logreport(self, report):
+        test_result = read_test_report(report, self.config)
+        if test_result is not None:
+            self.queue.put(test_result)
+
+    def pytest_sessionfinish(self, session):
+        self.close()
+
+    def pytest_terminal_summary(self, terminalreporter):
+        terminalreporter.write_sep("-", "Jama")
+        terminalreporter.write_line("Pushed " + str(self.pushed_count) + " test run results to Jama, " +
+                                    str(self.unchanged_count) + " were unchanged")
+        if self.not_in_jama:
+            terminalreporter.write_line("The following " + str(len(self.not_in_jama)) +
+                                        " test cases were executed but NOT in the Jama Test Cycle:")
+            for test_case in self.not_in_jama:
+                terminalreporter.write_line("     " + test_case)
+        for error in self.errors:
+            terminalreporter.write_line("Unable to push test run results: " + error)
+
+    def close(self):
+        """
+        Push every queued result and stop the background thread (called once the session finished)
+        """
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        self.executor.shutdown()
+
+    def run(self):
+        """
+        The background thread: collect results until a batch is full, the queue was quiet for flush_seconds or the
+        session finished, then push the batch
+        """
+        finished = False
+        while not finished:
+            batch = []
+            deadline = None
+            while len(batch) < self.batch_size:
+                try:
+                    timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                    test_result = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if test_result is None:
+                    finished = True
+                    break
+                batch.append(test_result)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_seconds
+
+            if batch:
+                try:
+                    self.push_batch(batch)
+                except Exception as e:
+                    # A failed batch must not stop the session, the error is reported in the terminal summary
+                    self.errors.append(str(e))
+
+    def get_test_cycle(self):
+        """
+        Return the Jama user and the test runs of the test cycle, looked up on the first batch only
+        """
+        if self.test_cycle is None:
+            jama_client = self.jama_client
+            user_jama_id, user_full_name = jama_client.get_current_user_id()
+            project_id = jama_client.get_project_id(self.config['jama_project'])
+            test_plan_id = jama_client.get_test_plan_id(project_id, self.config['jama_test_plan'])
+            test_cycle_id = jama_client.get_test_cycle_id(test_plan_id, self.config['jama_test_cycle'])
+            jama_exec.check_report_id_in_test_plan(self.config['report_id'], self.config['jama_test_plan'], False)
+            jama_exec.check_version_in_test_cycle(self.config['test_version_and_release_candidate'],
+                                                  self.config['jama_test_cycle'])
+            test_runs = {test_run['id']: test_run for test_run in jama_client.get_test_runs(test_cycle_id)}
+            self.test_cycle = (user_jama_id, user_full_name, test_runs)
+        return self.test_cycle
+
+    def push_batch(self, batch):
+        """
+        Push a batch of test results to their test runs (a test reported more than once, e.g. a rerun, keeps its
+        last result)
+        """
+        user_jama_id, user_full_name, test_runs = self.get_test_cycle()
+        test_results, _ = merge_test_results([batch], LAST_ATTEMPT)
+        jama_exec.get_test_case_jama_ids(self.jama_client, self.config['jama_project'], test_results, "pytest",
+                                         self.config['jama_test_plan'])
+
+        test_case_to_test_run_ids = {test_run['fields']['testCase']: test_run_id
+                                     for test_run_id, test_run in test_runs.items()}
+        for test_result in test_results:
+            if test_result.get_jama_test_case_id() in test_case_to_test_run_ids:
+                test_result.set_jama_test_run_id(test_case_to_test_run_ids[test_result.get_jama_test_case_id()])
+                self.not_in_jama.pop(test_result.get_name(), None)
+            else:
+                self.not_in_jama[test_result.get_name()] = True
+
+        uploads, unchanged_count = jama_exec.select_test_run_uploads(test_results, test_runs, test_runs.keys(),
+                                                                     self.config['bulk_comment'], user_full_name)
+        # Pushed without jama_exec's console report, the outcome is summed up in the terminal summary
+        futures = [(test_run, self.executor.submit(self.jama_client.push_test_run, test_run,
+                                                   test_result.get_jama_result(),
+                                                   test_result.get_jama_result_message(),
+                                                   test_result.get_runtime(), user_jama_id))
+                   for test_run, test_result in uploads]
+        for test_run, future in futures:
+            if future.exception() is None:
+                self.pushed_count += 1
+            else:
+                self.errors.append(test_run['fields']['name'] + ": " + str(future.exception()))
+        self.unchanged_count += unchanged_count
@@ -0,0 +1,207 @@
+import glob
+import html
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from xml.etree import ElementTree
+
+from result_test import TestResult
+
+
+# JUnit/xUnit xml (pytest --junitxml, robot --xunit) has <testcase> elements, robot's own output.xml has <test>
+JUNIT_TEST = 'testcase'
+ROBOT_TEST = 'test'
+
+# The children of a test that its result is read from, every other element (keywords, messages, captured output)
+# is dropped as soon as it has been parsed
+JUNIT_OUTCOMES = ('failure', 'error', 'skipped')
+ROBOT_STATUS = 'status'
+
+ROBOT_TIME_FORMAT = '%Y%m%d %H:%M:%S.%f'
+
+# How a test that has a result in more than one file (xdist workers, reruns) is merged: the result of the last
+# attempt (the most recently written file) or the worst outcome (a failure in any attempt)
+LAST_ATTEMPT = 'last'
+WORST_OUTCOME = 'worst'
+DUPLICATE_RULES = (LAST_ATTEMPT, WORST_OUTCOME)
+
+
+def iter_test_results(xml_file, config):
+    """
+    Stream the test results of an output xml file one at a time. The file is read with iterparse and every element
+    is dropped once it has been parsed, so memory use does not grow with the size of the file (e.g. a robot
+    output.xml with keyword logs). Skipped tests are not returned
+
+    Args:
+        xml_file: A string that contains the path to the JUnit/xUnit or robot output xml file that will be read
+        config: Dictionary of variables (the 'jama_test_plan' and 'test_version_and_release_candidate' are added
+                to the result messages)
+
+    Returns: A generator of Test Result objects in the order of the file
+    """
+    stack = []
+    test_tag = None
+    test = None
+    for event, element in ElementTree.iterparse(xml_file, events=('start', 'end')):
+        if event == 'start':
+            if test_tag is None:
+                test_tag = ROBOT_TEST if element.tag == 'robot' else JUNIT_TEST
+            if test is None and element.tag == test_tag:
+                test = element
+            stack.append(element)
+            continue
+
+        stack.pop()
+        parent = stack[-1] if stack else None
+        test_result = None
+        if element is test:
+            test = None
+            if test_tag == ROBOT_TEST:
+                test_result = read_robot_test(element, config)
+            else:
+                test_result = read_junit_test_case(element, config)
+        elif parent is not None and parent is test and element.tag in JUNIT_OUTCOMES + (ROBOT_STATUS,):
+            continue
+
+        if parent is not None:
+            parent.remove(element)
+        if test_result is not None:
+            yield test_result
+
+
+def read_junit_test_case(test_case, config):
+    """
+    Return the Test Result of a JUnit/xUnit <testcase> element, None if the test was skipped
+    """
+    name = html.unescape(test_case.get('name', ''))
+    runtime = float(test_case.get('time') or 0)
+
+    for outcome in test_case:
+        if outcome.tag == 'skipped':
+            return None
+        if outcome.tag in ('failure', 'error'):
+            test_result = TestResult(name, runtime, "FAILED")
+            test_result.set_failed(outcome.tag, outcome.get('message') or (outcome.text or '').strip(),
+                                   config['jama_test_plan'], config['test_version_and_release_candidate'])
+            return test_result
+
+    test_result = TestResult(name, runtime, "PASSED")
+    test_result.set_passed(config['jama_test_plan'], config['test_version_and_release_candidate'])
+    return test_result
+
+
+def read_robot_test(test, config):
+    """
+    Return the Test Result of a robot output.xml <test> element, None if the test was skipped or not run
+    """
+    status = test.find(ROBOT_STATUS)
+    if status is None or status.get('status') not in ('PASS', 'FAIL'):
+        return None
+
+    name = html.unescape(test.get('name', ''))
+    runtime = get_robot_runtime(status)
+    if status.get('status') == 'FAIL':
+        test_result = TestResult(name, runtime, "FAILED")
+        test_result.set_failed('failure', (status.text or '').strip(), config['jama_test_plan'],
+                               config['test_version_and_release_candidate'])
+    else:
+        test_result = TestResult(name, runtime, "PASSED")
+        test_result.set_passed(config['jama_test_plan'], config['test_version_and_release_candidate'])
+    return test_result
+
+
+def get_robot_runtime(status):
+    """
+    Return the seconds a robot test took from its <status> element (robot 7 writes 'elapsed', older versions write
+    'starttime' and 'endtime')
+    """
+    if status.get('elapsed'):
+        return float(status.get('elapsed'))
+    try:
+        started = datetime.strptime(status.get('starttime'), ROBOT_TIME_FORMAT)
+        ended = datetime.strptime(status.get('endtime'), ROBOT_TIME_FORMAT)
+    except (TypeError, ValueError):
+        return 0.0
+    return (ended - started).total_seconds()
+
+
+def find_result_files(path_to_test_results):
+    """
+    Return the result files that a 'path_to_test_results' names: a single xml file, a directory (every .xml file in
+    it and its subdirectories) or a glob (e.g. "results/junit-*.xml", ** matches any number of directories)
+
+    Args:
+        path_to_test_results: A string representing an xml file path, a directory or a glob
+
+    Returns: A list of the xml file paths, oldest first (a rerun is written after the run it repeats)
+    """
+    if os.path.isdir(path_to_test_results):
+        paths = glob.glob(os.path.join(path_to_test_results, '**', '*.xml'), recursive=True)
+    elif glob.has_magic(path_to_test_results):
+        paths = [path for path in glob.glob(path_to_test_results, recursive=True) if os.path.isfile(path)]
+    else:
+        paths = [path_to_test_results]
+
+    if not paths:
+        raise Exception("No test result xml files were found at '" + path_to_test_results + "'")
+
+    return sorted(paths, key=lambda path: (os.path.getmtime(path), path))
+
+
+def read_result_file(xml_file, config):
+    """
+    Return every test result of one file as a list (the unit of work of a reader process)
+    """
+    return list(iter_test_results(xml_file, config))
+
+
+def merge_test_results(shards, duplicate_rule=LAST_ATTEMPT):
+    """
+    Merge the test results of several files into one list with a single result per test name
+
+    Args:
+        shards: A list of test result lists, in the order the files were written
+        duplicate_rule: LAST_ATTEMPT keeps the result of the latest file (within a file, the latest result),
+                        WORST_OUTCOME keeps a failure over a pass (and the latest of equal outcomes)
+
+    Returns: A tuple of the merged test results (in the order each test was first seen) and the amount of duplicate
+             results that were dropped
+    """
+    if duplicate_rule not in DUPLICATE_RULES:
+        raise Exception("Unknown duplicate test result rule '" + str(duplicate_rule) + "', please use one of: " +
+                        str(DUPLICATE_RULES))
+
+    merged = {}
+    duplicate_count = 0
+    for test_results in shards:
+        for test_result in test_results:
+            kept = merged.get(test_result.name)
+            if kept is not None:
+                duplicate_count += 1
+                if duplicate_rule == WORST_OUTCOME and kept.failed_test_case and not test_result.failed_test_case:
+                    continue
+            # Replacing a value keeps the key's position, the order of the tests stays the order they were first seen
+            merged[test_result.name] = test_result
+
+    return list(merged.values()), duplicate_count
+
+
+def read_result_files(xml_files, config, duplicate_rule=LAST_ATTEMPT, processes=None):
+    """
+    Read several result files (shards) in parallel reader processes and merge their test results
+
+    Args:
+        xml_files: A list of the xml file paths in the order they were written (see find_result_files)
+        config: Dictionary of variables passed to iter_test_results
+        duplicate_rule: How a test with results in several files is merged (see merge_test_results)
+        processes: An integer representing the maximum amount of reader processes (defaults to the cpu count)
+
+    Returns: A tuple of the merged test results and the amount of duplicate results that were dropped
+    """
+    if len(xml_files) == 1:
+        return merge_test_results([read_result_file(xml_files[0], config)], duplicate_rule)
+
+    with ProcessPoolExecutor(max_workers=min(len(xml_files), processes or os.cpu_count() or 1)) as executor:
+        shards = list(executor.map(read_result_file, xml_files, [config] * len(xml_files)))
+
+    return merge_test_results(shards, duplicate_rule)
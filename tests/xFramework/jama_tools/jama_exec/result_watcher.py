@@ -0,0 +1,84 @@
+import os
+import time
+
+
+# How often the results directory is listed and how long it may stay unchanged before the watch ends (a regression
+# run writes its last result file within this time of the last test)
+DEFAULT_POLL_SECONDS = 1.0
+DEFAULT_IDLE_SECONDS = 600.0
+
+
+class ResultWatcher:
+    """
+    Watches a results directory (and its subdirectories) for new or updated xml result files by polling their size
+    and modification time, so it works the same on every OS and on network shares. A file is only handed out once
+    it was unchanged for a whole poll interval: pytest-xdist workers and robot shards write their result file when
+    they finish, a file that is still being written is picked up on a later poll.
+    """
+    def __init__(self, watch_dir, poll_seconds=DEFAULT_POLL_SECONDS):
+        """
+        :watch_dir: A string representing the directory the result xml files are written to
+        :poll_seconds: A number representing the seconds between two listings of the directory
+        """
+        if not os.path.isdir(watch_dir):
+            raise Exception("The results directory '" + watch_dir + "' to watch does not exist")
+
+        self.watch_dir = watch_dir
+        self.poll_seconds = poll_seconds
+        # The (size, mtime) of every file when it was last listed and when it was last handed out
+        self.listed = {}
+        self.handed_out = {}
+
+    def list_result_files(self):
+        """
+        Return the (size, modification time) of every xml file in the directory by path
+        """
+        stamps = {}
+        for directory, _, file_names in os.walk(self.watch_dir):
+            for file_name in file_names:
+                if not file_name.endswith('.xml'):
+                    continue
+                path = os.path.join(directory, file_name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    # Removed between the listing and the stat (e.g. a temporary file renamed into place)
+                    continue
+                stamps[path] = (stat.st_size, stat.st_mtime_ns)
+        return stamps
+
+    def poll(self):
+        """
+        List the directory once and return the files that are new or changed since they were last handed out and
+        did not change since the previous listing
+
+        Returns: A list of the ready xml file paths, oldest first (a rerun is written after the run it repeats)
+        """
+        stamps = self.list_result_files()
+        ready = [path for path, stamp in stamps.items()
+                 if self.listed.get(path) == stamp and self.handed_out.get(path) != stamp]
+        self.listed = stamps
+        for path in ready:
+            self.handed_out[path] = stamps[path]
+        return sorted(ready, key=lambda path: (stamps[path][1], path))
+
+    def watch(self, idle_seconds=DEFAULT_IDLE_SECONDS):
+        """
+        Yield the batches of ready files until no file was added or changed for idle_seconds
+
+        Args:
+            idle_seconds: A number representing the seconds without any change after which the watch ends
+
+        Returns: A generator of lists of xml file paths
+        """
+        last_change = time.monotonic()
+        while True:
+            listed = self.listed
+            ready = self.poll()
+            if self.listed != listed:
+                last_change = time.monotonic()
+            if ready:
+                yield ready
+            elif time.monotonic() - last_change >= idle_seconds:
+                return
+            time.sleep(self.poll_seconds)
@@ -0,0 +1,419 @@
+#!/usr/bin/env python
+#test_jama_exec_unit.py
+
+import json
+import os
+import random
+import threading
+import time
+import tracemalloc
+
+import pytest
+
+import jama_exec
+from jama_api import JamaClientHelper
+from jama_common.fake_jama_server import FakeJamaServer
+from jama_common.metadata_cache import JamaMetadataCache
+from name_matcher import NameIndex, bounded_edit_distance
+from pytest_jama import is_xdist_worker
+from result_reader import LAST_ATTEMPT, WORST_OUTCOME, find_result_files, iter_test_results, read_result_files
+from result_test import TestResult
+
+pytest_plugins = ["pytester"]
+
+
+class FakeJamaClient:
+    """Stands in for the JamaClientHelper and records the test runs that were pushed"""
+    def __init__(self, failing_runs=()):
+        self.failing_runs = set(failing_runs)
+        self.pushed = []
+        self.lock = threading.Lock()
+
+    def push_test_run(self, test_run, status, result_message, duration_in_seconds, user_jama_id):
+        time.sleep(random.uniform(0, 0.01))
+        if test_run['id'] in self.failing_runs:
+            raise Exception("500 Server Error.")
+        with self.lock:
+            self.pushed.append((test_run['id'], status))
+        return 200
+
+
+def make_upload(run_id):
+    test_run = {'id': run_id, 'fields': {'name': "test_gid_" + str(run_id), 'testRunSteps': []}}
+    test_result = TestResult("test_gid_" + str(run_id), 1.0, "PASSED")
+    test_result.set_passed("plan", "v1.0.0-RC1")
+    return test_run, test_result
+
+
+def test_concurrent_push_reports_in_order(capfd):
+    uploads = [make_upload(run_id) for run_id in range(40)]
+    jama_client = FakeJamaClient(failing_runs=[3, 17])
+
+    failures = jama_exec.push_test_runs_concurrently(jama_client, uploads, 1234, workers=8)
+    output, err = capfd.readouterr()
+
+    assert sorted(run_id for run_id, _ in jama_client.pushed) == [i for i in range(40) if i not in (3, 17)]
+    assert failures == [("test_gid_3", "500 Server Error."), ("test_gid_17", "500 Server Error.")]
+
+    pushed_lines = [line for line in output.splitlines() if line.startswith("Pushed status")]
+    assert pushed_lines == ["Pushed status PASSED to test case: test_gid_" + str(i)
+                            for i in range(40) if i not in (3, 17)]
+    assert "Unable to push the following 2 test run results:" in output
+
+
+CONFIG = {'jama_test_plan': "plan", 'test_version_and_release_candidate': "v1.0.0-RC1"}
+
+ROBOT_TEST_TEMPLATE = '''<test id="s1-t{number}" name="TC-GID-{number}: Robot Test Case {number}">
+{keywords}<status status="{status}" starttime="20240101 10:00:00.000" endtime="20240101 10:00:01.500">{message}</status>
+</test>
+'''
+
+ROBOT_KEYWORD = '''<kw name="Log"><arg>{text}</arg><msg timestamp="20240101 10:00:00.100" level="INFO">{text}</msg>
+<status status="PASS" starttime="20240101 10:00:00.000" endtime="20240101 10:00:00.100"/></kw>
+'''
+
+
+def write_robot_output(path, test_count, keyword_count):
+    with open(path, 'w') as file:
+        file.write('<?xml version="1.0" encoding="UTF-8"?>\n<robot generator="Robot 6.1"><suite id="s1" name="Big">\n')
+        for number in range(test_count):
+            status = ("FAIL", "1 != 2") if number % 3 == 1 else ("SKIP", "") if number % 3 == 2 else ("PASS", "")
+            keywords = "".join(ROBOT_KEYWORD.format(text="x" * 200) for _ in range(keyword_count))
+            file.write(ROBOT_TEST_TEMPLATE.format(number=number, keywords=keywords, status=status[0],
+                                                  message=status[1]))
+        file.write('<status status="FAIL" starttime="20240101 10:00:00.000" endtime="20240101 10:00:02.000"/>\n'
+                   '</suite><statistics/><errors/></robot>\n')
+
+
+def test_junit_failures_errors_and_skips_are_read():
+    test_results = jama_exec.read_output_xml_file("test_data/jama_exec_test_cases/pytest_output.xml", CONFIG)
+    robot_results = jama_exec.read_output_xml_file("test_data/jama_exec_test_cases/robot_output.xml", CONFIG)
+
+    assert [(test_result.name, test_result.get_jama_result(), test_result.failure_type)
+            for test_result in test_results[:4]] == [("test_gid_195051_addition", "PASSED", None),
+                                                     ("test_gid_195052_subtraction", "FAILED", "failure"),
+                                                     ("test_gid_196301_raise_exception", "FAILED", "failure"),
+                                                     ("test_gid_196302_errors", "FAILED", "error")]
+    assert test_results[0].get_runtime() == 1.002
+    assert [(test_result.name, test_result.get_jama_result()) for test_result in robot_results] == \
+        [("TC-GID-200747: Robot Addition Test Case", "PASSED"), ("TC-GID-200748: Robot Subtraction Test Case", "FAILED")]
+    assert "1 != 2" in robot_results[1].get_jama_result_message()
+
+
+def test_robot_output_is_streamed(tmp_path):
+    write_robot_output(tmp_path / "small.xml", 6, 2)
+    test_results = list(iter_test_results(str(tmp_path / "small.xml"), CONFIG))
+
+    assert [(test_result.name.split(":")[0], test_result.get_jama_result()) for test_result in test_results] == \
+        [("TC-GID-0", "PASSED"), ("TC-GID-1", "FAILED"), ("TC-GID-3", "PASSED"), ("TC-GID-4", "FAILED")]
+    assert test_results[0].get_runtime() == 1.5
+    assert "1 != 2" in test_results[1].get_jama_result_message()
+
+    # The keyword logs are dropped as they are parsed, memory stays flat however many tests the file has
+    write_robot_output(tmp_path / "big.xml", 1500, 10)
+    tracemalloc.start()
+    test_count = sum(1 for _ in iter_test_results(str(tmp_path / "big.xml"), CONFIG))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    assert test_count == 1000
+    assert peak < (tmp_path / "big.xml").stat().st_size / 10
+
+
+def write_junit_shard(path, outcomes, modified):
+    with open(path, 'w') as file:
+        file.write('<?xml version="1.0" encoding="utf-8"?><testsuites><testsuite name="pytest">')
+        for name, outcome in outcomes:
+            failure = '<failure message="assert 1 == 2"/>' if outcome == "FAILED" else ''
+            file.write('<testcase name="' + name + '" time="0.5">' + failure + '</testcase>')
+        file.write('</testsuite></testsuites>')
+    os.utime(path, (modified, modified))
+
+
+def test_result_shards_are_merged_by_test_name(tmp_path):
+    shard_path = tmp_path / "results" / "gw1"
+    shard_path.mkdir(parents=True)
+    write_junit_shard(tmp_path / "results" / "gw0.xml", [("test_gid_1_a", "PASSED"), ("test_gid_2_b", "FAILED")], 100)
+    write_junit_shard(shard_path / "gw1.xml", [("test_gid_3_c", "FAILED")], 200)
+    write_junit_shard(tmp_path / "results" / "rerun.xml", [("test_gid_2_b", "PASSED"), ("test_gid_3_c", "PASSED")],
+                      300)
+
+    xml_files = find_result_files(str(tmp_path / "results"))
+    assert [os.path.basename(path) for path in xml_files] == ["gw0.xml", "gw1.xml", "rerun.xml"]
+    assert find_result_files(str(tmp_path / "results" / "gw*.xml")) == [str(tmp_path / "results" / "gw0.xml")]
+    assert find_result_files(str(tmp_path / "results" / "**" / "gw*.xml"))[1].endswith("gw1.xml")
+
+    last, duplicate_count = read_result_files(xml_files, CONFIG, LAST_ATTEMPT, processes=2)
+    worst, _ = read_result_files(xml_files, CONFIG, WORST_OUTCOME, processes=2)
+
+    assert duplicate_count == 2
+    assert [(test_result.name, test_result.get_jama_result()) for test_result in last] == \
+        [("test_gid_1_a", "PASSED"), ("test_gid_2_b", "PASSED"), ("test_gid_3_c", "PASSED")]
+    assert [test_result.get_jama_result() for test_result in worst] == ["PASSED", "FAILED", "FAILED"]
+    with pytest.raises(Exception, match="No test result xml files"):
+        find_result_files(str(tmp_path / "results" / "*.json"))
+
+
+class ExecTestCycle:
+    """A FakeJamaServer with the "Exec" project and the test plan and test cycle that results are pushed to"""
+    def __init__(self, server, tmp_path):
+        self.server = server
+        self.project_id = server.add_project("Exec")
+        self.folder_id = server.add_folder(self.project_id, "exec_root")
+        self.test_cycle_id = server.add_test_cycle(server.add_test_plan(self.project_id, "TST-1 Exec v1.0.0"),
+                                                   "Exec v1.0.0-RC1")
+        self.metadata_cache_path = tmp_path / "cache.json"
+
+    def add_test_case(self, name):
+        """Add a test case with a run in the test cycle and return the test case id"""
+        test_case_id = self.server.add_test_case(self.project_id, self.folder_id, name)
+        self.server.add_test_run(self.test_cycle_id, test_case_id)
+        return test_case_id
+
+    def make_jama_client(self):
+        jama_client = JamaClientHelper(self.server.url, "user", "secret",
+                                       metadata_cache=JamaMetadataCache(self.server.url, self.metadata_cache_path))
+        jama_client.jama_core.configure_throttle(0)
+        return jama_client
+
+
+@pytest.fixture
+def exec_cycle(tmp_path):
+    with FakeJamaServer() as server:
+        yield ExecTestCycle(server, tmp_path)
+
+
+def test_ids_are_resolved_from_one_test_plan_listing(exec_cycle):
+    server = exec_cycle.server
+    test_results = []
+    for number in range(120):
+        test_case_id = exec_cycle.add_test_case("Robot Test Case " + str(number))
+        name = "  robot TEST case " + str(number) if number % 2 else \
+            "TC-" + server.items[test_case_id]['globalId'] + ": Robot Test Case " + str(number)
+        test_results.append(TestResult(name, 1.0, "PASSED"))
+    server.add_test_case(exec_cycle.project_id, exec_cycle.folder_id, "Not In The Plan")
+    test_results.append(TestResult("Not In The Plan", 1.0, "PASSED"))
+
+    jama_exec.get_test_case_jama_ids(exec_cycle.make_jama_client(), "Exec", test_results, "robot",
+                                     "TST-1 Exec v1.0.0", compare=True)
+
+    assert [test_result.get_jama_test_case_id() for test_result in test_results[:-1]] == \
+        [test_run['fields']['testCase'] for test_run in server.test_runs.values()]
+    assert test_results[-1].get_jama_test_case_id() == -1
+    assert server.request_counts['GET abstractitems'] == 0
+    assert server.request_counts['GET testplans/{id}/testcases'] == 3
+
+
+def test_cached_ids_of_recreated_or_renamed_test_cycles_are_looked_up_again(exec_cycle):
+    server = exec_cycle.server
+    test_plan_id = server.test_cycles[exec_cycle.test_cycle_id]['fields']['testPlan']
+    jama_client = exec_cycle.make_jama_client()
+    project_id = jama_client.get_project_id("Exec")
+    assert jama_client.get_test_plan_id(project_id, "TST-1 Exec v1.0.0") == test_plan_id
+    assert jama_client.get_test_cycle_id(test_plan_id, "Exec v1.0.0-RC1") == exec_cycle.test_cycle_id
+
+    # The cycle is deleted and created again under the same name
+    server.delete_test_cycle(exec_cycle.test_cycle_id)
+    recreated_cycle_id = server.add_test_cycle(test_plan_id, "Exec v1.0.0-RC1")
+    server.add_test_run(recreated_cycle_id, server.add_test_case(project_id, exec_cycle.folder_id, "Test Case"))
+    jama_client = exec_cycle.make_jama_client()
+    assert jama_client.get_test_cycle_id(test_plan_id, "Exec v1.0.0-RC1") == recreated_cycle_id
+    assert len(jama_client.get_test_runs(recreated_cycle_id)) == 1
+
+    # The cycle is renamed and a new cycle takes its name
+    server.test_cycles[recreated_cycle_id]['fields']['name'] = "Exec v1.0.0-RC1 (old)"
+    new_cycle_id = server.add_test_cycle(test_plan_id, "Exec v1.0.0-RC1")
+    server.reset_request_counts()
+    jama_client = exec_cycle.make_jama_client()
+    assert jama_client.get_project_id("Exec") == project_id
+    assert jama_client.get_test_plan_id(project_id, "TST-1 Exec v1.0.0") == test_plan_id
+    assert jama_client.get_test_cycle_id(test_plan_id, "Exec v1.0.0-RC1") == new_cycle_id
+    assert jama_client.get_test_cycle_id(test_plan_id, "Exec v1.0.0-RC1") == new_cycle_id
+    # The cached project and test plan are checked once and not listed again
+    assert server.request_counts['GET projects'] == 0
+    assert server.request_counts['GET testplans'] == 0
+    assert server.request_counts['GET testcycles/{id}'] == 1
+    assert server.request_counts['GET testplans/{id}/testcycles'] == 1
+
+
+def test_near_matches_are_flagged_with_scores(tmp_path):
+    not_executed = ["TC-GID-1:Login works", "TC-GID-2:Logout works", "Upload a large firmware image to the device",
+                    "Something else entirely"]
+    not_in_jama = ["TC-GID-1:Login is working", "logout   WORKS", "Upload a large firmware image to the devices",
+                   "A brand new test"]
+
+    not_in_jama_left, not_executed_left, not_executed_off, not_in_jama_off = \
+        jama_exec.find_similar_test_cases_executed_in_plan(not_executed, not_in_jama, True)
+
+    assert not_executed_off == [("TC-GID-1:Login works", "TC-GID-1:Login is working", 1.0),
+                                ("TC-GID-2:Logout works", "logout   WORKS", 1.0),
+                                ("Upload a large firmware image to the device",
+                                 "Upload a large firmware image to the devices", 0.977)]
+    assert [name for name, _, _ in not_in_jama_off] == not_in_jama[:3]
+    assert not_executed_left == ["Something else entirely"]
+    assert not_in_jama_left == ["A brand new test"]
+    assert jama_exec.find_similar_test_cases_executed_in_plan(not_executed, not_in_jama, False) == ([], [], [], [])
+
+    jama_exec.notify_user_of_deltas(not_in_jama_left, not_executed_left, [], not_in_jama_off, not_executed_off, True,
+                                    str(tmp_path))
+    log = (tmp_path / "jama_exec.log").read_text()
+    assert "Upload a large firmware image to the devices  ~  Upload a large firmware image to the device " \
+           "(score 0.98)" in log
+
+
+def test_bounded_edit_distance():
+    assert bounded_edit_distance("kitten", "sitting", 3) == 3
+    assert bounded_edit_distance("kitten", "sitting", 2) == 3
+    assert bounded_edit_distance("", "abc", 5) == 3
+    assert bounded_edit_distance("same", "same", 0) == 0
+
+
+def test_near_matching_scales_to_large_test_plans():
+    generator = random.Random(20)
+    words = ["".join(generator.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(generator.randint(3, 9)))
+             for _ in range(3000)]
+    titles = list(dict.fromkeys(" ".join(generator.choice(words) for _ in range(6)) for _ in range(50000)))
+    in_jama = ["TC-GID-" + str(number) + ":" + title for number, title in enumerate(titles)]
+    # Executed names carry another prefix, half of them with a small typo in the title
+    executed = ["TC-" + str(number) + ":" + (title[:9] + "_" + title[10:] if number % 2 else title)
+                for number, title in enumerate(titles)]
+
+    started = time.perf_counter()
+    index = NameIndex(in_jama)
+    matches = [index.find_match(name) for name in executed]
+    elapsed = time.perf_counter() - started
+
+    assert all(match is not None for match in matches)
+    assert matches[1][0] == in_jama[1] and matches[1][1] < 1.0
+    assert elapsed < 30
+
+
+def test_only_changed_results_are_pushed(exec_cycle, capfd):
+    server = exec_cycle.server
+    test_case_ids = [exec_cycle.add_test_case("Test Case " + str(number)) for number in range(300)]
+    jama_client = exec_cycle.make_jama_client()
+
+    def upload(failing, full_upload=False):
+        test_results = []
+        for number, test_case_id in enumerate(test_case_ids):
+            test_result = TestResult("Test Case " + str(number), 1.0, "FAILED" if number in failing else "PASSED")
+            if number in failing:
+                test_result.set_failed("failure", "assert 1 == 2", "TST-1 Exec v1.0.0", "v1.0.0-RC1")
+            else:
+                test_result.set_passed("TST-1 Exec v1.0.0", "v1.0.0-RC1")
+            test_result.set_jama_test_case_id(test_case_id)
+            test_results.append(test_result)
+        server.reset_request_counts()
+        jama_exec.update_jama_with_results(jama_client, "Exec", "TST-1 Exec v1.0.0", "TST-1", "Exec v1.0.0-RC1",
+                                           "v1.0.0-RC1", "", test_results, False, workers=4,
+                                           full_upload=full_upload)
+        return server.request_counts.get('PUT testruns/{id}', 0)
+
+    assert upload(failing=range(10)) == 300
+    # 4 tests were fixed since, nothing else changed
+    assert upload(failing=range(4, 10)) == 4
+    assert "Skipped 296 test run results that are unchanged in Jama" in capfd.readouterr().out
+    assert upload(failing=range(4, 10)) == 0
+    assert upload(failing=range(4, 10), full_upload=True) == 300
+
+    assert [test_run['fields']['testRunStatus'] for test_run in server.test_runs.values()][:11] == \
+        ["PASSED"] * 4 + ["FAILED"] * 6 + ["PASSED"]
+
+
+def test_watch_pushes_result_files_as_they_are_written(exec_cycle, tmp_path, capfd):
+    watch_dir = tmp_path / "results"
+    watch_dir.mkdir()
+    server = exec_cycle.server
+    names = []
+    for number in range(6):
+        test_case_id = exec_cycle.add_test_case("Test Case " + str(number))
+        names.append("test_" + server.items[test_case_id]['globalId'].lower().replace("-", "_") + "_case")
+
+    jama_client = exec_cycle.make_jama_client()
+    config = {'jama_project': "Exec", 'jama_test_plan': "TST-1 Exec v1.0.0", 'report_id': "TST-1",
+              'jama_test_cycle': "Exec v1.0.0-RC1", 'test_version_and_release_candidate': "v1.0.0-RC1",
+              'test_results_type': "pytest", 'bulk_comment': "", 'watch_poll_seconds': 0.05,
+              'watch_idle_seconds': 1.0}
+
+    def write_shards():
+        # Two xdist workers finish one after the other, then the first worker's failure is rerun and passes
+        time.sleep(0.2)
+        write_junit_shard(watch_dir / "gw0.xml", [(names[0], "PASSED"), (names[1], "FAILED"),
+                                                  ("test_gid_999999_missing", "PASSED")], time.time())
+        time.sleep(0.4)
+        write_junit_shard(watch_dir / "gw1.xml", [(name, "PASSED") for name in names[2:]], time.time())
+        time.sleep(0.4)
+        write_junit_shard(watch_dir / "gw0.xml", [(names[0], "PASSED"), (names[1], "PASSED"),
+                                                  ("test_gid_999999_missing", "PASSED")], time.time())
+
+    writer = threading.Thread(target=write_shards)
+    writer.start()
+    not_in_jama = jama_exec.watch_and_update_jama(jama_client, config, str(watch_dir), workers=2)
+    writer.join()
+
+    assert not_in_jama == ["test_gid_999999_missing"]
+    # Every run was pushed once, only the rerun test again, and the cycle was listed once
+    assert server.request_counts['PUT testruns/{id}'] == 7
+    assert server.request_counts['GET testcycles/{id}/testruns'] == 1
+    assert [test_run['fields']['testRunStatus'] for test_run in server.test_runs.values()] == ["PASSED"] * 6
+
+
+PUBLISHED_TESTS = '''
+import pytest
+
+@pytest.fixture
+def broken():
+    raise RuntimeError("no device")
+
+def test_{0}_passes():
+    pass
+
+def test_{1}_fails():
+    assert 1 == 2
+
+def test_{2}_errors(broken):
+    pass
+
+@pytest.mark.skip
+def test_{3}_skipped():
+    pass
+
+def test_not_in_jama():
+    pass
+'''
+
+
+def test_plugin_publishes_results_during_the_session(exec_cycle, pytester, tmp_path):
+    server = exec_cycle.server
+    global_ids = []
+    for number in range(4):
+        test_case_id = exec_cycle.add_test_case("Test Case " + str(number))
+        global_ids.append(server.items[test_case_id]['globalId'].lower().replace("-", "_"))
+
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({
+        'jama_url': server.url, 'jama_project': "Exec", 'jama_test_plan': "TST-1 Exec v1.0.0",
+        'report_id': "TST-1", 'jama_test_cycle': "Exec v1.0.0-RC1", 'test_version_and_release_candidate':
+        "v1.0.0-RC1", 'bulk_comment': "", 'jama_requests_per_second': 0,
+        'metadata_cache_path': str(exec_cycle.metadata_cache_path)}))
+    pytester.makepyfile(PUBLISHED_TESTS.format(*global_ids))
+
+    result = pytester.runpytest_inprocess("-p", "pytest_jama", "--jama-publish", "--jama-config", str(config_path),
+                                          "--jama-username", "user", "--jama-password", "secret")
+
+    result.assert_outcomes(passed=2, failed=1, errors=1, skipped=1)
+    result.stdout.fnmatch_lines(["*Pushed 3 test run results to Jama, 0 were unchanged*"])
+    statuses = [test_run['fields']['testRunStatus'] for test_run in server.test_runs.values()]
+    assert statuses == ["PASSED", "FAILED", "FAILED", "NOT_RUN"]
+    assert "assert 1 == 2" in list(server.test_runs.values())[1]['fields']['actualResults']
+    assert "no device" in list(server.test_runs.values())[2]['fields']['actualResults']
+
+
+def test_only_the_xdist_controller_publishes():
+    class Config:
+        pass
+
+    worker = Config()
+    worker.workerinput = {'workerid': "gw0"}
+    assert is_xdist_worker(worker)
+    assert not is_xdist_worker(Config())
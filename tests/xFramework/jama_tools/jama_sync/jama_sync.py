@@ -4,21 +4,32 @@
 import argparse
 import io
 import json
+import os
 import sys
 import traceback
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from libraries.doc_read_helper import read_section, read_step_section
 from libraries.interperter import GherkinInterpreter, Interpreter, InterpreterFactory, PytestInterpreter, \
     RobotInterpreter
-from libraries.jama_api import JamaClientHelper
+from libraries.jama_api import DEFAULT_POOL_SIZE, PLACEHOLDER_GLOBAL_ID_PREFIX, UNCHANGED, JamaClientHelper
+from libraries.parse_cache import DEFAULT_PARSE_CACHE_PATH, ParseCache
+from libraries.sync_state import ADDED, DEFAULT_STATE_PATH, LINKED, RENAMED, SyncState, client_key, fields_hash
 from libraries.test_case import TestCase
+from jama_common.jama_metrics import (DEFAULT_METRICS_DIRECTORY, PUSH, READ_FILES, RESOLVE_IDS, VERIFY,
+                                      WRITE_FILES)
+from jama_common.jama_throttle import DEFAULT_MAX_RETRIES, DEFAULT_REQUESTS_PER_SECOND
+from jama_common.metadata_cache import DEFAULT_CACHE_PATH, DEFAULT_TTL_HOURS, JamaMetadataCache
 
 
 VALID_INTERPRETERS = ['xframework', 'robot', 'gherkin']
 
+# Test cases are added/updated in chunks of this many, the GIDs of each chunk are written to the files before the next
+DEFAULT_CHUNK_SIZE = 30
+
 config_path = Path(__file__).parent / 'config.json'
 with open(config_path, 'r') as file:
     config = json.load(file)
@@ -30,22 +41,41 @@ with open(config_path, 'r') as file:
 #  in the Jama Projects first
 
 
-def initialize_jama_client(jama_username: str, jama_password: str) -> JamaClientHelper:
+def initialize_jama_client(jama_username: str, jama_password: str, refresh_cache: bool = False) -> JamaClientHelper:
     """
     Return an initialized JamaClientHelper
 
     Args:
         jama_username: Username for the Jama client
         jama_password: Password for the Jama client
+        refresh_cache: A boolean that indicates whether the cached Jama metadata should be thrown away first
 
     Returns:
         An initialized Jama client
     """
-    return JamaClientHelper(config['jama_url'], jama_username, jama_password,
-                            config['default_test_case_api_type'],
-                            config['default_folder_api_type'],
-                            config['default_api_status'],
-                            config['default_test_case_status'])
+    metadata_cache = JamaMetadataCache(config['jama_url'],
+                                       config.get('metadata_cache_path', DEFAULT_CACHE_PATH),
+                                       config.get('metadata_cache_ttl_hours', DEFAULT_TTL_HOURS))
+    if refresh_cache:
+        metadata_cache.invalidate()
+    metadata_cache.check_item_types({
+        'default_test_case_api_type': config['default_test_case_api_type'],
+        'default_folder_api_type': config['default_folder_api_type'],
+    })
+
+    jama_client = JamaClientHelper(config['jama_url'], jama_username, jama_password,
+                                   config['default_test_case_api_type'],
+                                   config['default_folder_api_type'],
+                                   config['default_api_status'],
+                                   config['default_test_case_status'],
+                                   config.get('jama_pool_size', DEFAULT_POOL_SIZE),
+                                   metadata_cache,
+                                   config.get('compare_before_update', True))
+    jama_client.jama_client.transport.configure_throttle(
+        config.get('jama_requests_per_second', DEFAULT_REQUESTS_PER_SECOND),
+        config.get('jama_burst'),
+        config.get('jama_max_retries', DEFAULT_MAX_RETRIES))
+    return jama_client
 
 
 def parse_args(args: List[str]):
@@ -67,6 +97,12 @@ def parse_args(args: List[str]):
                         choices=VALID_INTERPRETERS, required=True)
     parser.add_argument("--update", help="update a test case", default=False, action="store_true")
     parser.add_argument("--add", help="add a test case", default=False, action="store_true")
+    parser.add_argument("--refresh-cache", help="ignore and rebuild the cached Jama project ids and parsed test files",
+                        default=False, action="store_true")
+    parser.add_argument("--full-sync", help="push and check every test case, even the ones that did not change since "
+                        "they were last pushed", default=False, action="store_true")
+    parser.add_argument("--plan", help="only read from Jama and print what the add/update would do and how many write "
+                        "calls it would make", default=False, action="store_true")
 
     args_return = parser.parse_args(args)
     args_return.root_jama_folder_path = format_path(args_return.root_path)
@@ -299,10 +335,9 @@ def get_parent_folder_path(root_jama_folder_path: str, file_path: str) -> str:
         return parent_path
 
 
-def read_file(args, file_path: str, interpreter: Interpreter) -> Tuple[List[TestCase], List[TestCase]]:
+def parse_file(args, file_path: str, interpreter: Interpreter) -> Tuple[List[TestCase], List[TestCase]]:
     """
-    Read test cases in a given test file and return a
-    list of test cases that were interpreted properly
+    Filter and parse the test cases of a test file without printing them (the unit of work of a parser process)
 
     Args:
         args: Arguments passed in from the command line
@@ -317,64 +352,129 @@ def read_file(args, file_path: str, interpreter: Interpreter) -> Tuple[List[Test
     parent_folder_path = get_parent_folder_path(args.root_jama_folder_path, file_path)
 
     # Split and filter the test cases in the test cases section
-    add_test_case_list, update_test_case_list = read_test_cases(test_case_section, parent_folder_path,
-                                                                args, interpreter)
+    return read_test_cases(test_case_section, parent_folder_path, args, interpreter)
+
 
+def print_file_test_cases(file_path: str, interpreter: Interpreter, add_test_case_list: List[TestCase],
+                          update_test_case_list: List[TestCase]) -> None:
+    """
+    Print the names of the test cases that were read from a test file
+    """
     print("\nFrom " + file_path + ", the following '" + interpreter.name + "' test cases were read:")
     print_all_test_case_names(add_test_case_list, False)
     print_all_test_case_names(update_test_case_list, False)
     print()
 
-    return add_test_case_list, update_test_case_list
-
 
-def check_sync(test_case: TestCase, jama_client: JamaClientHelper) -> bool:
+def read_file(args, file_path: str, interpreter: Interpreter) -> Tuple[List[TestCase], List[TestCase]]:
     """
-    Check that all test cases that are synced (link) are also synchronized (updates pushed)
+    Read test cases in a given test file and return a
+    list of test cases that were interpreted properly
 
     Args:
-        test_case: A TestCase object
-        jama_client: A JamaClientHelper object to call the Jama REST API
+        args: Arguments passed in from the command line
+        file_path: A string representing the path to the test file
+        interpreter: the interpreter used to read
 
     Returns:
-        A boolean that indicates whether the test case is synced (push) across all respective projects
+        A tuple of TestCase object lists that contain test cases from the test file
     """
+    add_test_case_list, update_test_case_list = parse_file(args, file_path, interpreter)
+    print_file_test_cases(file_path, interpreter, add_test_case_list, update_test_case_list)
 
-    # Get the master project test case id
-    test_case_id = test_case.get_test_case_id(config['default_master_project'])
+    return add_test_case_list, update_test_case_list
 
-    # Get all items that are synced (link) to this parent test case
-    synced_items = jama_client.get_synced_items(test_case_id)
 
-    # If there was a problem getting the synced items, return False
-    if not synced_items:
-        return False
+def load_parser_config(parent_config: Dict) -> None:
+    """
+    Give a parser process the config of the run (a spawned process would otherwise only see config.json)
+    """
+    config.clear()
+    config.update(parent_config)
 
-    # iterate through the synced (link) items and check if the items are synced (push)
-    is_synced = True
-    for item in synced_items:
-        if jama_client.get_synced_items_status(test_case_id, item['id'])['inSync'] != -1:
-            # Shouldn't be having multiple of the same test case in one project
-            if test_case.get_project_name(item['project']) == config['default_master_project']:
-                print("Warning: there are two of the same test cases in the project " +
-                      config['default_master_project'] + ", we should not have two test cases in this project")
 
-            print("'" + item['fields']['name'] + "' in project '" +
-                  test_case.get_project_name(item['project']) + "' is in sync with " +
-                  config['default_master_project'])
-        else:
-            print("'" + item['fields']['name'] + "' in project '" +
-                  test_case.get_project_name(item['project']) + "' IS NOT IN SYNC WITH " +
-                  config['default_master_project'])
-            is_synced = False
+def initialize_parse_cache(args, interpreter: Interpreter) -> Optional[ParseCache]:
+    """
+    Return the cache of the parsed test files (config 'parse_cache_path', None turns the cache off), emptied first
+    with --refresh-cache
+    """
+    cache_path = config.get('parse_cache_path', str(DEFAULT_PARSE_CACHE_PATH))
+    if not cache_path:
+        return None
+
+    # Parsing depends on the interpreter, the Jama root folder (the parent folder paths), the project settings and
+    # whether test cases are read to add, to update or both (read_test_cases only reads the chosen sections)
+    parse_cache = ParseCache(cache_path, {'interpreter': interpreter.name,
+                                          'root_path': args.root_jama_folder_path,
+                                          'add': bool(args.add),
+                                          'update': bool(args.update),
+                                          'master_project': config['default_master_project'],
+                                          'projects': config['jama_project_list']})
+    if args.refresh_cache:
+        parse_cache.invalidate()
+    return parse_cache
+
+
+def read_test_files(args, test_files: List[str], interpreter: Interpreter, processes: int = None,
+                    parse_cache: ParseCache = None) -> Tuple[List[TestCase], List[TestCase]]:
+    """
+    Read the test cases of every test file of a directory, the files are parsed in parallel processes and the test
+    cases are merged (and printed) in the order of the files, the same as reading them one after another
 
-    return is_synced
+    Args:
+        args: Arguments passed in from the command line
+        test_files: A list of the test file paths (see Interpreter.get_test_files)
+        interpreter: the interpreter used to read
+        processes: An integer representing the maximum amount of parser processes (defaults to the cpu count)
+        parse_cache: A ParseCache, the files that did not change since they were cached are not parsed again
+
+    Returns:
+        A tuple of the TestCase object lists to add and to update
+    """
+    parsed_files = {}
+    if parse_cache is not None:
+        for test_file in test_files:
+            cached_file = parse_cache.get(test_file)
+            if cached_file is not None:
+                parsed_files[test_file] = cached_file
+    files_to_parse = [test_file for test_file in test_files if test_file not in parsed_files]
+
+    processes = min(len(files_to_parse), processes or os.cpu_count() or 1)
+    if processes <= 1:
+        parsed = [parse_file(args, test_file, interpreter) for test_file in files_to_parse]
+    else:
+        with ProcessPoolExecutor(max_workers=processes, initializer=load_parser_config,
+                                 initargs=(dict(config),)) as executor:
+            # Files are handed out in chunks, a monorepo has thousands of small files
+            parsed = list(executor.map(parse_file, [args] * len(files_to_parse), files_to_parse,
+                                       [interpreter] * len(files_to_parse),
+                                       chunksize=max(1, len(files_to_parse) // (processes * 4))))
+
+    for test_file, parsed_file in zip(files_to_parse, parsed):
+        parsed_files[test_file] = parsed_file
+        if parse_cache is not None:
+            parse_cache.put(test_file, parsed_file)
+    if parse_cache is not None:
+        parse_cache.save()
+        print("Parsed " + str(len(files_to_parse)) + " test files, " + str(len(test_files) - len(files_to_parse)) +
+              " unchanged test files were read from the parse cache")
+
+    add_test_case_list = []
+    update_test_case_list = []
+    for test_file in test_files:
+        add_list, update_list = parsed_files[test_file]
+        print_file_test_cases(test_file, interpreter, add_list, update_list)
+        add_test_case_list.extend(add_list)
+        update_test_case_list.extend(update_list)
+
+    return add_test_case_list, update_test_case_list
 
 
 def check_all_test_cases_synced(test_case_list: List[TestCase], jama_client: JamaClientHelper) -> bool:
     """
-    Check that all test cases in a given list are synced (pushed)
-    with their test cases across their respective projects
+    Check that all test cases in a given list are synced (pushed) with their test cases across their respective
+    projects. The synced items and their sync status are looked up concurrently for every test case, then one table
+    of in sync and out of sync items is printed per project
 
     Args:
         test_case_list: An array of TestCase objects
@@ -383,11 +483,80 @@ def check_all_test_cases_synced(test_case_list: List[TestCase], jama_client: Jam
     Returns:
         A boolean that indicates whether the test cases are synced (push) across all respective projects
     """
-    for test_case in test_case_list:
-        if not check_sync(test_case, jama_client):
-            return False
+    master_project = config['default_master_project']
+    test_case_ids = [test_case.get_test_case_id(master_project) for test_case in test_case_list]
+
+    # A failed lookup is kept with its error, so that it is reported in the table instead of stopping the check
+    def get_synced_items(test_case_id):
+        if not test_case_id:
+            return [], ""
+        try:
+            return jama_client.fetch_synced_items(test_case_id), ""
+        except Exception as e:
+            return [], "unable to find the synced items: " + str(e)
+
+    def get_sync_status(pair):
+        try:
+            return jama_client.fetch_sync_status(*pair), ""
+        except Exception as e:
+            return None, "unable to read the sync status: " + str(e)
+
+    with ThreadPoolExecutor(max_workers=jama_client.pool_size) as executor:
+        synced_items_list = list(executor.map(get_synced_items, test_case_ids))
+        pairs = [(test_case_id, item['id'])
+                 for test_case_id, (synced_items, _) in zip(test_case_ids, synced_items_list) for item in synced_items]
+        sync_statuses = dict(zip(pairs, executor.map(get_sync_status, pairs)))
+
+    # Gather the results per project, in the order of the test case list
+    project_tables = {}
+    all_synced = True
+    for test_case, test_case_id, (synced_items, error) in zip(test_case_list, test_case_ids, synced_items_list):
+        # A test case without synced (link) items (or whose items could not be found) is not synced
+        if not synced_items:
+            project_tables.setdefault(master_project, []).append((test_case.get_name(), "NO SYNCED ITEMS", error))
+            all_synced = False
+            continue
+
+        for item in synced_items:
+            project = test_case.get_project_name(item['project'])
+
+            # Shouldn't be having multiple of the same test case in one project
+            if project == master_project:
+                print("Warning: there are two of the same test cases in the project " + master_project +
+                      ", we should not have two test cases in this project")
+
+            in_sync, error = sync_statuses[(test_case_id, item['id'])]
+            if in_sync is None:
+                status = "UNKNOWN"
+            else:
+                status = "in sync" if in_sync else "NOT IN SYNC"
+            all_synced = all_synced and bool(in_sync)
+            project_tables.setdefault(project, []).append((item['fields']['name'], status, error))
+
+    print_sync_tables(project_tables, master_project)
+
+    return all_synced
 
-    return True
+
+def print_sync_tables(project_tables: Dict[str, List[Tuple[str, str, str]]], master_project: str) -> None:
+    """
+    Print one table per project of the synced items and whether they are in sync with the master project
+
+    Args:
+        project_tables: A dictionary of project names to a list of (test case name, sync status, error) tuples, the
+                        error of a lookup that failed is printed after the name
+        master_project: A string representing the master project name
+
+    Returns:
+        None
+    """
+    for project, rows in project_tables.items():
+        in_sync_count = sum(1 for name, status, error in rows if status == "in sync")
+        print("\nSync (push) status with '" + master_project + "' in project '" + project + "': " +
+              str(in_sync_count) + " in sync, " + str(len(rows) - in_sync_count) + " not in sync")
+        for name, status, error in rows:
+            print("    {:<16} {}".format(status, name) + (" (" + error + ")" if error else ""))
+    print()
 
 
 def print_all_test_cases(test_case_list: List[TestCase]) -> None:
@@ -452,7 +621,8 @@ def pull_project_tracking(test_case_list: List[TestCase], jama_client: JamaClien
                 known_project_ids[project] = project_id
 
             # Retrieve the test case id for that specified project, if there
-            # is no project, tell the user that a new sync will be made
+            # is no project, tell the user that a new sync will be made. The test case
+            # and parent ids come from the project's global id index (one listing per project)
             test_case_id = jama_client.get_test_case_id_from_global_id(project, project_id, test_case.get_global_id())
             if test_case_id == -1:
                 parent_id = jama_client.get_folder_id(project_id, test_case.get_parent_folder_path(), project)
@@ -463,13 +633,24 @@ def pull_project_tracking(test_case_list: List[TestCase], jama_client: JamaClien
     return test_case_list
 
 
-def sync_push_updates(test_case_list: List[TestCase], jama_client: JamaClientHelper) -> int:
+def initialize_sync_state() -> SyncState:
+    """
+    Return the local store of the test case content that was last pushed to Jama (config 'sync_state_path')
+    """
+    return SyncState(config['jama_url'], config.get('sync_state_path', DEFAULT_STATE_PATH))
+
+
+def sync_push_updates(test_case_list: List[TestCase], jama_client: JamaClientHelper, sync_state: SyncState = None,
+                      full_sync: bool = False) -> int:
     """
     Push all updated test cases to all projects that are synced (linked)
 
     Args:
         test_case_list: An array of TestCase objects
         jama_client: A JamaClientHelper object to call the Jama REST API
+        sync_state: A SyncState, if given test cases whose content did not change since they were last pushed to a
+                    project are neither pushed nor checked for sync again
+        full_sync: A boolean that indicates whether every test case is pushed, whatever the sync state says
 
     Returns:
         An integer that indicates whether the test cases were
@@ -480,36 +661,79 @@ def sync_push_updates(test_case_list: List[TestCase], jama_client: JamaClientHel
     # and check that the callback returns a success response. If there is no test case id for
     # the project, that means the test case needs to be added to a project
     print()
-    for test_case in test_case_list:
-        # If the user is trying to push updates for a test case with a GID
-        # that does not exist in the master project, that means it doesn't exist,
-        # so this needs to stop them from trying to proceed.
-        if not test_case.get_test_case_id(config['default_master_project']):
-            print("\nUnable to find test case " + test_case.get_name() + " in master project '" +
-                  config['default_master_project'] + "' please make sure this test case "
-                  "exists there before updating\n")
-            continue
-
-        for project, project_track in test_case.get_projects().items():
-            if test_case.get_test_case_id(project) is None:
-                default_test_case_id = test_case.get_test_case_id(config['default_master_project'])
-                if jama_client.add_sync_link(project, test_case, default_test_case_id) >= 0:
-                    print("Successfully synced (link): " + test_case.name + " to project '" + project + "'")
-                else:
-                    print("Failed to sync (link) properly: " + test_case.name + " to project '" + project + "'")
-                    print("     If a test case called " + test_case.name + " was added in project '" + project +
-                          "', please manually delete it")
-            else:
-                api_callback = jama_client.update_test_case(project, test_case)
-                if 200 <= api_callback < 300:
-                    print("Successfully updated: " + test_case.get_name() + " in project '" + project + "'")
+    pushed_test_cases = []
+    unchanged_count = 0
+    matching_count = 0
+    with jama_client.metrics.phase(PUSH):
+        for test_case in test_case_list:
+            # If the user is trying to push updates for a test case with a GID
+            # that does not exist in the master project, that means it doesn't exist,
+            # so this needs to stop them from trying to proceed.
+            if not test_case.get_test_case_id(config['default_master_project']):
+                print("\nUnable to find test case " + test_case.get_name() + " in master project '" +
+                      config['default_master_project'] + "' please make sure this test case "
+                      "exists there before updating\n")
+                continue
+
+            content_hash = fields_hash(jama_client.assemble_add_update_fields(test_case))
+            pushed = False
+            for project, project_track in test_case.get_projects().items():
+                if test_case.get_test_case_id(project) is None:
+                    default_test_case_id = test_case.get_test_case_id(config['default_master_project'])
+                    pushed = True
+                    link_key = client_key(config['jama_url'], default_test_case_id, project)
+                    if jama_client.add_sync_link(project, test_case, default_test_case_id, link_key) >= 0:
+                        print("Successfully synced (link): " + test_case.name + " to project '" + project + "'")
+                        if sync_state is not None:
+                            # The new test case was registered in the project's global id index when it was linked
+                            new_test_case_id = jama_client.get_test_case_id_from_global_id(
+                                project, test_case.get_project_id(project), test_case.get_global_id())
+                            sync_state.record_push(project, test_case.get_global_id(), new_test_case_id,
+                                                   content_hash)
+                            if sync_state.get_step(test_case.get_source_key(), ADDED,
+                                                   config['default_master_project']):
+                                sync_state.record_step(test_case.get_source_key(), LINKED, project,
+                                                       new_test_case_id, test_case.get_global_id())
+                    else:
+                        print("Failed to sync (link) properly: " + test_case.name + " to project '" + project +
+                              "'")
+                        print("     Re-run the sync to finish the link, a test case that was added in project '" +
+                              project + "' is linked instead of added again")
+                elif sync_state is not None and not full_sync and \
+                        sync_state.is_unchanged(project, test_case.get_global_id(),
+                                                test_case.get_test_case_id(project), content_hash):
+                    unchanged_count += 1
                 else:
-                    print("Failed to upload:" + test_case.get_name() + ": Exited with status code:" +
-                          api_callback + "\n")
+                    api_callback = jama_client.update_test_case(project, test_case, force=full_sync)
+                    if api_callback == UNCHANGED:
+                        # Jama already has this content, only the local sync state was missing it
+                        matching_count += 1
+                        if sync_state is not None:
+                            sync_state.record_push(project, test_case.get_global_id(),
+                                                   test_case.get_test_case_id(project), content_hash)
+                    elif 200 <= api_callback < 300:
+                        pushed = True
+                        print("Successfully updated: " + test_case.get_name() + " in project '" + project + "'")
+                        if sync_state is not None:
+                            sync_state.record_push(project, test_case.get_global_id(),
+                                                   test_case.get_test_case_id(project), content_hash)
+                    else:
+                        pushed = True
+                        print("Failed to upload:" + test_case.get_name() + ": Exited with status code:" +
+                              str(api_callback) + "\n")
+            if pushed:
+                pushed_test_cases.append(test_case)
+    if unchanged_count:
+        print("Skipped " + str(unchanged_count) + " test case updates that did not change since they were last "
+              "pushed (use --full-sync to push them anyway)")
+    if matching_count:
+        print("Skipped " + str(matching_count) + " test case updates that already match Jama")
     print()
 
-    # Check that all test cases are actually in sync after the update
-    if not check_all_test_cases_synced(test_case_list, jama_client):
+    # Check that all test cases that were pushed are actually in sync after the update
+    with jama_client.metrics.phase(VERIFY):
+        all_synced = check_all_test_cases_synced(pushed_test_cases, jama_client)
+    if not all_synced:
         print("Not all test cases have been synced properly. "
               "(if you had test cases that only uploaded to the master jama project, ignore this) ")
         return -1
@@ -574,69 +798,292 @@ def prompt_user_add_update(test_case_list: List[TestCase], add_update: str) -> L
     return test_case_list
 
 
-def add_new_test_cases(test_case_list: List[TestCase], jama_client: JamaClientHelper, interpreter: Interpreter
-                       ) -> Tuple[List[TestCase], Dict]:
+def add_new_test_cases(test_case_list: List[TestCase], jama_client: JamaClientHelper, interpreter: Interpreter,
+                       sync_state: SyncState = None) -> Tuple[List[TestCase], Dict]:
     """
-    Add the test cases from the test case list to the default master project.
+    Add the test cases from the test case list to the default master project. The test cases are added concurrently
+    (jama_client.pool_size at a time) and every add is idempotent: a test case that an interrupted run already added
+    is picked up from the journal, or found in Jama by its client key, instead of being added again.
 
     Args:
         test_case_list: An array of TestCase objects
         jama_client: A JamaClientHelper object to call the Jama REST API
         interpreter: the interpreter used to modify test case titles
+        sync_state: A SyncState that the content pushed to the master project and the add steps are recorded in,
+                    test cases that an interrupted run already added are picked up from its journal
 
     Returns:
         A tuple containing the test case list and a dictionary of old and new test case names
     """
     new_name_dict = {}
-    master_project_id = jama_client.get_project_id(config['default_master_project'])
+    master_project = config['default_master_project']
+    master_project_id = jama_client.get_project_id(master_project)
+
+    def add_new_test_case(test_case: TestCase) -> Tuple[str, str, bool]:
+        # Get the parent id and create new test case, unless an interrupted run already did
+        parent_id = jama_client.get_folder_id(master_project_id, test_case.get_parent_folder_path(), master_project)
+        source_key = test_case.get_source_key()
+        added = sync_state.get_step(source_key, ADDED, master_project) if sync_state is not None else None
+        if added:
+            new_case_id, jama_global_id = added
+        else:
+            new_case_id = jama_client.add_new_test_case(master_project, parent_id, test_case,
+                                                        client_key(config['jama_url'], source_key))
+            if new_case_id == -1:
+                raise Exception("Jama did not create the test case")
+            jama_global_id = jama_client.get_global_id(new_case_id)
+            if jama_global_id == -1:
+                raise Exception("Unable to read the global id of the new test case " + str(new_case_id))
+            if sync_state is not None:
+                sync_state.record_step(source_key, ADDED, master_project, new_case_id, jama_global_id)
+
+        # Modify test case titles depending on the interpreter
+        if isinstance(interpreter, PytestInterpreter):
+            new_global_id = jama_global_id.lower().replace("-", "_")
+            old_name = test_case.get_name()
+            new_name = test_case.get_name().replace("test_NEW", "test_" + new_global_id)
+        elif isinstance(interpreter, RobotInterpreter):
+            new_global_id = jama_global_id
+            old_name = test_case.get_name()
+            new_name = test_case.get_name().replace("<NEW>", "TC-" + new_global_id)
+        elif isinstance(interpreter, GherkinInterpreter):
+            new_global_id = jama_global_id.lower().replace("-", "_")
+            old_name = test_case.get_name()
+            new_name = test_case.get_name().replace("test_NEW", "test_" + new_global_id)
+
+        # Initialize test case information
+        test_case.set_name(new_name)
+        test_case.set_global_id(new_global_id)
+        test_case.add_project_track(config['default_master_project'], master_project_id, new_case_id, parent_id)
+
+        # Update the new test case with the updated name (with global id), this also drops the client key
+        if sync_state is None or not sync_state.get_step(source_key, RENAMED, master_project):
+            api_callback = jama_client.update_test_case(master_project, test_case)
+            if not (200 <= api_callback < 300 or api_callback == UNCHANGED):
+                # The test case stays pending in the journal, the next run renames it
+                raise Exception("Unable to rename the new test case " + str(new_case_id) + " to " + new_name)
+            if sync_state is not None:
+                sync_state.record_push(master_project, new_global_id, new_case_id,
+                                       fields_hash(jama_client.assemble_add_update_fields(test_case)))
+                sync_state.record_step(source_key, RENAMED, master_project, new_case_id, jama_global_id)
+
+        return old_name, new_name, bool(added)
 
     # Iterate through the test cases, add a new test cases in the default
     # master project and update them with their GID in the test case name
-    for test_case in test_case_list:
-        try:
-            # Get the parent id and create new test case
-            parent_id = jama_client.get_folder_id(master_project_id, test_case.get_parent_folder_path(),
-                                                  config['default_master_project'])
-            new_case_id = jama_client.add_new_test_case(config['default_master_project'], parent_id, test_case)
-
-            # Modify test case titles depending on the interpreter
-            if isinstance(interpreter, PytestInterpreter):
-                new_global_id = jama_client.get_global_id(new_case_id).lower().replace("-", "_")
-                old_name = test_case.get_name()
-                new_name = test_case.get_name().replace("test_NEW", "test_" + new_global_id)
-            elif isinstance(interpreter, RobotInterpreter):
-                new_global_id = jama_client.get_global_id(new_case_id)
-                old_name = test_case.get_name()
-                new_name = test_case.get_name().replace("<NEW>", "TC-" + new_global_id)
-            elif isinstance(interpreter, GherkinInterpreter):
-                new_global_id = jama_client.get_global_id(new_case_id).lower().replace("-", "_")
-                old_name = test_case.get_name()
-                new_name = test_case.get_name().replace("test_NEW", "test_" + new_global_id)
+    with jama_client.without_spinner(), ThreadPoolExecutor(max_workers=jama_client.pool_size) as executor:
+        futures = [executor.submit(add_new_test_case, test_case) for test_case in test_case_list]
+        print("Adding " + str(len(futures)) + " test cases to project '" + master_project + "'")
 
-            # Initialize test case information
+    for test_case, future in zip(test_case_list, futures):
+        try:
+            old_name, new_name, resumed = future.result()
+            if resumed:
+                print("Resumed the add of " + test_case.get_name() + " (" + test_case.get_global_id() + ")")
             test_case_path = test_case.get_parent_folder_path()
             if test_case_path not in new_name_dict:
                 new_name_dict[test_case_path] = {}
             new_name_dict[test_case_path][old_name] = new_name
-            test_case.set_name(new_name)
-            test_case.set_global_id(new_global_id)
-            test_case.add_project_track(config['default_master_project'], master_project_id, new_case_id, parent_id)
-
-            # Update the new test case with the updated name (with global id)
-            jama_client.update_test_case(config['default_master_project'], test_case)
             print("Successfully added new test case: " + test_case.name +
                   " to project '" + config['default_master_project'] + "'")
         except Exception as e:
             print("Failed to add new test case properly: " + test_case.name +
                   " to project '" + config['default_master_project'] + "'")
-            print("If a test case called " + test_case.name +
-                  " was added in project '" + config['default_master_project'] +
-                  "', please manually delete it")
+            print("Re-run the add to finish it, the test case is not added twice")
             print("\nError while adding: " + str(e) + "\n")
 
     return test_case_list, new_name_dict
 
 
+def chunk_test_cases(test_case_list: List[TestCase], chunk_size: int) -> List[List[TestCase]]:
+    """
+    Split a test case list into chunks of at most chunk_size test cases (in order)
+    """
+    if chunk_size < 1:
+        raise Exception("'sync_chunk_size' must be at least 1, got " + str(chunk_size))
+    return [test_case_list[start:start + chunk_size] for start in range(0, len(test_case_list), chunk_size)]
+
+
+def write_global_ids(name_dict: Dict, interpreter: Interpreter, test_files: List[str]) -> List[str]:
+    """
+    Rewrite the test files that contain new test cases with their new names (with global ids). The test cases only
+    know their folder structure paths, so the paths to the test files themselves (Github side) are matched against
+    them to find the files that FileInput needs to update
+
+    Args:
+        name_dict: A dictionary of test case paths to old and new test case names, the test cases that were written
+                   are removed from it
+        interpreter: the interpreter used to write the test files
+        test_files: A list of paths to the test files that were read
+
+    Returns:
+        A list of the source keys (see TestCase.get_source_key) of the test cases whose names were written
+    """
+    before = {(test_path, old_name) for test_path, names in name_dict.items() for old_name in names}
+
+    for test_file in test_files:
+        if any(test_path in test_file for test_path in name_dict):
+            interpreter.add_gid_file(name_dict, test_file)
+
+    after = {(test_path, old_name) for test_path, names in name_dict.items() for old_name in names}
+    return [test_path + "::" + old_name for test_path, old_name in sorted(before - after)]
+
+
+def plan_link(plan: Dict, test_case: TestCase, project: str, project_id: int, master_test_case_id: int,
+              jama_client: JamaClientHelper) -> None:
+    """
+    Add the sync (link) of a test case to a project to the plan: the folders it needs, the placeholder it adds
+    (unless an interrupted run left one with the same client key) and the sync itself
+    """
+    for folder in jama_client.find_missing_folders(project_id, test_case.get_parent_folder_path(), project):
+        plan['folders'].setdefault((project, folder), None)
+    plan['link'].append((project, test_case.get_name()))
+    plan['write_calls']['links'] += 1
+    if master_test_case_id is None or jama_client.get_test_case_id_from_global_id(
+            project, project_id, PLACEHOLDER_GLOBAL_ID_PREFIX +
+            client_key(config['jama_url'], master_test_case_id, project)) == -1:
+        plan['write_calls']['links'] += 1
+
+
+def plan_update_jama(add_test_case_list: List[TestCase], update_test_case_list: List[TestCase],
+                     jama_client: JamaClientHelper, sync_state: SyncState, test_files: List[str],
+                     full_sync: bool = False) -> Dict:
+    """
+    Work out what adding and updating the test cases would do, using only read calls (the projects' test cases and
+    folders are listed once each). Nothing is written to Jama, the test files or the sync state
+
+    Args:
+        add_test_case_list: An array of TestCase objects that would be added
+        update_test_case_list: An array of TestCase objects that would be updated
+        jama_client: A JamaClientHelper object to call the Jama REST API
+        sync_state: The SyncState that the add/update would use (journal and last pushed content)
+        test_files: A list of paths to the test files that were read
+        full_sync: A boolean that indicates whether every test case would be pushed, whatever the sync state says
+
+    Returns:
+        A dictionary of the planned actions ('folders', 'add', 'update', 'link', 'files'), the test cases that would
+        be skipped, the errors found and the write calls per kind of action
+    """
+    master_project = config['default_master_project']
+    master_project_id = jama_client.get_project_id(master_project)
+    plan = {'folders': {}, 'add': [], 'update': [], 'link': [], 'files': [], 'resumed': 0, 'unchanged': 0,
+            'matching': 0, 'errors': [],
+            'write_calls': {'folders': 0, 'adds': 0, 'renames': 0, 'links': 0, 'updates': 0}}
+
+    for test_case in add_test_case_list:
+        try:
+            source_key = test_case.get_source_key()
+            for folder in jama_client.find_missing_folders(master_project_id, test_case.get_parent_folder_path(),
+                                                           master_project):
+                plan['folders'].setdefault((master_project, folder), None)
+
+            # A test case that an interrupted run added is taken from the journal or found by its client key
+            added = sync_state.get_step(source_key, ADDED, master_project)
+            master_test_case_id = added[0] if added else jama_client.find_test_case_by_client_key(
+                master_project_id, client_key(config['jama_url'], source_key))
+            if master_test_case_id == -1:
+                master_test_case_id = None
+                plan['write_calls']['adds'] += 1
+            else:
+                plan['resumed'] += 1
+            plan['add'].append((master_project, test_case.get_name()))
+            if not sync_state.get_step(source_key, RENAMED, master_project):
+                plan['write_calls']['renames'] += 1
+
+            for project in test_case.get_projects():
+                if project == master_project or sync_state.get_step(source_key, LINKED, project):
+                    continue
+                plan_link(plan, test_case, project, jama_client.get_project_id(project), master_test_case_id,
+                          jama_client)
+        except Exception as e:
+            plan['errors'].append(test_case.get_name() + ": " + str(e))
+
+    plan['files'] = sorted(test_file for test_file in test_files
+                           if any(test_case.get_parent_folder_path() in test_file
+                                  for test_case in add_test_case_list))
+
+    for test_case in update_test_case_list:
+        try:
+            master_test_case_id = jama_client.get_test_case_id_from_global_id(master_project, master_project_id,
+                                                                              test_case.get_global_id())
+            if master_test_case_id == -1:
+                plan['errors'].append(test_case.get_name() + ": not found in master project '" + master_project +
+                                      "'")
+                continue
+
+            fields = jama_client.assemble_add_update_fields(test_case)
+            content_hash = fields_hash(fields)
+            for project in test_case.get_projects():
+                project_id = jama_client.get_project_id(project)
+                test_case_id = jama_client.get_test_case_id_from_global_id(project, project_id,
+                                                                           test_case.get_global_id())
+                if test_case_id == -1:
+                    plan_link(plan, test_case, project, project_id, master_test_case_id, jama_client)
+                elif not full_sync and sync_state.is_unchanged(project, test_case.get_global_id(), test_case_id,
+                                                               content_hash):
+                    plan['unchanged'] += 1
+                elif not full_sync and jama_client.compare_before_update and \
+                        jama_client.test_case_matches(test_case_id, jama_client.get_parent_id(test_case_id), fields):
+                    plan['matching'] += 1
+                else:
+                    plan['update'].append((project, test_case.get_name()))
+                    plan['write_calls']['updates'] += 1
+        except Exception as e:
+            plan['errors'].append(test_case.get_name() + ": " + str(e))
+
+    plan['write_calls']['folders'] = len(plan['folders'])
+    plan['folders'] = list(plan['folders'])
+    return plan
+
+
+def print_plan(plan: Dict, read_calls: int) -> None:
+    """
+    Print the actions of a plan (see plan_update_jama) and the amount of Jama API calls they would take
+    """
+    sections = [("Folders to create", ["'" + project + "': " + folder for project, folder in plan['folders']]),
+                ("Test cases to add", ["'" + project + "': " + name for project, name in plan['add']]),
+                ("Test cases to update", ["'" + project + "': " + name for project, name in plan['update']]),
+                ("Sync links to create", ["'" + project + "': " + name for project, name in plan['link']]),
+                ("Test files whose GIDs will be rewritten", plan['files']),
+                ("Errors", plan['errors'])]
+
+    print("\nPLAN (nothing was written to Jama or the test files)")
+    print("---------------------------------------------------------------------------------------")
+    for title, lines in sections:
+        print(title + " (" + str(len(lines)) + "):")
+        for line in lines:
+            print("    " + line)
+    if plan['resumed']:
+        print(str(plan['resumed']) + " of the test cases to add were already added by an interrupted run")
+    print("Skipped: " + str(plan['unchanged']) + " test case updates that did not change since they were last "
+          "pushed, " + str(plan['matching']) + " that already match Jama")
+    print("---------------------------------------------------------------------------------------")
+    write_calls = plan['write_calls']
+    print("Write calls: " + str(sum(write_calls.values())) + " (" +
+          ", ".join(str(count) + " " + kind for kind, count in write_calls.items()) + ")")
+    print("Read calls made for the plan: " + str(read_calls) +
+          " (the sync check after the pushes reads more)\n")
+
+
+def report_metrics(jama_client: JamaClientHelper) -> None:
+    """
+    Print how much the run was slowed down by the request budget and Jama rate limiting, then write the per endpoint
+    and per phase metrics of the run to the json file in config 'metrics_path'
+
+    Args:
+        jama_client: A JamaClientHelper object to call the Jama REST API
+
+    Returns:
+        None
+    """
+    throttle_stats = jama_client.jama_client.transport.throttle_stats
+    print("\n" + throttle_stats.summary())
+
+    metrics_path = config.get('metrics_path', str(DEFAULT_METRICS_DIRECTORY / 'jama_sync_metrics.json'))
+    jama_client.metrics.write_summary(metrics_path, {'tool': 'jama_sync', 'throttle': throttle_stats.as_dict()})
+    print("Jama API metrics written to " + metrics_path)
+
+
 def update_jama(args, testing: bool = False) -> int:
     """
     Read a file, pull the Jama test case information across projects, then push the updates
@@ -651,11 +1098,12 @@ def update_jama(args, testing: bool = False) -> int:
     """
     # TODO: implement input testing and remove the testing boolean
 
-    if not args.add and not args.update and not testing:
+    if not args.add and not args.update and not args.plan and not testing:
         raise Exception("No add/update chosen. Please provide either a --add or --update option in the command")
 
     # Initialize the Jama client to add
-    jama_client = initialize_jama_client(args.jama_user, args.jama_pass)
+    jama_client = initialize_jama_client(args.jama_user, args.jama_pass, args.refresh_cache)
+    jama_client.metrics.reset()
 
     # Create the interpreter
     interpreter = InterpreterFactory.create(args.interpreter, args.test_file)
@@ -663,55 +1111,83 @@ def update_jama(args, testing: bool = False) -> int:
     test_files = interpreter.get_test_files()
 
     try:
-        # Add the test cases in each test file if we are adding/updating by directory
-        if test_files:
-            add_test_case_list = []
-            update_test_case_list = []
-            for test_file in test_files:
-                add_list, update_list = read_file(args, test_file, interpreter)
-                add_test_case_list.extend(add_list)
-                update_test_case_list.extend(update_list)
-        # Add the test cases in the single test file if we are not adding/updating by directory
-        else:
-            add_test_case_list, update_test_case_list = read_file(args, args.test_file, interpreter)
+        with jama_client.metrics.phase(READ_FILES):
+            # Add the test cases in each test file if we are adding/updating by directory, or the single test file
+            parse_cache = initialize_parse_cache(args, interpreter)
+            try:
+                add_test_case_list, update_test_case_list = read_test_files(args, test_files or [args.test_file],
+                                                                            interpreter,
+                                                                            config.get('sync_parse_processes'),
+                                                                            parse_cache)
+            finally:
+                if parse_cache is not None:
+                    parse_cache.close()
 
     except Exception as e:
         print("\nFailed to read test file: " + str(e) + "\n")
         print(traceback.format_exc())
+        report_metrics(jama_client)
         return -1
 
     add_status = 0
     update_status = 0
+    sync_state = initialize_sync_state()
+    chunk_size = config.get('sync_chunk_size', DEFAULT_CHUNK_SIZE)
 
-    # Stop the user from proceeding if they are attempting to add/update more than 30 cases
-    if len(add_test_case_list) + len(update_test_case_list) > 30:
-        raise Exception("Attempting to add/update more than 30 test cases at once, "
-                        "please limit the scope to less test cases")
-
-    # If the user chooses to add, prompt the user for the test cases that they will be adding,
-    # add them to the main jama project, sync push the name and project scope updates,
-    # then rewrite the test files with the updated global ids
+    # A plan only reads from Jama: print what would be added/updated (both, unless one was chosen) and stop
+    if args.plan:
+        plan_all = not args.add and not args.update
+        try:
+            with jama_client.metrics.phase(RESOLVE_IDS):
+                plan = plan_update_jama(add_test_case_list if args.add or plan_all else [],
+                                        update_test_case_list if args.update or plan_all else [],
+                                        jama_client, sync_state, test_files or [args.test_file], args.full_sync)
+            print_plan(plan, jama_client.metrics.summary()['calls'])
+            plan_status = -1 if plan['errors'] else 0
+        except Exception as e:
+            print("\nFailed to plan: " + str(e) + "\n")
+            plan_status = -1
+        sync_state.close()
+        report_metrics(jama_client)
+        return plan_status
+
+    # If the user chooses to add, prompt the user for the test cases that they will be adding, then chunk by chunk
+    # add them to the main jama project, sync push the name and project scope updates and rewrite the test files
+    # with the updated global ids. Every step is journaled, an interrupted run picks up where it stopped
     if args.add and add_test_case_list:
         try:
             if not testing:
                 add_test_case_list = prompt_user_add_update(add_test_case_list, "add")
 
-            add_test_case_list, name_dict = add_new_test_cases(add_test_case_list, jama_client, interpreter)
+            pending_source_keys = set(sync_state.pending_source_keys())
+            resumed_count = sum(1 for test_case in add_test_case_list
+                                if test_case.get_source_key() in pending_source_keys)
+            if resumed_count:
+                print("Resuming " + str(resumed_count) + " test cases that an interrupted run started to add")
 
-            add_test_case_list = pull_project_tracking(add_test_case_list, jama_client)
+            name_dict = {}
+            chunks = chunk_test_cases(add_test_case_list, chunk_size)
+            for chunk_number, chunk in enumerate(chunks, 1):
+                if len(chunks) > 1:
+                    print("\nAdding chunk " + str(chunk_number) + " of " + str(len(chunks)) + " (" +
+                          str(len(chunk)) + " test cases)")
 
-            sync_push_updates(add_test_case_list, jama_client)
+                with jama_client.metrics.phase(PUSH):
+                    chunk, chunk_name_dict = add_new_test_cases(chunk, jama_client, interpreter, sync_state)
 
-            # Go through the list of paths to test files that were first searched and
-            # pass them in to see if they need to be updated (if there are any new test cases)
-            # We need to pass in the paths to the test files because the test cases themselves
-            # have the folder structure paths but not the paths to the test files themselves (Github side)
-            # which is what FileInput needs to find the correct test file
-            if test_files:
-                for test_file in test_files:
-                    interpreter.add_gid_file(name_dict, test_file)
-            else:
-                interpreter.add_gid_file(name_dict, args.test_file)
+                with jama_client.metrics.phase(RESOLVE_IDS):
+                    chunk = pull_project_tracking(chunk, jama_client)
+
+                sync_push_updates(chunk, jama_client, sync_state, args.full_sync)
+
+                with jama_client.metrics.phase(WRITE_FILES):
+                    written_source_keys = write_global_ids(chunk_name_dict, interpreter,
+                                                           test_files or [args.test_file])
+                sync_state.complete_steps(written_source_keys)
+
+                # Keep the test cases whose GIDs could not be written to report them at the end
+                for test_path, names in chunk_name_dict.items():
+                    name_dict.setdefault(test_path, {}).update(names)
 
             if name_dict:
                 print("THE FOLLOWING TEST CASES WERE NOT FOUND OR UPDATED IN THE TEST FILE(S):")
@@ -733,17 +1209,27 @@ def update_jama(args, testing: bool = False) -> int:
     # then sync push the updates
     if args.update and update_test_case_list:
         try:
-            update_test_case_list = pull_project_tracking(update_test_case_list, jama_client)
+            with jama_client.metrics.phase(RESOLVE_IDS):
+                update_test_case_list = pull_project_tracking(update_test_case_list, jama_client)
 
             if not testing:
                 update_test_case_list = prompt_user_add_update(update_test_case_list, "update")
 
-            update_status = sync_push_updates(update_test_case_list, jama_client)
+            chunks = chunk_test_cases(update_test_case_list, chunk_size)
+            for chunk_number, chunk in enumerate(chunks, 1):
+                if len(chunks) > 1:
+                    print("\nUpdating chunk " + str(chunk_number) + " of " + str(len(chunks)) + " (" +
+                          str(len(chunk)) + " test cases)")
+                update_status = min(update_status, sync_push_updates(chunk, jama_client, sync_state,
+                                                                     args.full_sync))
         except Exception as e:
             print("\nFailed to update: " + str(e) + "\n")
     elif args.update:
         print("No test cases were read for UPDATING to JAMA")
 
+    sync_state.close()
+    report_metrics(jama_client)
+
     # Should be returning 0 if everything executed correctly
     return add_status + update_status
 
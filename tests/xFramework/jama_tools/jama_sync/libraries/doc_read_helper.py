@@ -1,4 +1,5 @@
 import html
+import re
 
 
 def read_section(buf, new_test_case, section_name):
@@ -136,3 +137,25 @@ def filter_special_characters(data_string):
     Returns: a formatted string that replaces brackets with strings that Jama interprets
     """
     return html.escape(data_string)
+
+
+def normalize_html(data_string):
+    """
+    Returns a canonical form of a rich text value so that what jama_sync sends (format_tables,
+    filter_special_characters) can be compared with what Jama stores and returns. Jama re-serializes rich text:
+    entities are written differently (&#x27; comes back as &#39;, &nbsp; as a non-breaking space), self-closing
+    tags lose their slash and whitespace between tags is not kept.
+
+    Args:
+        data_string: A string (plain text or html) read from or sent to Jama
+
+    Returns: a normalized string that is only used for comparisons
+    """
+    if not isinstance(data_string, str):
+        return data_string
+
+    normalized = html.unescape(data_string).replace('\xa0', ' ')
+    normalized = re.sub(r'<(\w+)([^>]*?)\s*/>', r'<\1\2>', normalized)
+    normalized = re.sub(r'>\s+', '>', normalized)
+    normalized = re.sub(r'\s+<', '<', normalized)
+    return re.sub(r'\s+', ' ', normalized).strip()
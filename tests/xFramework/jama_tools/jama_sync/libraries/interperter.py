@@ -1,11 +1,24 @@
 import fileinput
-import glob
+import os
 
 from abc import ABC, abstractmethod
 from pathlib import Path
 from typing import Dict, List
 
 
+# Directories that never hold test files (version control, test data and logs), they are not walked into. Hidden
+# directories and files are skipped as well, as the recursive glob this replaced did
+PRUNED_DIRECTORIES = ('.git', 'logs')
+PRUNED_DIRECTORY_PREFIXES = ('data', '.')
+
+
+def is_pruned_directory(directory_name: str) -> bool:
+    """
+    Returns whether a directory is skipped when the test files under a path are searched
+    """
+    return directory_name in PRUNED_DIRECTORIES or directory_name.startswith(PRUNED_DIRECTORY_PREFIXES)
+
+
 class Interpreter(ABC):
     @property
     def name(self) -> str:
@@ -25,16 +38,24 @@ class Interpreter(ABC):
 
     def get_test_files(self) -> List[str]:
         """
-        Return a list of test files if the path is a directory
+        Return a list of test files if the path is a directory (skipping the directories of PRUNED_DIRECTORIES and
+        PRUNED_DIRECTORY_PREFIXES)
 
         Returns:
             A list of test files if the path is a directory
         """
-        if Path(self._test_file).is_dir():
-            return glob.glob(f"{self._test_file}/**/*.{self._file_extension}", recursive=True)
-        else:
+        if not Path(self._test_file).is_dir():
             return []
 
+        # A pruned walk instead of a recursive glob: the skipped directories of a monorepo (.git, data, logs) are
+        # never listed, and the files come in a stable (sorted) order
+        test_files = []
+        for directory, directory_names, file_names in os.walk(self._test_file):
+            directory_names[:] = sorted(name for name in directory_names if not is_pruned_directory(name))
+            test_files.extend(os.path.join(directory, file_name) for file_name in sorted(file_names)
+                              if file_name.endswith('.' + self._file_extension) and not file_name.startswith('.'))
+        return test_files
+
     @abstractmethod
     def filter_test_case_file(self, file_path: str) -> str:
         """
@@ -1,5 +1,33 @@
-from py_jama_rest_client.client import JamaClient
+import re
+import sys
+import threading
+
+from contextlib import contextmanager
 from halo import Halo
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# jama_common is shared with jama_exec and lives next to this tool in jama_tools
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from jama_common.jama_transport import DEFAULT_POOL_SIZE, PooledJamaClient, get_transport  # noqa: E402
+from jama_common.metadata_cache import JamaMetadataCache, PROJECTS, is_cached_item_current  # noqa: E402
+from libraries.doc_read_helper import normalize_html  # noqa: E402
+
+# Returned by update_test_case instead of a status code when the test case in Jama already has the same content
+UNCHANGED = 304
+
+# A new test case carries its client key in a comment at the end of its description until it is renamed with its
+# GID, a placeholder added to a project before it is synced carries it in its global id. An add that was interrupted
+# after Jama created the item finds the item by its key instead of creating it again.
+CLIENT_KEY_PATTERN = re.compile(r'<!-- jama_sync:([0-9A-F]+) -->')
+PLACEHOLDER_GLOBAL_ID_PREFIX = "JAMA-SYNC-"
+
+
+def client_key_comment(client_key: str) -> str:
+    """
+    Return the HTML comment that marks a description with a client key
+    """
+    return "<!-- jama_sync:" + client_key + " -->"
 
 
 class JamaClientHelper:
@@ -7,7 +35,9 @@ class JamaClientHelper:
     A class to reference the py_jama_rest_client api functions
     """
     def __init__(self, jama_url: str, username: str, password: str, default_test_case_type: int,
-                 default_folder_type: int, default_status: int, default_test_case_status: str) -> None:
+                 default_folder_type: int, default_status: int, default_test_case_status: str,
+                 pool_size: int = DEFAULT_POOL_SIZE, metadata_cache: JamaMetadataCache = None,
+                 compare_before_update: bool = True) -> None:
         """
         This class initializes the Jama Client and handles the API calls
 
@@ -17,58 +47,83 @@ class JamaClientHelper:
         :default_test_case_type: An integer representing the default id for test case type (Jama API side)
         :default_status: An integer representing the default test case status for a test case (Jama API side)
         :default_test_case_status: A string representing the default status for a test case (Jama API side)
+        :pool_size: An integer representing the amount of keep-alive connections kept open to Jama
+        :metadata_cache: A JamaMetadataCache for project ids (default cache if None)
+        :compare_before_update: A boolean that indicates whether test cases that already have the same content in
+                                Jama are left alone instead of being updated
         """
-        self.jama_client = JamaClient(host_domain=jama_url, credentials=(username, password), oauth=True)
+        self.jama_client = PooledJamaClient(get_transport(jama_url, username, password, pool_size))
+        # Per endpoint latencies and per phase timings of the run, shared with every client of the transport
+        self.metrics = self.jama_client.transport.metrics
+        self.metadata_cache = metadata_cache if metadata_cache is not None else JamaMetadataCache(jama_url)
         self.default_test_case_type = default_test_case_type
         self.default_folder_type = default_folder_type
         self.default_status = default_status
         self.default_test_case_status = default_test_case_status
         self.spinner = Halo(text='Waiting for Jama API', spinner='dots')
 
-    def get_synced_items(self, test_case_id):
+        # Per project index of global id -> [(test case id, parent id)], filled once per project per run
+        self.test_case_index = {}
+        self.parent_ids = {}
+        # The current fields of every indexed test case (by test case id), kept from the same listing
+        self.test_case_fields = {}
+        # Per project index of client key -> test case id of the test cases that still carry one
+        self.client_key_index = {}
+        self.compare_before_update = compare_before_update
+        self.pool_size = pool_size
+
+        # Sync status of (test case id, synced item id) pairs looked up in this run, dropped when either is pushed
+        self.sync_statuses = {}
+        self._sync_status_lock = threading.Lock()
+        self._index_lock = threading.Lock()
+
+        # Per project index of (parent id, folder name) -> folder id, filled once per project per run
+        self.folder_index = {}
+        self.folder_paths = {}
+        self._folder_locks = {}
+
+    def fetch_synced_items(self, test_case_id):
         """
-        Return the API call for all synced (pushed) items. We want to separate this function call so that the code
-        doesn't have strange redundancy like jama_client.jama_client.get_items_synceditems_status()
+        Return the items that are synced (linked) to a test case without any spinner or console output so that it can
+        be called from several worker threads at once. Errors are raised to the caller instead of being printed
 
         Args:
             test_case_id: An integer representing a test case ID
 
-        Returns: A json response from the Jama API
+        Returns: A list of the synced items (json)
         """
+        return self.jama_client.get_items_synceditems(test_case_id)
 
-        if not test_case_id:
-            return []
-
-        self.spinner.start("Retrieving synced items from Jama API")
-        try:
-            response = self.jama_client.get_items_synceditems(test_case_id)
-        except Exception as e:
-            print("\nUnable to find item's synced items:" + test_case_id + "\n" + str(e))
-            return []
-        self.spinner.stop()
-
-        return response
-
-    def get_synced_items_status(self, test_case_id, other_test_case_id):
+    def fetch_sync_status(self, test_case_id, other_test_case_id):
         """
-        Return the API call for the status of all synced (pushed) items. We want to separate this function call so
-        that the code doesn't have strange redundancy like jama_client.jama_client.get_items_synceditems_status()
+        Return whether a synced (linked) item is in sync with a test case without any spinner or console output so
+        that it can be called from several worker threads at once. A pair is only looked up once per run unless one
+        of the test cases is pushed in between. Errors are raised to the caller instead of being printed
 
         Args:
             test_case_id: An integer representing the ID of the test case to compare against
             other_test_case_id: An integer representing the ID of the other test case
 
-        Returns: A json response from the Jama API
+        Returns: A boolean that indicates whether the items are in sync
         """
-        self.spinner.start("Retrieving status of synced items from Jama API")
-        try:
-            response = self.jama_client.get_items_synceditems_status(test_case_id, other_test_case_id)
-        except Exception as e:
-            print("\n" + str(e))
-            return -1
-        self.spinner.stop()
+        key = (test_case_id, other_test_case_id)
+        with self._sync_status_lock:
+            if key in self.sync_statuses:
+                return self.sync_statuses[key]
 
-        return response
+        in_sync = self.jama_client.get_items_synceditems_status(test_case_id, other_test_case_id)['inSync'] is True
+
+        with self._sync_status_lock:
+            self.sync_statuses[key] = in_sync
+        return in_sync
+
+    def forget_sync_status(self, test_case_id):
+        """
+        Drop the remembered sync status of every pair that a test case is part of (it was just pushed)
+        """
+        with self._sync_status_lock:
+            for key in [key for key in self.sync_statuses if test_case_id in key]:
+                del self.sync_statuses[key]
 
     def get_project_id(self, project_name):
         """
@@ -79,22 +134,109 @@ class JamaClientHelper:
 
         Returns: An integer that indicates the project ID associated with the JAMA project
         """
+        # A cached id is checked once per run, a deleted or renamed project is listed again
+        project_id = self.metadata_cache.get_checked(PROJECTS, project_name, lambda cached_id: is_cached_item_current(
+            self.jama_client.transport, "projects/" + str(cached_id), project_name))
+        if project_id is not None:
+            return project_id
 
         self.spinner.start("Retrieving project ID for " + project_name + " from Jama API")
         projects = self.jama_client.get_projects()
         self.spinner.stop()
 
-        # Search through the projects available on Jama and find the matching name
-        project_id = ''
+        # Cache every project from the listing so that the other projects do not need another listing
+        project_ids = {}
         for project in projects:
-            if isinstance(project, dict):
-                if project_name == project['fields']['name'] and project['isFolder'] is False:
-                    project_id = project['id']
+            if isinstance(project, dict) and project['isFolder'] is False:
+                project_ids[project['fields']['name']] = project['id']
+        self.metadata_cache.update(PROJECTS, project_ids)
 
-        if project_id == '':
+        if project_name not in project_ids:
             raise Exception("No such JAMA project is named '" + project_name + "'")
 
-        return project_id
+        return project_ids[project_name]
+
+    def get_test_case_index(self, project_id: int) -> Dict[str, List[Tuple[int, int]]]:
+        """
+        Return an index of every test case in a project by global id. The project's test cases are listed
+        (paged) once per run, every later lookup in the project is answered from the index
+
+        Args:
+            project_id: An integer representing the project ID of a JAMA project
+
+        Returns: A dictionary of global ids (e.g. GID-1234) to a list of (test case id, parent id) tuples
+        """
+        with self._index_lock:
+            if project_id in self.test_case_index:
+                return self.test_case_index[project_id]
+
+            self.spinner.start("Indexing test cases in project " + str(project_id) + " from Jama API")
+            try:
+                test_cases = self.jama_client.get_abstract_items(project=[project_id],
+                                                                 item_type=[self.default_test_case_type])
+            finally:
+                self.spinner.stop()
+
+            index = {}
+            client_keys = {}
+            for test_case in test_cases:
+                parent_id = test_case['location']['parent'].get('item', -1)
+                index.setdefault(test_case['globalId'], []).append((test_case['id'], parent_id))
+                self.parent_ids[test_case['id']] = parent_id
+                self.test_case_fields[test_case['id']] = test_case.get('fields', {})
+                match = CLIENT_KEY_PATTERN.search(test_case.get('fields', {}).get('description') or "")
+                if match:
+                    client_keys[match.group(1)] = test_case['id']
+            self.test_case_index[project_id] = index
+            self.client_key_index[project_id] = client_keys
+
+            return index
+
+    def register_test_case(self, project_id: int, global_id: str, test_case_id: int, parent_id: int) -> None:
+        """
+        Add a test case that this run created to the project's index (if the project has been indexed)
+        so that later lookups do not miss it
+
+        Args:
+            project_id: An integer representing the project ID of a JAMA project
+            global_id: A string representing the Jama global id of the test case (e.g. GID-1234)
+            test_case_id: An integer representing the test case id
+            parent_id: An integer representing the parent item id of the test case
+
+        Returns: None
+        """
+        with self._index_lock:
+            self.parent_ids[test_case_id] = parent_id
+            if project_id in self.test_case_index:
+                entries = self.test_case_index[project_id].setdefault(global_id, [])
+                if test_case_id not in [entry[0] for entry in entries]:
+                    entries.append((test_case_id, parent_id))
+
+    def find_test_case_by_client_key(self, project_id: int, client_key: str) -> int:
+        """
+        Return the test case in a project whose description carries the client key (see client_key_comment)
+
+        Args:
+            project_id: An integer representing the project ID of a JAMA project
+            client_key: A string representing the client key of a test case that is being added
+
+        Returns: An integer representing the test case id, -1 if no test case carries the key
+        """
+        self.get_test_case_index(project_id)
+        with self._index_lock:
+            return self.client_key_index[project_id].get(client_key, -1)
+
+    @contextmanager
+    def without_spinner(self):
+        """
+        Disable the spinner for the block, e.g. while API calls are made from worker threads (Halo is not thread safe)
+        """
+        spinner = self.spinner
+        self.spinner = Halo(enabled=False)
+        try:
+            yield
+        finally:
+            self.spinner = spinner
 
     def get_test_case_id_from_global_id(self, project, project_id, global_id):
         """
@@ -113,75 +255,144 @@ class JamaClientHelper:
         # Need to format this to have the expected GID that Jama has if the GID is in xframework standards (gid_1234)
         formatted_global_id = global_id.upper().replace("_", "-")
 
-        self.spinner.start("Retrieving test case ID from Jama API")
-        abstract_items = self.jama_client.get_abstract_items(project=[project_id], contains=[formatted_global_id])
-        self.spinner.stop()
+        test_cases = self.get_test_case_index(project_id).get(formatted_global_id, [])
 
-        if len(abstract_items) > 1:
+        if len(test_cases) > 1:
             raise Exception("More than one test case with global id '" + global_id +
                             "' was found was found in project '" + project + "'")
 
-        if abstract_items:
-            for test_case in abstract_items:
-                if test_case['globalId'] == formatted_global_id:
-                    # Debugging print statement below
-                    # print("Current fields: ", json.dumps(self.jama_client.get_abstract_items(
-                    #     project=[project_id], contains=[formatted_global_id]), indent=4))
-                    return test_case['id']
+        if test_cases:
+            return test_cases[0][0]
         else:
             return -1
 
-    def get_folder_id(self, project_id, folder_path, project_name):
+    def get_folder_index(self, project_id: int) -> Dict[Tuple[int, str], List[int]]:
         """
-        Return the folder id based upon the project and it's name
+        Return an index of every folder in a project by parent id and name. The project's folders are
+        listed (paged) once per run, every path resolution in the project is answered from the index
+
+        Args:
+            project_id: An integer representing the project ID of a JAMA project
+
+        Returns: A dictionary of (parent id, folder name) to a list of folder ids
+        """
+        with self._index_lock:
+            if project_id not in self.folder_index:
+                self.spinner.start("Indexing folders in project " + str(project_id) + " from Jama API")
+                try:
+                    folders = self.jama_client.get_abstract_items(project=[project_id],
+                                                                  item_type=[self.default_folder_type])
+                finally:
+                    self.spinner.stop()
+
+                index = {}
+                for folder in folders:
+                    parent_id = folder['location']['parent'].get('item', -1)
+                    index.setdefault((parent_id, folder['fields']['name']), []).append(folder['id'])
+                self.folder_index[project_id] = index
+                self._folder_locks[project_id] = threading.Lock()
+
+            return self.folder_index[project_id]
+
+    @staticmethod
+    def get_root_folder_id(index, root_folder, project_name):
+        """
+        Return the id of the one folder in a project's folder index that has the root folder's name
+        """
+        parent = [folder_id for (_, name), folder_ids in index.items() if name == root_folder
+                  for folder_id in folder_ids]
+
+        if not parent:
+            raise Exception("Could not find root folder named '" + root_folder + "' in project " + project_name)
+
+        if len(parent) > 1:
+            raise Exception("More than 1 root folder named '" + root_folder + "' is present in project " +
+                            project_name)
+
+        return parent[0]
+
+    def find_missing_folders(self, project_id, folder_path, project_name):
+        """
+        Return the folders that get_folder_id would create for a path, without creating them (read only)
 
         Args:
             project_id: An integer representing the project's id to search in
             folder_path: A string representing the path from the root folder to the file
             project_name: A string representing the project that is being searched in
 
-        Returns: An integer representing the id of the folder that was passed in
+        Returns: A list of strings representing the paths of the missing folders, outermost first
         """
+        path_names = tuple(folder_path.split("/")[:-1]) or tuple(folder_path.split("/")[:1])
+        index = self.get_folder_index(project_id)
 
-        path_names = folder_path.split("/")
-        root_folder = path_names.pop(0)
-        parent = self.jama_client.get_abstract_items(project=project_id, contains=root_folder,
-                                                     item_type=self.default_folder_type)
+        with self._folder_locks[project_id]:
+            if (project_id, path_names) in self.folder_paths:
+                return []
 
-        if not parent:
-            raise Exception("Could not find root folder named '" + root_folder + "' in project " + project_name)
+            parent_id = self.get_root_folder_id(index, path_names[0], project_name)
+            for depth in range(1, len(path_names)):
+                folder_ids = index.get((parent_id, path_names[depth]))
+                if not folder_ids:
+                    return ["/".join(path_names[:end]) for end in range(depth + 1, len(path_names) + 1)]
+                parent_id = folder_ids[-1]
 
-        if len(parent) > 1:
-            raise Exception("More than 1 root folder named '" + root_folder + "' is present in project " + project_name)
-
-        parent_id = parent[0]['id']
-
-        # Iterate through the children of the Jama items and create the new
-        # folders if the folder has not been found in the children
-        while len(path_names) > 1:
-            next_parent_folder = path_names.pop(0)
-            children = self.jama_client.get_item_children(parent_id)
-            next_parent_folder_id = None
-
-            for item in children:
-                if next_parent_folder == item['fields']['name']:
-                    next_parent_folder_id = item['id']
-
-            if next_parent_folder_id:
-                parent_id = next_parent_folder_id
-            else:
-                fields = {
-                    'name': next_parent_folder
-                }
-                try:
-                    parent_id = self.jama_client.post_item(project_id,
-                                                           self.default_folder_type,
-                                                           self.default_test_case_type,
-                                                           parent_id,
-                                                           fields)
-                except Exception as e:
-                    raise Exception("Could not create folder named '" +
-                                    next_parent_folder + "' in project " + project_name)
+        return []
+
+    def get_folder_id(self, project_id, folder_path, project_name):
+        """
+        Return the folder id based upon the project and it's name. Missing folders are created once and
+        resolved paths are memoized, so test cases that share a folder (or are added concurrently) never
+        walk the path again or create duplicate folders
+
+        Args:
+            project_id: An integer representing the project's id to search in
+            folder_path: A string representing the path from the root folder to the file
+            project_name: A string representing the project that is being searched in
+
+        Returns: An integer representing the id of the folder that was passed in
+        """
+
+        # The last name in the path is the test file itself
+        path_names = tuple(folder_path.split("/")[:-1]) or tuple(folder_path.split("/")[:1])
+        index = self.get_folder_index(project_id)
+
+        with self._folder_locks[project_id]:
+            if (project_id, path_names) in self.folder_paths:
+                return self.folder_paths[(project_id, path_names)]
+
+            parent_id = self.get_root_folder_id(index, path_names[0], project_name)
+
+            # Iterate through the folder index and create the new
+            # folders if the folder has not been found in the children
+            for depth in range(1, len(path_names)):
+                next_parent_folder = path_names[depth]
+
+                if (project_id, path_names[:depth + 1]) in self.folder_paths:
+                    parent_id = self.folder_paths[(project_id, path_names[:depth + 1])]
+                    continue
+
+                next_parent_folder_ids = index.get((parent_id, next_parent_folder))
+                if next_parent_folder_ids:
+                    parent_id = next_parent_folder_ids[-1]
+                else:
+                    fields = {
+                        'name': next_parent_folder
+                    }
+                    try:
+                        new_folder_id = self.jama_client.post_item(project_id,
+                                                                   self.default_folder_type,
+                                                                   self.default_test_case_type,
+                                                                   {"item": parent_id},
+                                                                   fields)
+                    except Exception as e:
+                        raise Exception("Could not create folder named '" +
+                                        next_parent_folder + "' in project " + project_name)
+                    index[(parent_id, next_parent_folder)] = [new_folder_id]
+                    parent_id = new_folder_id
+
+                self.folder_paths[(project_id, path_names[:depth + 1])] = parent_id
+
+            self.folder_paths[(project_id, path_names)] = parent_id
 
         return parent_id
 
@@ -194,6 +405,9 @@ class JamaClientHelper:
 
         Returns: An integer that represents the parent id of the test case that was passed in
         """
+        # Test cases from an indexed project already carry their parent id
+        if test_case_id in self.parent_ids:
+            return self.parent_ids[test_case_id]
 
         self.spinner.start("Retrieving parent ID from Jama API")
         try:
@@ -217,30 +431,72 @@ class JamaClientHelper:
 
         self.spinner.start("Retrieving global ID from Jama API")
         try:
-            response = self.jama_client.get_item(test_case_id)['globalId']
+            item = self.jama_client.get_item(test_case_id)
         except Exception as e:
             print("\n" + str(e))
             return -1
         self.spinner.stop()
 
-        return response
+        # Newly added test cases are looked up by global id later in the run
+        self.register_test_case(item['project'], item['globalId'], item['id'],
+                                item['location']['parent'].get('item', -1))
+
+        return item['globalId']
 
-    def update_test_case(self, project, test_case):
+    def test_case_matches(self, test_case_id, parent_id, fields):
         """
-        Update a single test case
+        Return whether a test case already has the given parent and fields in Jama, compared against the fields
+        read when its project was indexed (rich text is normalized, fields that are not sent are ignored)
+
+        Args:
+            test_case_id: An integer representing the test case id
+            parent_id: An integer representing the parent item id the test case should be under
+            fields: A dictionary of the fields that would be sent (see assemble_add_update_fields)
+
+        Returns: A boolean that is False when the test case differs or its current fields are not known
+        """
+        current_fields = self.test_case_fields.get(test_case_id)
+        if current_fields is None or self.parent_ids.get(test_case_id) != parent_id:
+            return False
+
+        for name, value in fields.items():
+            current_value = current_fields.get(name)
+            if name == "testCaseSteps":
+                current_value = current_value or []
+                if len(current_value) != len(value):
+                    return False
+                for current_step, step in zip(current_value, value):
+                    if any(normalize_html(current_step.get(key) or "") != normalize_html(step_value or "")
+                           for key, step_value in step.items() if key != "sub_steps"):
+                        return False
+            elif isinstance(value, str):
+                if normalize_html(current_value or "") != normalize_html(value):
+                    return False
+            elif current_value != value:
+                return False
+
+        return True
+
+    def update_test_case(self, project, test_case, force=False):
+        """
+        Update a single test case. Unless forced, a test case whose current fields in Jama already match is not
+        updated (no new item version is created)
 
         Args:
             project: A string that represents the project that the test case needs to be updated in
             test_case: A TestCase object
+            force: A boolean that indicates whether the test case is updated even if it already matches
 
-        Returns: An integer representing the JAMA API response (e.g. 200 status for a successful update)
+        Returns: An integer representing the JAMA API response (e.g. 200 status for a successful update),
+                 UNCHANGED if the test case already matched
         """
         location = {"item": test_case.get_parent_id(project)}
         fields = self.assemble_add_update_fields(test_case)
+        test_case_id = test_case.get_test_case_id(project)
 
-        # print("Current fields: ", json.dumps(self.jama_client.get_abstract_items(
-        #     project=[test_case.get_project_id(project)],contains=[test_case.get_test_case_id(project)]), indent=4))
-        # print("New fields: ", json.dumps(fields, indent=4))
+        if self.compare_before_update and not force and \
+                self.test_case_matches(test_case_id, location["item"], fields):
+            return UNCHANGED
 
         # Call API to update test case
         self.spinner.start("Updating test case " + test_case.name + " in project " + project + " from Jama API")
@@ -256,9 +512,15 @@ class JamaClientHelper:
             return -1
         self.spinner.stop()
 
+        self.forget_sync_status(test_case_id)
+
+        # A later update of the same test case in this run is compared against what was just sent
+        self.test_case_fields[test_case_id] = dict(self.test_case_fields.get(test_case_id, {}), **fields)
+        self.parent_ids[test_case_id] = location["item"]
+
         return output
 
-    def add_sync_link(self, project, test_case, master_test_case_id):
+    def add_sync_link(self, project, test_case, master_test_case_id, client_key=None):
         """
         Update a single test case
 
@@ -266,6 +528,8 @@ class JamaClientHelper:
             project: A string that represents the project that the test case needs to be updated in
             test_case: A TestCase object
             master_test_case_id: A string that represents the test case id to sync the new test case with
+            client_key: A string that the placeholder's global id is made from, a placeholder with the same key that
+                        an interrupted run left in the project is synced instead of adding another one
 
         Returns: An integer that represents the JAMA API response (e.g. 200 status for a successful update)
         """
@@ -278,15 +542,22 @@ class JamaClientHelper:
         # unable to make this in one call which will be problematic if the post_item call is successful but the
         # post_item_sync is unsuccessful. Emmit Parubrub has asked the Jama support team about how to approach this
         # and this is what the Jama support team advised him to do.
+        placeholder_global_id = "AUTOMATION-GID-PLACEHOLDER-12345"
+        new_test_case_id = -1
         try:
-            self.spinner.start("Waiting for Jama API to add " + test_case.get_name() + " to project " + project)
-            new_test_case_id = self.jama_client.post_item(test_case.get_project_id(project),
-                                                          self.default_test_case_type,
-                                                          self.default_test_case_type,
-                                                          location,
-                                                          fields,
-                                                          global_id="AUTOMATION-GID-PLACEHOLDER-12345")
-            self.spinner.stop()
+            if client_key is not None:
+                placeholder_global_id = PLACEHOLDER_GLOBAL_ID_PREFIX + client_key
+                new_test_case_id = self.get_test_case_id_from_global_id(project, test_case.get_project_id(project),
+                                                                        placeholder_global_id)
+            if new_test_case_id == -1:
+                self.spinner.start("Waiting for Jama API to add " + test_case.get_name() + " to project " + project)
+                new_test_case_id = self.jama_client.post_item(test_case.get_project_id(project),
+                                                              self.default_test_case_type,
+                                                              self.default_test_case_type,
+                                                              location,
+                                                              fields,
+                                                              global_id=placeholder_global_id)
+                self.spinner.stop()
 
         except Exception as e:
             self.spinner.stop()
@@ -297,6 +568,10 @@ class JamaClientHelper:
             self.spinner.start("Waiting for Jama API to sync " + test_case.get_name() + " in project " + project)
             output = self.jama_client.post_item_sync(new_test_case_id, master_test_case_id)
             self.spinner.stop()
+            self.forget_sync_status(master_test_case_id)
+            self.register_test_case(test_case.get_project_id(project),
+                                    test_case.get_global_id().upper().replace("_", "-"),
+                                    new_test_case_id, test_case.get_parent_id(project))
         except Exception as e:
             self.spinner.stop()
             print("\nUnable to sync test case " + test_case.get_name() + " in project " + project + "\n" + str(e))
@@ -304,7 +579,7 @@ class JamaClientHelper:
 
         return output
 
-    def add_new_test_case(self, master_project, parent_id, test_case):
+    def add_new_test_case(self, master_project, parent_id, test_case, client_key=None):
         """
         Add a new test case to the master project
 
@@ -312,12 +587,25 @@ class JamaClientHelper:
             master_project: A string representing the master JAMA project name
             parent_id: An integer representing parent item's id that the test case is added under
             test_case: A TestCase object
+            client_key: A string that is added to the description of the new test case, if a test case in the master
+                        project already carries it (an interrupted run added it) that test case is returned instead
 
         Returns: An integer representing the id of the new test case that was added
         """
 
         location = {"item": parent_id}
         fields = self.assemble_add_update_fields(test_case)
+        master_project_id = self.get_project_id(master_project)
+
+        if client_key is not None:
+            try:
+                existing_test_case_id = self.find_test_case_by_client_key(master_project_id, client_key)
+            except Exception as e:
+                print("\n" + str(e))
+                return -1
+            if existing_test_case_id != -1:
+                return existing_test_case_id
+            fields["description"] = (fields["description"] or "") + client_key_comment(client_key)
 
         # Call API to add a new test case to the project that we want to add it to. First add a test case to the
         # project with a temporary global id (placeholder) then sync the new test case (below). Currently we are
@@ -328,7 +616,7 @@ class JamaClientHelper:
         try:
             self.spinner.start("Waiting for Jama API to add " + test_case.get_name() +
                                " to master project " + master_project)
-            new_test_case_id = self.jama_client.post_item(self.get_project_id(master_project),
+            new_test_case_id = self.jama_client.post_item(master_project_id,
                                                           self.default_test_case_type,
                                                           self.default_test_case_type,
                                                           location,
@@ -339,6 +627,10 @@ class JamaClientHelper:
             print("\n" + str(e))
             return -1
 
+        if client_key is not None:
+            with self._index_lock:
+                self.client_key_index[master_project_id][client_key] = new_test_case_id
+
         return new_test_case_id
 
     def assemble_add_update_fields(self, test_case):
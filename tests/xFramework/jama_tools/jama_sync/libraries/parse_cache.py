@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import sys
+import time
+
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+DEFAULT_PARSE_CACHE_PATH = Path.home() / '.jama_tools' / 'jama_sync_cache'
+
+# Bump when the parsing of test files (read_test_cases, the interpreters or TestCase) changes, every cached file is
+# then parsed again
+PARSER_VERSION = 1
+
+# A file modified this recently may have been changed again within the resolution of its modification time, its
+# content hash is checked even when its size and modification time match
+RECENT_SECONDS = 2
+
+
+def file_hash(file_path: str) -> str:
+    """
+    Return the sha256 hex digest of a file's content
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """
+    A local SQLite cache of the test cases parsed from each test file, so that a run only parses the files that
+    changed since the last run.
+
+    An entry is keyed by the file path and the parser settings (the test file interpreter, PARSER_VERSION, the python
+    version and the values of the run that parsing depends on, e.g. the Jama root folder, the project list and
+    whether the run adds or updates). A file is served from the cache when its size and modification time are the
+    ones it was parsed with, or, if only the modification time changed (e.g. a fresh checkout) or the file was just
+    modified, when its content hash is.
+    """
+    def __init__(self, cache_path=DEFAULT_PARSE_CACHE_PATH, settings: Dict = None) -> None:
+        """
+        This class opens (and creates if needed) the cache database in the cache directory
+
+        :cache_path: A path to the cache directory
+        :settings: A dictionary of the values that parsing depends on, entries parsed with other settings are not used
+        """
+        self.cache_path = Path(cache_path)
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+        self.settings_key = hashlib.sha256(json.dumps({'settings': settings or {}, 'parser_version': PARSER_VERSION,
+                                                       'python': list(sys.version_info[:2])},
+                                                      sort_keys=True).encode('utf-8')).hexdigest()
+        self.hits = 0
+        self.misses = 0
+
+        self._connection = sqlite3.connect(str(self.cache_path / 'parse_cache.sqlite3'))
+        with self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS parsed_files ("
+                                     "path TEXT NOT NULL, settings_key TEXT NOT NULL, size INTEGER NOT NULL, "
+                                     "mtime_ns INTEGER NOT NULL, content_hash TEXT NOT NULL, test_cases BLOB NOT NULL, "
+                                     "PRIMARY KEY (path, settings_key))")
+        # Every entry of these settings is loaded at once, a lookup per file would cost more than a small parse
+        self._entries = {row[0]: row[1:] for row in self._connection.execute(
+            "SELECT path, size, mtime_ns, content_hash, test_cases FROM parsed_files WHERE settings_key = ?",
+            (self.settings_key,))}
+
+    @staticmethod
+    def get_key_path(file_path: str) -> str:
+        return os.path.abspath(file_path)
+
+    def get(self, file_path: str) -> Optional[Tuple[List, List]]:
+        """
+        Return the cached test cases of a test file, or None if the file is not cached or changed since
+
+        Args:
+            file_path: A string representing the path to the test file
+
+        Returns:
+            A tuple of the TestCase lists to add and to update (new objects for every call) or None
+        """
+        entry = self._entries.get(self.get_key_path(file_path))
+        stat = os.stat(file_path)
+        if entry is not None:
+            size, mtime_ns, content_hash, test_cases = entry
+            unchanged_stat = mtime_ns == stat.st_mtime_ns and time.time() - stat.st_mtime > RECENT_SECONDS
+            if size == stat.st_size and (unchanged_stat or content_hash == file_hash(file_path)):
+                if mtime_ns != stat.st_mtime_ns:
+                    # Same content with a new modification time, the next run can trust the size and time again
+                    self._store(file_path, stat, content_hash, test_cases)
+                self.hits += 1
+                return pickle.loads(test_cases)
+
+        self.misses += 1
+        return None
+
+    def put(self, file_path: str, parsed_file: Tuple[List, List]) -> None:
+        """
+        Store the test cases parsed from a test file (call right after parsing, before the test cases are changed)
+
+        Args:
+            file_path: A string representing the path to the test file
+            parsed_file: A tuple of the TestCase lists to add and to update
+
+        Returns:
+            None
+        """
+        self._store(file_path, os.stat(file_path), file_hash(file_path),
+                    pickle.dumps(parsed_file, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def _store(self, file_path: str, stat: os.stat_result, content_hash: str, test_cases: bytes) -> None:
+        entry = (stat.st_size, stat.st_mtime_ns, content_hash, test_cases)
+        self._entries[self.get_key_path(file_path)] = entry
+        self._connection.execute("INSERT OR REPLACE INTO parsed_files VALUES (?, ?, ?, ?, ?, ?)",
+                                 (self.get_key_path(file_path), self.settings_key) + entry)
+
+    def save(self) -> None:
+        """
+        Commit the stored files (once per run instead of once per file)
+        """
+        self._connection.commit()
+
+    def invalidate(self) -> None:
+        """
+        Drop every cached file (e.g. --refresh-cache)
+        """
+        self._entries = {}
+        with self._connection:
+            self._connection.execute("DELETE FROM parsed_files")
+
+    def close(self) -> None:
+        self.save()
+        self._connection.close()
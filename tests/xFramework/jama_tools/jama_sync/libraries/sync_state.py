@@ -0,0 +1,201 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+DEFAULT_STATE_PATH = Path.home() / '.jama_tools' / 'jama_sync_state.sqlite3'
+
+# The steps of adding a new test case that are recorded in the journal
+ADDED = 'added'
+RENAMED = 'renamed'
+LINKED = 'linked'
+
+
+def fields_hash(fields: Dict) -> str:
+    """
+    Return a content hash of the fields that are pushed to Jama for a test case
+
+    Args:
+        fields: A dictionary of the Jama fields (the output of JamaClientHelper.assemble_add_update_fields)
+
+    Returns:
+        A string representing the sha256 hex digest of the fields
+    """
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def client_key(*parts) -> str:
+    """
+    Return the client key of an add: the same parts (e.g. the Jama url and the test case's source key) always give
+    the same key, so a re-run that lost its journal still finds the items an interrupted run created
+
+    Args:
+        *parts: The values that identify the add
+
+    Returns:
+        A string representing the key (20 uppercase hex digits)
+    """
+    return hashlib.sha256("\n".join(str(part) for part in parts).encode('utf-8')).hexdigest()[:20].upper()
+
+
+class SyncState:
+    """
+    A local SQLite store of what was last pushed to Jama: for each Jama url, project and global id, the test case id
+    and the content hash of its fields after the last successful push. A test case whose fields hash to the stored
+    value has not changed since it was pushed, so it does not have to be pushed (or checked for sync) again.
+
+    Only pushes made by jama_sync are recorded, an edit made in the Jama UI is not seen until the docstring changes
+    (or jama_sync is run with --full-sync).
+
+    The same database keeps the journal of the steps taken to add new test cases (added to the master project,
+    renamed with the GID, synced to a project), keyed by the file path and name the test case was read with. A run
+    that is interrupted before the GIDs are written back to the test files resumes from the journal instead of
+    adding the test cases again, the journal entries of a test case are dropped once its GID is in its file.
+    """
+    def __init__(self, jama_url: str, state_path=DEFAULT_STATE_PATH) -> None:
+        """
+        This class opens (and creates if needed) the state database
+
+        :jama_url: A string representing the url of the jama cloud, entries are kept separate per url
+        :state_path: A path to the SQLite database file
+        """
+        self.jama_url = jama_url
+        self.state_path = Path(state_path)
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Pushes are recorded from worker threads, every statement goes through one connection under a lock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.state_path), check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS pushed_test_cases ("
+                                     "jama_url TEXT NOT NULL, project TEXT NOT NULL, global_id TEXT NOT NULL, "
+                                     "test_case_id INTEGER NOT NULL, content_hash TEXT NOT NULL, "
+                                     "pushed_at REAL NOT NULL, PRIMARY KEY (jama_url, project, global_id))")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS add_journal ("
+                                     "jama_url TEXT NOT NULL, source_key TEXT NOT NULL, step TEXT NOT NULL, "
+                                     "project TEXT NOT NULL, item_id INTEGER, global_id TEXT, "
+                                     "recorded_at REAL NOT NULL, PRIMARY KEY (jama_url, source_key, step, project))")
+
+    @staticmethod
+    def normalize_global_id(global_id: str) -> str:
+        """
+        Return the global id as Jama shows it, test names carry it lowercase with underscores (gid_123 -> GID-123)
+        """
+        return global_id.upper().replace("_", "-")
+
+    def get_hash(self, project: str, global_id: str, test_case_id: int) -> Optional[str]:
+        """
+        Return the content hash of the last successful push of a test case, or None if it was never pushed or its
+        test case id changed since (e.g. the test case was deleted and added again)
+
+        Args:
+            project: A string representing the Jama project name
+            global_id: A string representing the global id of the test case
+            test_case_id: An integer representing the test case id in the project
+
+        Returns:
+            A string representing the content hash or None
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT test_case_id, content_hash FROM pushed_test_cases "
+                                           "WHERE jama_url = ? AND project = ? AND global_id = ?",
+                                           (self.jama_url, project, self.normalize_global_id(global_id))).fetchone()
+        if row is None or row[0] != test_case_id:
+            return None
+        return row[1]
+
+    def is_unchanged(self, project: str, global_id: str, test_case_id: int, content_hash: str) -> bool:
+        """
+        Returns whether the test case was last pushed to the project with exactly this content
+        """
+        return self.get_hash(project, global_id, test_case_id) == content_hash
+
+    def record_push(self, project: str, global_id: str, test_case_id: int, content_hash: str) -> None:
+        """
+        Record a successful push of a test case to a project (committed right away so that an interrupted run
+        keeps what it pushed)
+
+        Args:
+            project: A string representing the Jama project name
+            global_id: A string representing the global id of the test case
+            test_case_id: An integer representing the test case id in the project
+            content_hash: A string representing the content hash of the fields that were pushed
+
+        Returns:
+            None
+        """
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO pushed_test_cases VALUES (?, ?, ?, ?, ?, ?)",
+                                     (self.jama_url, project, self.normalize_global_id(global_id), test_case_id,
+                                      content_hash, time.time()))
+
+    def forget(self, project: str, global_id: str) -> None:
+        """
+        Drop the recorded push of a test case so that it is pushed on the next run (e.g. it failed to sync)
+        """
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM pushed_test_cases WHERE jama_url = ? AND project = ? AND "
+                                     "global_id = ?", (self.jama_url, project, self.normalize_global_id(global_id)))
+
+    def get_step(self, source_key: str, step: str, project: str) -> Optional[Tuple[int, str]]:
+        """
+        Return the item id and global id recorded for a step of adding a test case, or None if it was not taken
+
+        Args:
+            source_key: A string representing the test case as it was read (see TestCase.get_source_key)
+            step: A string representing the step (ADDED, RENAMED or LINKED)
+            project: A string representing the Jama project name the step was taken in
+
+        Returns:
+            A tuple of the item id and global id or None
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT item_id, global_id FROM add_journal WHERE jama_url = ? AND "
+                                           "source_key = ? AND step = ? AND project = ?",
+                                           (self.jama_url, source_key, step, project)).fetchone()
+        return tuple(row) if row is not None else None
+
+    def record_step(self, source_key: str, step: str, project: str, item_id: int = None,
+                    global_id: str = None) -> None:
+        """
+        Record that a step of adding a test case was taken (committed right away)
+
+        Args:
+            source_key: A string representing the test case as it was read (see TestCase.get_source_key)
+            step: A string representing the step (ADDED, RENAMED or LINKED)
+            project: A string representing the Jama project name the step was taken in
+            item_id: An integer representing the Jama item the step created or changed
+            global_id: A string representing the global id of the item
+
+        Returns:
+            None
+        """
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO add_journal VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                     (self.jama_url, source_key, step, project, item_id, global_id, time.time()))
+
+    def complete_steps(self, source_keys: List[str]) -> None:
+        """
+        Drop the journal of test cases whose GIDs were written to their test files (their add is complete)
+        """
+        with self._lock, self._connection:
+            self._connection.executemany("DELETE FROM add_journal WHERE jama_url = ? AND source_key = ?",
+                                         [(self.jama_url, source_key) for source_key in source_keys])
+
+    def pending_source_keys(self) -> List[str]:
+        """
+        Returns the test cases that an earlier run started to add but did not finish
+        """
+        with self._lock:
+            rows = self._connection.execute("SELECT DISTINCT source_key FROM add_journal WHERE jama_url = ? "
+                                            "ORDER BY source_key", (self.jama_url,)).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
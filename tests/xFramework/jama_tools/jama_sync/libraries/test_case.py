@@ -10,6 +10,8 @@ class TestCase:
         :name: name or title of the test case (should start with a TC-GID-XXXXX)
         """
         self.name = name
+        # The name as it was read from the test file, it identifies a new test case until its GID is written back
+        self.source_name = name
         self.parent_folder_path = parent_folder_path
         self.description = ""
         self.prerequisites = ""
@@ -100,6 +102,12 @@ class TestCase:
         """
         return self.name
 
+    def get_source_key(self):
+        """
+        Returns the parent folder path and the name the TestCase was read with (e.g. for the sync journal)
+        """
+        return self.parent_folder_path + "::" + self.source_name
+
     def get_parent_folder_path(self):
         """
         Returns the parent folder path for the TestCase
@@ -0,0 +1,203 @@
+import pytest
+
+import jama_sync
+from libraries.doc_read_helper import filter_special_characters, format_tables, normalize_html
+from libraries.jama_api import UNCHANGED, JamaClientHelper, JamaMetadataCache
+from libraries.test_case import TestCase
+
+TEST_CASE_TYPE = 89
+FOLDER_TYPE = 32
+
+
+class FakeJamaClient:
+    """
+    Stands in for the py_jama_rest_client JamaClient and counts the calls that would reach Jama
+    """
+    def __init__(self, items):
+        self.items = items
+        self.calls = []
+
+    def get_abstract_items(self, project=None, item_type=None, contains=None, **kwargs):
+        self.calls.append(('get_abstract_items', project, item_type, contains))
+        return [item for item in self.items
+                if item['project'] in project and item['itemType'] in item_type]
+
+    def post_item(self, project, item_type_id, child_item_type_id, location, fields, global_id=None):
+        self.calls.append(('post_item', project, location['item'], fields['name']))
+        new_item = make_item(1000 + len(self.items), project, None, location['item'], item_type_id, fields['name'])
+        self.items.append(new_item)
+        return new_item['id']
+
+    def put_item(self, project, item_id, item_type_id, child_item_type_id, location, fields):
+        self.calls.append(('put_item', item_id))
+        return 200
+
+    def get_items_synceditems(self, item_id):
+        self.calls.append(('get_items_synceditems', item_id))
+        return [item for item in self.items if item['globalId'] == self.get_item(item_id)['globalId'] and
+                item['id'] != item_id and item['itemType'] == TEST_CASE_TYPE]
+
+    def get_items_synceditems_status(self, item_id, synced_item_id):
+        self.calls.append(('get_items_synceditems_status', item_id, synced_item_id))
+        return {'inSync': synced_item_id != 4}
+
+    def get_item(self, item_id):
+        self.calls.append(('get_item', item_id))
+        return next(item for item in self.items if item['id'] == item_id)
+
+
+def make_item(item_id, project_id, global_id, parent_id, item_type=TEST_CASE_TYPE, name=None):
+    return {
+        'id': item_id,
+        'project': project_id,
+        'itemType': item_type,
+        'globalId': global_id,
+        'location': {'parent': {'item': parent_id}},
+        'fields': {'name': name or global_id},
+    }
+
+
+@pytest.fixture
+def jama_client(tmp_path):
+    client = JamaClientHelper("https://jama.example.com", "user", "secret", TEST_CASE_TYPE, FOLDER_TYPE, 292,
+                              "NOT_SCHEDULED", metadata_cache=JamaMetadataCache("https://jama.example.com",
+                                                                                tmp_path / "cache.json"))
+    client.jama_client = FakeJamaClient([
+        make_item(1, 10, "GID-100", 500),
+        make_item(2, 10, "GID-101", 500),
+        make_item(3, 20, "GID-100", 600),
+        make_item(4, 20, "GID-102", 600),
+        make_item(5, 20, "GID-102", 601),
+        make_item(50, 10, "GID-900", -1, FOLDER_TYPE, "root_tests"),
+        make_item(51, 10, "GID-901", 50, FOLDER_TYPE, "Automated"),
+    ])
+    return client
+
+
+def test_global_id_lookups_use_one_listing_per_project(jama_client):
+    assert jama_client.get_test_case_id_from_global_id("Master", 10, "gid_100") == 1
+    assert jama_client.get_test_case_id_from_global_id("Master", 10, "GID-101") == 2
+    assert jama_client.get_test_case_id_from_global_id("Master", 10, "gid_999") == -1
+    assert jama_client.get_test_case_id_from_global_id("Other", 20, "gid_100") == 3
+    assert jama_client.get_parent_id(3) == 600
+
+    assert [call[0] for call in jama_client.jama_client.calls] == ['get_abstract_items', 'get_abstract_items']
+
+
+def test_duplicate_global_id_in_project_raises(jama_client):
+    with pytest.raises(Exception, match="More than one test case"):
+        jama_client.get_test_case_id_from_global_id("Other", 20, "gid_102")
+
+
+def test_created_test_cases_are_registered(jama_client):
+    assert jama_client.get_test_case_id_from_global_id("Master", 10, "gid_103") == -1
+
+    jama_client.jama_client.items.append(make_item(6, 10, "GID-103", 501))
+    assert jama_client.get_global_id(6) == "GID-103"
+    assert jama_client.get_test_case_id_from_global_id("Master", 10, "gid_103") == 6
+    assert jama_client.get_parent_id(6) == 501
+
+
+def test_folder_paths_resolve_from_one_listing(jama_client):
+    assert jama_client.get_folder_id(10, "root_tests/Automated/test_docs.robot", "Master") == 51
+    assert jama_client.get_folder_id(10, "root_tests/Automated/test_tables.robot", "Master") == 51
+    assert jama_client.get_folder_id(10, "root_tests/test_top_level.robot", "Master") == 50
+
+    assert [call[0] for call in jama_client.jama_client.calls] == ['get_abstract_items']
+
+
+def test_missing_folders_are_created_once(jama_client):
+    first = jama_client.get_folder_id(10, "root_tests/Automated/New/Deeper/test_a.py", "Master")
+    second = jama_client.get_folder_id(10, "root_tests/Automated/New/test_b.py", "Master")
+    third = jama_client.get_folder_id(10, "root_tests/Automated/New/Deeper/test_c.py", "Master")
+
+    posts = [call[1:] for call in jama_client.jama_client.calls if call[0] == 'post_item']
+    assert posts == [(10, 51, "New"), (10, second, "Deeper")]
+    assert first == third
+
+
+def test_missing_root_folder_raises(jama_client):
+    with pytest.raises(Exception, match="Could not find root folder"):
+        jama_client.get_folder_id(10, "not_a_root/test_a.py", "Master")
+
+
+def test_jama_rich_text_normalizes_to_what_was_sent():
+    table = format_tables(["a | b", "1 | 2"], "test_case")
+    jama_table = table.replace("&nbsp;", "\xa0").replace("\n", "").replace("\t", "")
+    assert normalize_html(table) == normalize_html(jama_table)
+
+    text = filter_special_characters("it's <x> & \"y\"")
+    assert normalize_html(text) == normalize_html("it&#39;s &lt;x&gt; &amp; &quot;y&quot;")
+    assert normalize_html("<p>a<br/>b</p>") == normalize_html("<p>a<br>b</p>")
+    assert normalize_html("<p>a</p>") != normalize_html("<p>b</p>")
+
+
+def test_updates_that_already_match_jama_are_skipped(jama_client):
+    test_case = TestCase("GID-100", "root_tests/Automated")
+    test_case.set_description(filter_special_characters("Checks <it>"))
+    test_case.add_step("Run it", "It's fine", "")
+    test_case.add_project_track("Master", 10, 1, 500)
+    jama_client.get_test_case_index(10)
+    jama_client.test_case_fields[1] = {
+        'name': "GID-100",
+        'description': "Checks &lt;it&gt;",
+        'prerequisite_steps$89': "<p></p><p>&nbsp;</p>",
+        'testCaseSteps': [{'action': "Run it", 'expectedResult': "It&#39;s fine", 'notes': "", 'order': 1}],
+        'status': 292,
+        'modifiedDate': "2024-01-01",
+    }
+
+    assert jama_client.update_test_case("Master", test_case) == UNCHANGED
+    assert jama_client.update_test_case("Master", test_case, force=True) == 200
+
+    test_case.add_step("Run it again", "Still fine", "")
+    assert jama_client.update_test_case("Master", test_case) == 200
+    assert jama_client.update_test_case("Master", test_case) == UNCHANGED
+
+    test_case.add_project_track("Master", 10, 1, 501)
+    assert jama_client.update_test_case("Master", test_case) == 200
+    assert [call[1] for call in jama_client.jama_client.calls if call[0] == 'put_item'] == [1, 1, 1]
+
+
+def test_sync_status_is_checked_concurrently_and_remembered(jama_client, capfd):
+    master_project = jama_sync.config['default_master_project']
+    test_cases = []
+    for global_id, master_id in (("GID-100", 1), ("GID-102", 5)):
+        test_case = TestCase("test_" + global_id, "root_tests/Automated")
+        test_case.add_project_track(master_project, 10, master_id, 500)
+        test_case.add_project_track("Other", 20, None, 600)
+        test_cases.append(test_case)
+
+    assert not jama_sync.check_all_test_cases_synced(test_cases, jama_client)
+    output = capfd.readouterr().out
+    assert "in project 'Other': 1 in sync, 1 not in sync" in output
+    assert "NOT IN SYNC      GID-102" in output
+
+    jama_client.jama_client.calls.clear()
+    assert jama_client.fetch_sync_status(1, 3) is True
+    assert jama_client.jama_client.calls == []
+
+    jama_client.forget_sync_status(3)
+    assert jama_client.fetch_sync_status(1, 3) is True
+    assert jama_client.jama_client.calls == [('get_items_synceditems_status', 1, 3)]
+
+
+def test_failed_sync_lookups_are_reported_with_their_error(jama_client, monkeypatch, capfd):
+    master_project = jama_sync.config['default_master_project']
+    test_cases = []
+    for global_id, master_id in (("GID-100", 1), ("GID-101", 2)):
+        test_case = TestCase("test_" + global_id, "root_tests/Automated")
+        test_case.add_project_track(master_project, 10, master_id, 500)
+        test_cases.append(test_case)
+
+    def fail(*args):
+        raise Exception("500 Server Error.")
+    get_items_synceditems = jama_client.jama_client.get_items_synceditems
+    monkeypatch.setattr(jama_client.jama_client, "get_items_synceditems_status", fail)
+    monkeypatch.setattr(jama_client.jama_client, "get_items_synceditems",
+                        lambda item_id: fail() if item_id == 2 else get_items_synceditems(item_id))
+
+    assert not jama_sync.check_all_test_cases_synced(test_cases, jama_client)
+    output = capfd.readouterr().out
+    assert "UNKNOWN          GID-100 (unable to read the sync status: 500 Server Error.)" in output
+    assert "NO SYNCED ITEMS  test_GID-101 (unable to find the synced items: 500 Server Error.)" in output
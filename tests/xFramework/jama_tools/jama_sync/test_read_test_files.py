@@ -0,0 +1,74 @@
+import os
+
+import jama_sync
+from jama_common.fake_jama_server import FakeJamaServer
+from libraries.parse_cache import ParseCache
+from test_sync_state import TEST_CASE_TEMPLATE, configure_fake_server, write_sync_root
+
+
+def test_test_files_are_parsed_in_parallel_in_file_order(tmp_path, monkeypatch):
+    root_path = write_sync_root(tmp_path, "suite/nested")
+    for pruned in (".git", "data_files", "logs"):
+        (root_path / pruned).mkdir()
+        (root_path / pruned / "test_pruned.py").write_text(TEST_CASE_TEMPLATE.format(number=99))
+
+    with FakeJamaServer() as server:
+        arguments = configure_fake_server(server, tmp_path, root_path, monkeypatch)
+    interpreter = jama_sync.InterpreterFactory.create("xframework", str(root_path))
+
+    test_files = interpreter.get_test_files()
+    assert [path.split("sync_root")[-1] for path in test_files] == \
+        ["/suite/nested/test_file_" + str(number) + ".py" for number in range(3)]
+
+    parallel = jama_sync.read_test_files(arguments, test_files, interpreter, processes=3)
+    sequential = jama_sync.read_test_files(arguments, test_files, interpreter, processes=1)
+    assert [[test_case.get_name() for test_case in test_cases] for test_cases in parallel] == \
+        [[test_case.get_name() for test_case in test_cases] for test_cases in sequential] == \
+        [["test_NEW_case_" + str(number) for number in range(6)], []]
+
+
+def test_unchanged_test_files_are_read_from_the_parse_cache(tmp_path, monkeypatch, capfd):
+    root_path = write_sync_root(tmp_path)
+    with FakeJamaServer() as server:
+        arguments = configure_fake_server(server, tmp_path, root_path, monkeypatch)
+    interpreter = jama_sync.InterpreterFactory.create("xframework", str(root_path))
+    test_files = interpreter.get_test_files()
+
+    def read_with_cache(settings=None):
+        parse_cache = ParseCache(tmp_path / "parse_cache", settings or {'interpreter': interpreter.name})
+        test_cases = jama_sync.read_test_files(arguments, test_files, interpreter, 1, parse_cache)
+        parse_cache.close()
+        return [test_case.get_description().strip() for test_case in test_cases[0]], parse_cache.misses
+
+    assert read_with_cache() == (["Test case " + str(number) for number in range(6)], 3)
+    assert read_with_cache() == (["Test case " + str(number) for number in range(6)], 0)
+    assert "Parsed 0 test files, 3 unchanged test files were read from the parse cache" in capfd.readouterr().out
+
+    test_file = root_path / "test_file_1.py"
+    test_file.write_text(test_file.read_text().replace("Test case 2", "Test case two"))
+    descriptions, misses = read_with_cache()
+    assert descriptions[2] == "Test case two" and misses == 1
+
+    # A touched file with the same content is served by its content hash, other settings do not share entries
+    os.utime(test_file, (1, 1))
+    assert read_with_cache()[1] == 0
+    assert read_with_cache({'interpreter': "robot"})[1] == 3
+
+
+def test_add_and_update_runs_do_not_share_parse_cache_entries(tmp_path, monkeypatch):
+    root_path = write_sync_root(tmp_path)
+    test_file = root_path / "test_file_0.py"
+    test_file.write_text(test_file.read_text().replace("test_NEW_case_1", "test_gid_1_case_1"))
+
+    def read_with_cache(mode):
+        with FakeJamaServer() as server:
+            arguments = configure_fake_server(server, tmp_path, root_path, monkeypatch, mode)
+        interpreter = jama_sync.InterpreterFactory.create("xframework", str(root_path))
+        parse_cache = jama_sync.initialize_parse_cache(arguments, interpreter)
+        add_list, update_list = jama_sync.read_test_files(arguments, [str(test_file)], interpreter, 1, parse_cache)
+        parse_cache.close()
+        return [test_case.get_name() for test_case in add_list], [test_case.get_name() for test_case in update_list]
+
+    assert read_with_cache("--add") == (["test_NEW_case_0"], [])
+    assert read_with_cache("--update") == ([], ["test_gid_1_case_1"])
+    assert read_with_cache("--add") == (["test_NEW_case_0"], [])
@@ -0,0 +1,284 @@
+import pytest
+
+import jama_sync
+from jama_common.fake_jama_server import FOLDER_TYPE, TEST_CASE_TYPE, FakeJamaServer
+from jama_common.jama_metrics import ApiMetrics
+from jama_common.jama_transport import PooledJamaClient
+from libraries.jama_api import JamaClientHelper
+from libraries.sync_state import ADDED, LINKED, RENAMED, SyncState, client_key, fields_hash
+from libraries.test_case import TestCase
+
+MASTER_PROJECT = jama_sync.config['default_master_project']
+
+TEST_CASE_TEMPLATE = '''
+def test_NEW_case_{number}():
+    """
+    Description:
+        Test case {number}
+
+    Prerequisites:
+        1) None
+
+    Test Data:
+        1) None
+
+    Steps:
+        1) Run step {number}
+            ER: The step passes
+            Notes: None
+
+    Projects: Other
+    """
+    pass
+'''
+
+
+class FakeJamaClientHelper:
+    """
+    Stands in for the JamaClientHelper and records the test cases that were pushed and checked for sync
+    """
+    def __init__(self):
+        self.metrics = ApiMetrics()
+        self.pool_size = 4
+        self.updated = []
+        self.checked = []
+
+    def assemble_add_update_fields(self, test_case):
+        return {'name': test_case.get_name(), 'description': test_case.get_description()}
+
+    def update_test_case(self, project, test_case, force=False):
+        self.updated.append((project, test_case.get_name()))
+        return 200
+
+    def fetch_synced_items(self, test_case_id):
+        self.checked.append(test_case_id)
+        return [{'id': test_case_id + 1, 'project': 2, 'fields': {'name': "synced"}}]
+
+    def fetch_sync_status(self, test_case_id, other_test_case_id):
+        return True
+
+
+def make_test_case(number, description="Description"):
+    test_case = TestCase("test_gid_" + str(number) + "_case", "root/folder")
+    test_case.set_global_id("gid_" + str(number))
+    test_case.set_description(description)
+    test_case.add_project_track(MASTER_PROJECT, 1, 100 + number * 10, 5)
+    test_case.add_project_track("Other", 2, 101 + number * 10, 6)
+    return test_case
+
+
+@pytest.fixture
+def sync_state(tmp_path):
+    state = SyncState("https://jama.example.com", tmp_path / "state.sqlite3")
+    yield state
+    state.close()
+
+
+def test_pushes_are_recorded_per_project_and_test_case_id(sync_state):
+    sync_state.record_push("Project", "gid_12", 1012, "hash")
+
+    assert sync_state.is_unchanged("Project", "GID-12", 1012, "hash")
+    assert not sync_state.is_unchanged("Project", "GID-12", 1012, "other hash")
+    assert not sync_state.is_unchanged("Project", "GID-12", 2012, "hash")
+    assert not sync_state.is_unchanged("Other", "GID-12", 1012, "hash")
+    assert not SyncState("https://other.jamacloud.com", sync_state.state_path).is_unchanged("Project", "GID-12",
+                                                                                           1012, "hash")
+
+    sync_state.forget("Project", "GID-12")
+    assert sync_state.get_hash("Project", "GID-12", 1012) is None
+
+
+def test_fields_hash_ignores_key_order():
+    assert fields_hash({'name': "a", 'description': "b"}) == fields_hash({'description': "b", 'name': "a"})
+    assert fields_hash({'name': "a"}) != fields_hash({'name': "b"})
+
+
+def test_only_changed_test_cases_are_pushed_and_checked(sync_state, capfd):
+    test_cases = [make_test_case(number) for number in range(5)]
+    jama_client = FakeJamaClientHelper()
+    assert jama_sync.sync_push_updates(test_cases, jama_client, sync_state) == 0
+    assert len(jama_client.updated) == 10
+
+    test_cases[3].set_description("Edited")
+    jama_client = FakeJamaClientHelper()
+    assert jama_sync.sync_push_updates(test_cases, jama_client, sync_state) == 0
+
+    assert jama_client.updated == [(MASTER_PROJECT, "test_gid_3_case"), ("Other", "test_gid_3_case")]
+    assert jama_client.checked == [130]
+    assert "Skipped 8 test case updates" in capfd.readouterr().out
+
+    jama_client = FakeJamaClientHelper()
+    jama_sync.sync_push_updates(test_cases, jama_client, sync_state, full_sync=True)
+    assert len(jama_client.updated) == 10
+
+
+def test_add_steps_are_journaled_until_completed(sync_state):
+    sync_state.record_step("root/test_a.py::test_NEW_a", ADDED, "Master", 1001, "GID-1")
+    sync_state.record_step("root/test_a.py::test_NEW_a", RENAMED, "Master", 1001, "GID-1")
+    sync_state.record_step("root/test_b.py::test_NEW_b", ADDED, "Master", 1002, "GID-2")
+
+    assert sync_state.get_step("root/test_a.py::test_NEW_a", ADDED, "Master") == (1001, "GID-1")
+    assert sync_state.get_step("root/test_a.py::test_NEW_a", LINKED, "Other") is None
+    assert sync_state.pending_source_keys() == ["root/test_a.py::test_NEW_a", "root/test_b.py::test_NEW_b"]
+
+    sync_state.complete_steps(["root/test_a.py::test_NEW_a"])
+    assert sync_state.pending_source_keys() == ["root/test_b.py::test_NEW_b"]
+
+
+def test_chunks_keep_the_order():
+    assert jama_sync.chunk_test_cases(list(range(7)), 3) == [[0, 1, 2], [3, 4, 5], [6]]
+    with pytest.raises(Exception, match="sync_chunk_size"):
+        jama_sync.chunk_test_cases([1], 0)
+
+
+def write_sync_root(tmp_path, folder=""):
+    root_path = tmp_path / "sync_root"
+    (root_path / folder).mkdir(parents=True)
+    for file_number in range(3):
+        with open(root_path / folder / ("test_file_" + str(file_number) + ".py"), 'w') as file:
+            for number in range(file_number * 2, file_number * 2 + 2):
+                file.write(TEST_CASE_TEMPLATE.format(number=number))
+    return root_path
+
+
+def configure_fake_server(server, tmp_path, root_path, monkeypatch, mode="--add"):
+    for project in ("Master", "Other"):
+        server.add_folder(server.add_project(project), "sync_root")
+    for key, value in {'jama_url': server.url, 'default_test_case_api_type': TEST_CASE_TYPE,
+                       'default_folder_api_type': FOLDER_TYPE, 'default_master_project': "Master",
+                       'jama_project_list': ["Master", "Other"], 'sync_chunk_size': 4,
+                       'metadata_cache_path': str(tmp_path / "cache.json"),
+                       'metrics_path': str(tmp_path / "metrics.json"),
+                       'sync_state_path': str(tmp_path / "state.sqlite3"),
+                       'parse_cache_path': str(tmp_path / "parse_cache")}.items():
+        monkeypatch.setitem(jama_sync.config, key, value)
+    return jama_sync.parse_args(["-root_path", str(root_path), "-test_path", str(root_path),
+                                 "-jama_user", "user", "-jama_pass", "secret", "-interpreter", "xframework",
+                                 mode])
+
+
+def count_test_cases(server):
+    return len([item for item in server.items.values() if item['itemType'] == TEST_CASE_TYPE])
+
+
+def count_write_calls(server):
+    return sum(count for endpoint, count in server.request_counts.items()
+               if endpoint.split()[0] in ("POST", "PUT") and "oauth" not in endpoint)
+
+
+def test_interrupted_add_resumes_without_duplicates(tmp_path, monkeypatch):
+    root_path = write_sync_root(tmp_path)
+
+    with FakeJamaServer() as server:
+        arguments = configure_fake_server(server, tmp_path, root_path, monkeypatch)
+
+        # The first run is interrupted before any GID is written back to the test files
+        write_global_ids = jama_sync.write_global_ids
+        monkeypatch.setattr(jama_sync, "write_global_ids", lambda *args: 1 / 0)
+        jama_sync.update_jama(arguments, testing=True)
+        assert count_test_cases(server) == 8
+
+        monkeypatch.setattr(jama_sync, "write_global_ids", write_global_ids)
+        assert jama_sync.update_jama(arguments, testing=True) == 0
+
+        assert count_test_cases(server) == 12
+        assert "test_NEW" not in "".join(path.read_text() for path in root_path.iterdir())
+        state = SyncState(server.url, tmp_path / "state.sqlite3")
+        assert state.pending_source_keys() == []
+        state.close()
+
+
+def test_failed_rename_stays_pending_in_the_journal(tmp_path, monkeypatch, capfd):
+    root_path = write_sync_root(tmp_path)
+
+    with FakeJamaServer() as server:
+        arguments = configure_fake_server(server, tmp_path, root_path, monkeypatch)
+        monkeypatch.setitem(jama_sync.config, 'sync_chunk_size', 6)
+
+        # Jama creates the test cases but refuses to rename them
+        update_test_case = JamaClientHelper.update_test_case
+        monkeypatch.setattr(JamaClientHelper, "update_test_case", lambda *args: -1)
+        jama_sync.update_jama(arguments, testing=True)
+        assert "Successfully added" not in capfd.readouterr().out
+        assert "test_gid" not in "".join(path.read_text() for path in root_path.iterdir())
+        state = SyncState(server.url, tmp_path / "state.sqlite3")
+        assert len(state.pending_source_keys()) == 6
+        state.close()
+
+        monkeypatch.setattr(JamaClientHelper, "update_test_case", update_test_case)
+        assert jama_sync.update_jama(arguments, testing=True) == 0
+
+        assert "test_NEW" not in "".join(path.read_text() for path in root_path.iterdir())
+        assert not any("jama_sync:" in (item['fields'].get('description') or "") for item in server.items.values()
+                       if item['itemType'] == TEST_CASE_TYPE)
+        state = SyncState(server.url, tmp_path / "state.sqlite3")
+        assert state.pending_source_keys() == []
+        state.close()
+
+
+def test_client_keys_find_items_created_before_the_journal(tmp_path, monkeypatch):
+    root_path = write_sync_root(tmp_path)
+
+    with FakeJamaServer() as server:
+        arguments = configure_fake_server(server, tmp_path, root_path, monkeypatch)
+
+        # Jama creates the test cases but the runs stop before anything is journaled: first before the global ids
+        # are read, then before the placeholders added to the other project are synced
+        get_global_id = JamaClientHelper.get_global_id
+        monkeypatch.setattr(JamaClientHelper, "get_global_id", lambda *args: -1)
+        jama_sync.update_jama(arguments, testing=True)
+        assert count_test_cases(server) == 6
+
+        monkeypatch.setattr(JamaClientHelper, "get_global_id", get_global_id)
+        monkeypatch.setattr(PooledJamaClient, "post_item_sync", lambda *args: 1 / 0)
+        jama_sync.update_jama(arguments, testing=True)
+        assert count_test_cases(server) == 12
+
+        # The GIDs were written, the update links the placeholders that are already in the other project
+        monkeypatch.undo()
+        arguments = configure_fake_server(server, tmp_path, root_path, monkeypatch, "--update")
+        assert jama_sync.update_jama(arguments, testing=True) == 0
+
+        assert count_test_cases(server) == 12
+        assert not any("jama_sync:" in (item['fields'].get('description') or "") for item in server.items.values())
+        assert not any(item['globalId'].startswith("JAMA-SYNC-") for item in server.items.values())
+
+
+def test_client_keys_are_stable():
+    assert client_key("https://jama.example.com", "root/test_a.py::test_NEW_a") == \
+        client_key("https://jama.example.com", "root/test_a.py::test_NEW_a")
+    assert client_key("https://jama.example.com", 1001, "Other") != client_key("https://jama.example.com", 1001,
+                                                                                "Master")
+    assert len(client_key("a")) == 20 and client_key("a").isupper()
+
+
+def test_plan_counts_the_write_calls_without_writing(tmp_path, monkeypatch, capfd):
+    root_path = write_sync_root(tmp_path, "new_folder")
+
+    with FakeJamaServer() as server:
+        arguments = configure_fake_server(server, tmp_path, root_path, monkeypatch)
+        arguments.plan = True
+
+        assert jama_sync.update_jama(arguments, testing=True) == 0
+        output = capfd.readouterr().out
+        assert count_write_calls(server) == 0
+        assert "Folders to create (2):" in output and "Sync links to create (6):" in output
+        assert "Test files whose GIDs will be rewritten (3):" in output
+        # 2 folders, 6 test cases added to and renamed in the master project, each linked to the other project
+        assert "Write calls: 26 (2 folders, 6 adds, 6 renames, 12 links, 0 updates)" in output
+
+        arguments.plan = False
+        jama_sync.update_jama(arguments, testing=True)
+        assert count_write_calls(server) == 26
+        assert "test_NEW" not in (root_path / "new_folder" / "test_file_0.py").read_text()
+
+        test_file = root_path / "new_folder" / "test_file_1.py"
+        test_file.write_text(test_file.read_text().replace("Test case 2", "Test case two"))
+        arguments = configure_fake_server(server, tmp_path, root_path, monkeypatch, "--update")
+        arguments.plan = True
+        server.reset_request_counts()
+        capfd.readouterr()
+
+        assert jama_sync.update_jama(arguments, testing=True) == 0
+        assert "Write calls: 2 (0 folders, 0 adds, 0 renames, 0 links, 2 updates)" in capfd.readouterr().out
+        assert count_write_calls(server) == 0